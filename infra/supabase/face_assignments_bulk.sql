@@ -0,0 +1,38 @@
+-- =====================================================
+-- FACE CLUSTERING - BULK FACE ASSIGNMENTS
+-- =====================================================
+-- Lets the worker assign a chunk of faces to their face_persons in one
+-- statement (one RPC round-trip per ASSIGNMENT_CHUNK_SIZE faces) instead of
+-- one UPDATE request per face.
+-- Run after face_clustering.sql. Without it the worker falls back to
+-- per-face updates.
+-- =====================================================
+
+-- p_face_ids[i] is assigned to p_face_person_ids[i] (NULL unassigns)
+CREATE OR REPLACE FUNCTION assign_faces_bulk(
+  p_face_ids UUID[],
+  p_face_person_ids UUID[]
+)
+RETURNS INT AS $$
+DECLARE
+  updated_faces INT;
+BEGIN
+  IF cardinality(p_face_ids) <> cardinality(p_face_person_ids) THEN
+    RAISE EXCEPTION 'assign_faces_bulk: % face ids for % face_person ids',
+      cardinality(p_face_ids), cardinality(p_face_person_ids);
+  END IF;
+
+  UPDATE faces f
+  SET face_person_id = a.face_person_id
+  FROM unnest(p_face_ids, p_face_person_ids) AS a(face_id, face_person_id)
+  WHERE f.id = a.face_id
+    AND f.face_person_id IS DISTINCT FROM a.face_person_id;
+
+  GET DIAGNOSTICS updated_faces = ROW_COUNT;
+  RETURN updated_faces;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Worker only (service role)
+REVOKE EXECUTE ON FUNCTION assign_faces_bulk(UUID[], UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION assign_faces_bulk(UUID[], UUID[]) TO service_role;
@@ -0,0 +1,23 @@
+-- =====================================================
+-- FACE CLUSTERING - INCREMENTAL MODE
+-- =====================================================
+-- Per-cluster centroids used by the worker when CLUSTERING_MODE=incremental:
+-- new faces are matched against centroids instead of re-clustering the event.
+-- Run after face_clustering.sql. The next full /cluster run fills the columns.
+-- =====================================================
+
+-- Mean of the (L2-normalized) embeddings of the faces in the cluster
+ALTER TABLE face_persons ADD COLUMN IF NOT EXISTS centroid vector(512);
+
+-- Number of faces averaged into centroid (for running-mean updates)
+ALTER TABLE face_persons ADD COLUMN IF NOT EXISTS centroid_count INT NOT NULL DEFAULT 0;
+
+-- Set on faces an incremental run left unassigned (noise): they stay in the
+-- incremental buffer (re-clustered with new faces) until they age out, but no
+-- longer count as new faces
+ALTER TABLE faces ADD COLUMN IF NOT EXISTS cluster_considered_at TIMESTAMPTZ;
+
+-- Incremental runs only read unassigned faces with an embedding
+DROP INDEX IF EXISTS idx_faces_event_unconsidered;
+CREATE INDEX IF NOT EXISTS idx_faces_event_unassigned ON faces(event_id, id)
+  WHERE face_person_id IS NULL AND embedding IS NOT NULL;
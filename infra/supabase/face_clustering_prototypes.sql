@@ -0,0 +1,12 @@
+-- =====================================================
+-- FACE CLUSTERING - MULTI-PROTOTYPE CLUSTERS
+-- =====================================================
+-- A few representative embeddings per cluster, used by the worker when
+-- CLUSTER_PROTOTYPE_COUNT > 0: faces are matched against the closest prototype
+-- instead of a single centroid / representative face (better recall for
+-- clusters spanning poses, lighting or ages).
+-- Run after face_clustering_incremental.sql. The next full /cluster run fills the column.
+-- =====================================================
+
+-- Base64 of the (k, 512) little-endian float32 matrix of L2-normalized prototypes
+ALTER TABLE face_persons ADD COLUMN IF NOT EXISTS prototypes TEXT;
@@ -0,0 +1,57 @@
+-- =====================================================
+-- FACE CLUSTERING - CROSS-EVENT IDENTITY INDEX
+-- =====================================================
+-- Per-user prototype embeddings built from all the clusters linked to the
+-- user across events. Used by the worker when IDENTITY_INDEX_ENABLED=true to
+-- pre-link new clusters of an event to its members.
+-- Link changes only mark the user stale (trigger below); the worker
+-- recomputes stale users of an event when clustering it.
+-- Run after face_clustering.sql.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS user_face_prototypes (
+  user_id UUID PRIMARY KEY REFERENCES profiles(id) ON DELETE CASCADE,
+  prototypes TEXT, -- base64 of the (k, 512) little-endian float32 prototypes, NULL until computed
+  face_count INT NOT NULL DEFAULT 0, -- linked faces the prototypes were selected from
+  stale BOOLEAN NOT NULL DEFAULT true, -- links changed since the prototypes were computed
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_face_prototypes_stale ON user_face_prototypes(user_id) WHERE stale;
+
+DROP TRIGGER IF EXISTS user_face_prototypes_updated_at ON user_face_prototypes;
+CREATE TRIGGER user_face_prototypes_updated_at
+  BEFORE UPDATE ON user_face_prototypes
+  FOR EACH ROW
+  EXECUTE FUNCTION update_updated_at();
+
+-- Biometric data: service role (worker) only
+ALTER TABLE user_face_prototypes ENABLE ROW LEVEL SECURITY;
+
+-- Mark the previous and new linked users of a face_person stale
+CREATE OR REPLACE FUNCTION mark_user_face_prototypes_stale()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.linked_user_id IS NOT NULL THEN
+    INSERT INTO user_face_prototypes (user_id) VALUES (OLD.linked_user_id)
+    ON CONFLICT (user_id) DO UPDATE SET stale = true;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.linked_user_id IS NOT NULL THEN
+    INSERT INTO user_face_prototypes (user_id) VALUES (NEW.linked_user_id)
+    ON CONFLICT (user_id) DO UPDATE SET stale = true;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS face_persons_identity_stale ON face_persons;
+CREATE TRIGGER face_persons_identity_stale
+  AFTER INSERT OR DELETE OR UPDATE OF linked_user_id, status ON face_persons
+  FOR EACH ROW
+  EXECUTE FUNCTION mark_user_face_prototypes_stale();
+
+-- Backfill: users linked before this migration get a stale row, so their
+-- prototypes are computed the next time one of their events is clustered
+INSERT INTO user_face_prototypes (user_id, stale)
+SELECT DISTINCT linked_user_id, true FROM face_persons WHERE linked_user_id IS NOT NULL
+ON CONFLICT DO NOTHING;
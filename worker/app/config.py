@@ -1,7 +1,7 @@
 """Configuration management using pydantic-settings"""
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -21,12 +21,87 @@ class Settings(BaseSettings):
     min_cluster_size: int = 3
     min_samples: int = 2
     cluster_epsilon: float = 0.5  # Increased from 0.4 to allow more flexible clustering
+    recognition_batch_size: int = 32  # Face crops per recognition ONNX call
+    embedding_precision: Literal['float32', 'float16', 'int8'] = 'float32'  # in-memory event embeddings of cluster jobs
+    face_page_size: int = 1000  # faces per keyset page when loading an event (keep <= PostgREST max-rows)
+    embedding_cache_size: int = 10000  # face embeddings (cluster representatives) kept in memory, 0 = off
+    embedding_fetch_chunk_size: int = 200  # face ids per in_ filter (bounds the request URL length)
+    assignment_min_margin: float = 0.0  # best - second-best similarity to join an existing cluster
+    clustering_mode: Literal['full', 'incremental'] = 'full'  # incremental needs face_clustering_incremental.sql
+    incremental_max_new_faces: int = 5000  # more new (not yet considered) faces than this -> full run
+    incremental_max_buffered_faces: int = 1000  # noise faces re-clustered with new ones (most recent kept)
+    incremental_buffer_max_age_hours: float = 168  # noise faces leave the incremental buffer after this
+    assignment_chunk_size: int = 1000  # faces per assign_faces_bulk call (needs face_assignments_bulk.sql)
+    identity_index_enabled: bool = False  # pre-link new clusters to event members (needs face_identity_index.sql)
+    identity_prototype_count: int = 5  # prototypes kept per user in the identity index
+    identity_link_threshold: float = 0.7  # mean similarity of a new cluster's faces to a member to pre-link it
+    identity_link_min_margin: float = 0.1  # best - second-best member score to pre-link
+    cluster_prototype_count: int = 0  # diverse prototypes kept per cluster (needs face_clustering_prototypes.sql), 0 = representative only
+    clustering_engine: Literal['sparse', 'dense', 'hierarchical'] = 'sparse'  # sparse = blocked eps-radius graph
+    hierarchical_min_faces: int = 20000  # hierarchical engine only above this many faces (sparse below)
+    hierarchical_partition_size: int = 5000  # faces per micro-clustering partition (media kept together)
+    hierarchical_workers: int = 4  # processes building micro-clusters (1 = in-process)
+    coreset_radius: float = 0.0  # collapse faces closer than this before clustering (0.05 recommended, 0 = off)
+    micro_cluster_epsilon: float = 0.35  # max neighbor distance inside a micro-cluster (< cluster_epsilon)
+    cluster_block_size: int = 2048  # rows per distance block (peak ~ block x n_faces x 4 bytes)
+    hierarchy_max_epsilon: float = 0.7  # largest eps /cluster/preview can cut at
+    hierarchy_cache_size: int = 8  # events whose density hierarchy is kept in memory
+    cluster_quality_enabled: bool = True  # silhouette / spread / margin in ml_jobs.result['quality']
+    cluster_quality_sample_size: int = 2000  # faces sampled for silhouette and margin (0 = all)
+    
+    # Image decoding
+    reduced_decode: bool = True  # decode large JPEGs at 1/2, 1/4 or 1/8 scale
+    decode_min_long_side: int = 1280  # min long side kept by reduced decoding
+    max_image_pixels: int = 100_000_000  # refuse larger images
+    
+    # Quality gate: only embed faces clustering would keep (detection + recognition models only)
+    quality_gate_enabled: bool = False
+    quality_gate_min_score: float = 0.7  # same cut as create_smart_clusters
+    quality_gate_min_face_px: int = 20  # min bbox side in decoded pixels
+    quality_gate_max_yaw: float = 0.8  # nose offset / eye distance, ~0 when frontal
+    quality_gate_min_sharpness: float = 0.0  # Laplacian variance of the aligned crop, 0 = off
+    
+    # Database access (Supabase REST)
+    db_max_connections: int = 20  # pooled keep-alive connections shared by all queries
+    db_timeout: float = 30.0  # seconds per request
+    db_http2: bool = True  # multiplex requests over HTTP/2 when the server supports it (needs h2)
     
     # Worker Configuration
     max_retries: int = 3
+    eager_model_load: bool = False  # load + warm models at startup, /ready false until done
+    warmup_det_sizes: List[int] = []  # det sizes warmed at startup (empty = det_size)
+    warmup_iterations: int = 2  # dummy inferences per det size
+    warmup_attempts: int = 3  # warm-up retries before /ready reports ready but degraded
     batch_size: int = 10
     timeout_seconds: int = 300
     
+    # Detection cache (content-hash keyed, disabled when no directory is set)
+    detection_cache_dir: Optional[str] = None
+    detection_cache_max_mb: int = 1024
+    
+    # Inference threads for /process and in-process detection (one model per thread)
+    inference_threads: int = 2
+    inference_onnx_threads: int = 0  # intra-op threads per inference thread (0 = cores / inference_threads)
+    inference_max_queue_depth: int = 8  # queued + running tasks before returning 503
+    inference_retry_after_seconds: int = 10
+    
+    # Detection process pool for /cluster step 0 (0 = detect in the API process)
+    detection_pool_size: int = 0
+    detection_pool_onnx_threads: int = 1  # intra-op threads per pool process
+    detection_pool_max_in_flight: int = 4  # media batches downloading/detecting at once
+    
+    # ONNX Runtime sessions (0 = onnxruntime default)
+    onnx_intra_op_threads: int = 0  # overridden by inference/pool per-model thread counts
+    onnx_inter_op_threads: int = 0
+    onnx_graph_optimization: Literal['disable', 'basic', 'extended', 'all'] = 'all'
+    onnx_execution_mode: Literal['sequential', 'parallel'] = 'sequential'
+    onnx_enable_mem_arena: bool = True
+    onnx_optimized_model_dir: Optional[str] = None  # cache of optimized graphs (unset = disabled)
+    
+    # INT8 models produced by quantize_models.py (unset = FP32 buffalo_l)
+    int8_model_dir: Optional[str] = None  # recognition model swapped when set
+    int8_detection: bool = False  # also swap the detection model
+    
     # GPU Configuration
     use_gpu: bool = False
     cuda_visible_devices: Optional[str] = "0"
@@ -0,0 +1,93 @@
+"""Decoding / encoding of face embeddings exchanged with the database"""
+
+import base64
+import numpy as np
+from typing import Sequence, Union
+
+EMBEDDING_DIM = 512
+
+
+def _decode_binary(value: Union[str, bytes], dim: int) -> np.ndarray:
+    """(dim,) float32 vector from base64 text or raw bytes of little-endian float32"""
+    if isinstance(value, str):
+        value = base64.b64decode(value)
+    if len(value) != dim * 4:
+        raise ValueError(f"Expected {dim * 4} bytes for a {dim}-dimensional embedding, got {len(value)}")
+    return np.frombuffer(value, dtype='<f4').astype(np.float32)
+
+
+def decode_embedding(value, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Decode one embedding as a float32 vector
+
+    Args:
+        value: pgvector text ('[0.1,0.2,...]'), base64 / bytes of
+            little-endian float32, or a sequence of floats
+        dim: expected number of dimensions
+
+    Returns:
+        (dim,) float32 array
+    """
+    if isinstance(value, str) and value.startswith('['):
+        vector = np.fromstring(value[1:-1], dtype=np.float64, sep=',').astype(np.float32)
+    elif isinstance(value, (str, bytes)):
+        vector = _decode_binary(value, dim)
+    else:
+        vector = np.asarray(value, dtype=np.float32)
+    if vector.shape != (dim,):
+        raise ValueError(f"Expected a {dim}-dimensional embedding, got shape {vector.shape}")
+    return vector
+
+
+def decode_embeddings(values: Sequence, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Decode a page of embeddings into one contiguous float32 matrix
+
+    pgvector text rows are joined into a single buffer parsed by one numpy
+    call, instead of one Python float() per element (512 per face). Values
+    are parsed as float64 then cast, so results are identical to
+    np.float32(float(x)) per element. Each row's element count is checked
+    first (a short row next to a long one must not shift the values of the
+    following faces). Rows in other formats go through decode_embedding.
+
+    Args:
+        values: embeddings in any format accepted by decode_embedding
+        dim: expected number of dimensions
+
+    Returns:
+        (len(values), dim) float32 array
+    
+    Raises:
+        ValueError: a row does not have dim values (or dim * 4 bytes)
+    """
+    matrix = np.empty((len(values), dim), dtype=np.float32)
+    text_rows = []
+    for i, value in enumerate(values):
+        if isinstance(value, str) and value.startswith('['):
+            text_rows.append(i)
+        else:
+            matrix[i] = decode_embedding(value, dim)
+
+    if text_rows:
+        for i in text_rows:
+            n_values = values[i].count(',') + 1
+            if n_values != dim:
+                raise ValueError(f"Expected a {dim}-dimensional embedding, got {n_values} values in row {i}")
+        flat = np.fromstring(','.join(values[i][1:-1] for i in text_rows), dtype=np.float64, sep=',')
+        if flat.size != len(text_rows) * dim:
+            raise ValueError(f"Expected {len(text_rows)} {dim}-dimensional embeddings, parsed {flat.size} values")
+        matrix[text_rows] = flat.reshape(len(text_rows), dim)
+    return matrix
+
+
+def encode_prototypes(prototypes: np.ndarray) -> str:
+    """Serialize a (k, 512) prototype matrix as base64 little-endian float32"""
+    return base64.b64encode(np.ascontiguousarray(prototypes, dtype='<f4').tobytes()).decode('ascii')
+
+
+def decode_prototypes(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Inverse of encode_prototypes"""
+    raw = base64.b64decode(text)
+    if len(raw) % (dim * 4):
+        raise ValueError(f"Expected a multiple of {dim * 4} bytes of prototypes, got {len(raw)}")
+    return np.frombuffer(raw, dtype='<f4').astype(np.float32).reshape(-1, dim)
@@ -0,0 +1,71 @@
+"""Storage precision of face embeddings held in memory by cluster jobs"""
+
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from app.config import settings
+
+EMBEDDING_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8,
+}
+
+
+def quantize_embeddings(
+    embeddings: np.ndarray,
+    precision: str
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert a float embedding matrix to the given storage precision
+
+    int8 uses symmetric per-vector quantization: each row is divided by its
+    own scale (max |x| / 127) and rounded.
+
+    Args:
+        embeddings: (n, 512) float embeddings
+        precision: 'float32', 'float16' or 'int8'
+
+    Returns:
+        Tuple of (values in the storage dtype, per-row scales for int8 else None)
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if precision != 'int8':
+        return embeddings.astype(EMBEDDING_DTYPES[precision], copy=False), None
+
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    values = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def dequantize_embeddings(values: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Inverse of quantize_embeddings, as float32"""
+    embeddings = values.astype(np.float32)
+    if scales is not None:
+        embeddings *= scales[:, None]
+    return embeddings
+
+
+def compact_embeddings(rows: Sequence, precision: Optional[str] = None) -> List[np.ndarray]:
+    """
+    Store parsed embeddings as rows of one contiguous matrix
+
+    A 512-float Python list costs ~16 KB; a row costs 2 KB (float32), 1 KB
+    (float16) or 512 bytes (int8). Rows are views of the matrix and can be
+    stacked with np.array(rows, dtype=np.float32) like lists.
+
+    int8 rows keep their quantized codes only: every similarity kernel of
+    the worker normalizes its inputs (cosine), which cancels the per-vector
+    scale, so the scale would only restore magnitudes nobody reads.
+
+    Args:
+        rows: embeddings (lists of floats or arrays)
+        precision: storage precision (defaults to settings.embedding_precision)
+
+    Returns:
+        One row view per input embedding
+    """
+    if not len(rows):
+        return []
+    values, _ = quantize_embeddings(np.asarray(rows, dtype=np.float32), precision or settings.embedding_precision)
+    return list(values)
@@ -0,0 +1,146 @@
+"""Array-backed batch of detected faces used inside the worker"""
+
+import io
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Any
+from app.models import DetectedFace, BoundingBox, Landmarks
+
+EMBEDDING_DIM = 512
+LANDMARK_NAMES = ['left_eye', 'right_eye', 'nose', 'mouth_left', 'mouth_right']
+
+
+@dataclass
+class FaceBatch:
+    """
+    Faces of one image (or several) stored column-wise
+
+    Attributes:
+        bboxes: (n, 4) float32, normalized [x, y, w, h]
+        landmarks: (n, 5, 2) float32, normalized points (NaN when unavailable)
+        scores: (n,) float32 detection confidence
+        embeddings: (n, 512) float32, L2-normalized (zeros where not embedded)
+        embedded: (n,) bool, False for faces rejected by the quality gate
+    """
+    bboxes: np.ndarray
+    landmarks: np.ndarray
+    scores: np.ndarray
+    embeddings: np.ndarray
+    embedded: np.ndarray
+
+    @classmethod
+    def empty(cls) -> 'FaceBatch':
+        """Batch with no faces"""
+        return cls(
+            bboxes=np.zeros((0, 4), dtype=np.float32),
+            landmarks=np.zeros((0, 5, 2), dtype=np.float32),
+            scores=np.zeros(0, dtype=np.float32),
+            embeddings=np.zeros((0, EMBEDDING_DIM), dtype=np.float32),
+            embedded=np.zeros(0, dtype=bool)
+        )
+
+    @classmethod
+    def concat(cls, batches: List['FaceBatch']) -> 'FaceBatch':
+        """Concatenate several batches into one"""
+        if not batches:
+            return cls.empty()
+        return cls(
+            bboxes=np.concatenate([b.bboxes for b in batches]),
+            landmarks=np.concatenate([b.landmarks for b in batches]),
+            scores=np.concatenate([b.scores for b in batches]),
+            embeddings=np.concatenate([b.embeddings for b in batches]),
+            embedded=np.concatenate([b.embedded for b in batches])
+        )
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def take(self, indices) -> 'FaceBatch':
+        """Sub-batch for the given indices (or boolean mask)"""
+        return FaceBatch(
+            bboxes=self.bboxes[indices],
+            landmarks=self.landmarks[indices],
+            scores=self.scores[indices],
+            embeddings=self.embeddings[indices],
+            embedded=self.embedded[indices]
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compact npz payload"""
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            bboxes=self.bboxes,
+            landmarks=self.landmarks,
+            scores=self.scores,
+            embeddings=self.embeddings,
+            embedded=self.embedded
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> 'FaceBatch':
+        """Deserialize a payload produced by to_bytes"""
+        arrays = np.load(io.BytesIO(payload))
+        return cls(
+            bboxes=arrays['bboxes'],
+            landmarks=arrays['landmarks'],
+            scores=arrays['scores'],
+            embeddings=arrays['embeddings'],
+            embedded=arrays['embedded']
+        )
+
+    def _bbox_dicts(self) -> List[Dict[str, float]]:
+        return [
+            {'x': x, 'y': y, 'w': w, 'h': h}
+            for x, y, w, h in self.bboxes.tolist()
+        ]
+
+    def _landmark_dicts(self) -> List[Any]:
+        has_landmarks = ~np.isnan(self.landmarks).any(axis=(1, 2))
+        return [
+            dict(zip(LANDMARK_NAMES, points)) if present else None
+            for points, present in zip(self.landmarks.tolist(), has_landmarks.tolist())
+        ]
+
+    def _embedding_lists(self) -> List[Any]:
+        return [
+            embedding if embedded else None
+            for embedding, embedded in zip(self.embeddings.tolist(), self.embedded.tolist())
+        ]
+
+    def to_rows(self, media_id: str, event_id: str) -> List[Dict[str, Any]]:
+        """Rows for the `faces` table (embedding NULL for gated-out faces)"""
+        return [
+            {
+                'media_id': media_id,
+                'event_id': event_id,
+                'bbox': bbox,
+                'embedding': embedding,
+                'quality_score': score,
+                'landmarks': landmarks
+            }
+            for bbox, embedding, score, landmarks in zip(
+                self._bbox_dicts(),
+                self._embedding_lists(),
+                self.scores.tolist(),
+                self._landmark_dicts()
+            )
+        ]
+
+    def to_detected_faces(self) -> List[DetectedFace]:
+        """Pydantic models for API responses"""
+        return [
+            DetectedFace(
+                bbox=BoundingBox(**bbox),
+                embedding=embedding,
+                quality_score=score,
+                landmarks=Landmarks(**landmarks) if landmarks else None
+            )
+            for bbox, embedding, score, landmarks in zip(
+                self._bbox_dicts(),
+                self._embedding_lists(),
+                self.scores.tolist(),
+                self._landmark_dicts()
+            )
+        ]
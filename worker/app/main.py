@@ -5,11 +5,14 @@ FastAPI ML Worker for Face Clustering
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 import time
 import httpx
 import numpy as np
-from typing import List, Dict
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
 import tempfile
 import os
 
@@ -17,51 +20,93 @@ from app.config import settings
 from app.models import (
     ProcessMediaRequest,
     ClusterEventRequest,
+    ClusterPreviewRequest,
     ProcessMediaResponse,
     ClusterEventResponse,
+    ClusterPreview,
+    ClusterPreviewResponse,
     ErrorResponse,
     HealthResponse,
+    ReadyResponse,
     JobStatus,
     ClusterInfo
 )
+from app.face_batch import FaceBatch
 from app.services.face_detector import face_detector
+from app.services.detection_pool import detection_pool
+from app.services.inference_executor import inference_executor, InferenceQueueFullError
+from app.services.detection_cache import detection_cache
 from app.services.clustering import clustering_service
 from app.services.supabase_client import supabase_service
 
 
-def create_smart_clusters(all_faces_data: List, clustering_service) -> Dict[int, List]:
+# Faces below this quality are left out of clustering
+SMART_CLUSTER_MIN_QUALITY = 0.7
+
+
+def create_smart_clusters(
+    all_faces_data: List,
+    clustering_service,
+    embeddings: Optional[np.ndarray] = None
+) -> Dict[int, List]:
     """
     Create smart clusters using global analysis:
     - Filter by quality (threshold 0.7)
     - Global clustering across all photos
     - High confidence assignments only
+    
+    Args:
+        all_faces_data: faces with embeddings and quality scores
+        clustering_service: service running the clustering
+        embeddings: float32 matrix of the faces' embeddings, row per face
+            (stacked from the faces when None)
     """
-    # Filter faces by quality
-    quality_threshold = 0.7
-    high_quality_faces = []
-    low_quality_faces = []
+    clusters, _ = create_smart_clusters_with_stats(all_faces_data, clustering_service, embeddings)
+    return clusters
+
+
+def create_smart_clusters_with_stats(
+    all_faces_data: List,
+    clustering_service,
+    embeddings: Optional[np.ndarray] = None
+) -> Tuple[Dict[int, List], Optional[float]]:
+    """
+    Same as create_smart_clusters, also reporting the coreset pass
     
-    for face_data in all_faces_data:
-        if face_data['quality_score'] >= quality_threshold:
-            high_quality_faces.append(face_data)
-        else:
-            low_quality_faces.append(face_data)
+    Returns:
+        Tuple of (confident clusters, coreset reduction of this run or None)
+    """
+    # Filter faces by quality
+    quality_threshold = SMART_CLUSTER_MIN_QUALITY
+    high_quality_rows = [i for i, f in enumerate(all_faces_data) if f['quality_score'] >= quality_threshold]
+    high_quality_faces = [all_faces_data[i] for i in high_quality_rows]
     
-    logger.info(f"Quality filtering: {len(high_quality_faces)} high quality, {len(low_quality_faces)} low quality")
+    logger.info(f"Quality filtering: {len(high_quality_faces)} high quality, "
+               f"{len(all_faces_data) - len(high_quality_faces)} low quality")
     
     if not high_quality_faces:
         logger.info("No high quality faces found, skipping AI clustering")
-        return {}
+        return {}, None
     
     # Extract embeddings for high quality faces
     face_ids = [f['id'] for f in high_quality_faces]
-    embeddings = np.array([f['embedding'] for f in high_quality_faces], dtype=np.float32)
+    if embeddings is None:
+        embeddings = np.array([f['embedding'] for f in high_quality_faces], dtype=np.float32)
+    else:
+        embeddings = embeddings[high_quality_rows]
     quality_scores = [f['quality_score'] for f in high_quality_faces]
     
     # Perform global clustering with strict parameters
     logger.info(f"Performing global clustering on {len(embeddings)} high quality faces...")
-    clusters = clustering_service.cluster_faces(embeddings, face_ids, quality_scores)
-    
+    groups = [f.get('media_id') for f in high_quality_faces]
+    clusters, coreset_reduction = clustering_service.cluster_faces_with_stats(
+        embeddings, face_ids, quality_scores, groups
+    )
+    return filter_confident_clusters(clusters), coreset_reduction
+
+
+def filter_confident_clusters(clusters: Dict[int, List]) -> Dict[int, List]:
+    """Drop noise and low-quality singletons, renumbering clusters from 0"""
     # Filter clusters by confidence (min 2 faces per cluster for confidence)
     confident_clusters = {}
     cluster_label = 0
@@ -85,10 +130,20 @@ def create_smart_clusters(all_faces_data: List, clustering_service) -> Dict[int,
 
 
 from app.services.smart_clustering import SmartClusteringService
+from app.embedding_codec import encode_prototypes
 from app import __version__
 
 # Initialize smart clustering service
-smart_clustering_service = SmartClusteringService(similarity_threshold=0.6)
+smart_clustering_service = SmartClusteringService(
+    similarity_threshold=0.6,
+    min_margin=settings.assignment_min_margin
+)
+
+# Stricter matcher for pre-linking new clusters to users across events
+identity_matcher = SmartClusteringService(
+    similarity_threshold=settings.identity_link_threshold,
+    min_margin=settings.identity_link_min_margin
+)
 
 # Configure logging
 logging.basicConfig(
@@ -118,33 +173,121 @@ app.add_middleware(
 # Startup & Health
 # ============================================
 
+# Readiness: false while eager warm-up is running
+worker_ready = not settings.eager_model_load
+warmup_seconds: Optional[float] = None
+# True when every warm-up attempt failed (ready anyway, models load on first request)
+worker_degraded = False
+
+
+async def warm_up_models():
+    """
+    Load every model copy and run dummy inferences at each warm-up det size
+    
+    Failed attempts are retried (settings.warmup_attempts, with backoff).
+    If all fail, the worker is still marked ready, flagged degraded, so it
+    does not stay out of rotation forever.
+    """
+    global worker_ready, warmup_seconds, worker_degraded
+    det_sizes = settings.warmup_det_sizes or [settings.det_size]
+    start = time.perf_counter()
+    attempts = max(1, settings.warmup_attempts)
+    for attempt in range(1, attempts + 1):
+        try:
+            logger.info(f"Warming up models (det sizes {det_sizes}, {settings.warmup_iterations} iterations)...")
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, inference_executor.warmup, det_sizes, settings.warmup_iterations)
+            if detection_pool.is_enabled():
+                await detection_pool.warmup(det_sizes, settings.warmup_iterations)
+            
+            warmup_seconds = time.perf_counter() - start
+            worker_ready = True
+            logger.info(f"ML Worker ready (warm-up took {warmup_seconds:.1f}s)")
+            return
+        except Exception as e:
+            logger.error(f"Model warm-up failed (attempt {attempt}/{attempts}): {e}")
+            if attempt < attempts:
+                await asyncio.sleep(2 ** attempt)
+    
+    warmup_seconds = time.perf_counter() - start
+    worker_degraded = True
+    worker_ready = True
+    logger.warning("⚠️ ML Worker ready but degraded: warm-up failed, models will load on first request")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize ML model on startup"""
     logger.info("Starting up ML Worker...")
     try:
-        # Lazy load - model will be loaded on first request
-        logger.info("ML Worker ready (model will load on first request)")
+        inference_executor.start()
+        
+        if settings.eager_model_load:
+            # Warm up in the background: /health answers meanwhile, /ready stays false
+            asyncio.create_task(warm_up_models())
+        else:
+            # Lazy load - model will be loaded on first request
+            logger.info("ML Worker ready (model will load on first request)")
     except Exception as e:
         logger.error(f"Startup failed: {e}")
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background detection threads and processes, close database connections"""
+    inference_executor.shutdown()
+    detection_pool.shutdown()
+    await supabase_service.close()
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
     return HealthResponse(
         status="healthy",
         version=__version__,
-        model_loaded=face_detector.is_initialized(),
-        gpu_available=settings.use_gpu
+        model_loaded=face_detector.is_initialized() or inference_executor.model_loaded(),
+        gpu_available=settings.use_gpu,
+        detection_cache=detection_cache.stats() if detection_cache.is_enabled() else None
     )
 
 
+@app.get("/ready", response_model=ReadyResponse)
+async def readiness_check():
+    """Readiness probe: 503 until eager model warm-up has finished (or given up, degraded)"""
+    response = ReadyResponse(ready=worker_ready, warmup_seconds=warmup_seconds, degraded=worker_degraded)
+    if not worker_ready:
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
+
+
 # ============================================
 # Helper Functions
 # ============================================
 
+async def reject_queue_full(job_id: str) -> JSONResponse:
+    """
+    Tell the poller to back off (503). The job status is left alone: the
+    poller that claimed the job retries it after Retry-After, so no other
+    poller can pick it up meanwhile.
+    """
+    logger.warning(f"Inference queue full, rejecting job {job_id}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Inference queue full, retry later", "job_id": job_id},
+        headers={"Retry-After": str(settings.inference_retry_after_seconds)}
+    )
+
+
+def decode_and_detect(detector, image_bytes: bytes) -> FaceBatch:
+    """Decode an image and detect its faces (runs on an inference thread)"""
+    faces = detector.detect_faces_from_bytes([image_bytes])[0]
+    if faces is None:
+        raise ValueError("Failed to load image")
+    return faces
+
+
 async def send_callback(job_id: str, status: str, result: dict = None, error: str = None):
     """Send callback to Edge Function"""
     try:
@@ -179,6 +322,421 @@ async def download_image(url: str) -> bytes:
         raise HTTPException(status_code=500, detail=f"Failed to download image: {str(e)}")
 
 
+async def download_media(media: Dict) -> Optional[bytes]:
+    """Download a media file through a short-lived signed URL (None on failure)"""
+    try:
+        # Generate signed URL (5 minutes)
+        signed_url = await supabase_service.create_signed_url(media['storage_path'], 60 * 5)
+        
+        if not signed_url:
+            logger.warning(f"Failed to generate signed URL for media {media['id']}")
+            return None
+        
+        logger.info(f"Processing media {media['id'][:8]}...")
+        return await download_image(signed_url)
+    except Exception as e:
+        logger.error(f"Error downloading media {media['id']}: {e}")
+        return None
+
+
+async def detect_media_batch(event_id: str, media_batch: List[Dict]):
+    """
+    Download a batch of media, detect their faces and save them
+    
+    Detection runs in the detection pool when enabled, in-process otherwise.
+    Errors are logged per media so one bad photo doesn't stop the event.
+    """
+    downloads = await asyncio.gather(*[download_media(media) for media in media_batch])
+    batch_media = [media for media, image_bytes in zip(media_batch, downloads) if image_bytes is not None]
+    batch_bytes = [image_bytes for image_bytes in downloads if image_bytes is not None]
+    
+    if not batch_bytes:
+        return
+    
+    # Reuse cached detections for images already seen (duplicate uploads, re-runs)
+    batch_faces: List[Optional[FaceBatch]] = [None] * len(batch_bytes)
+    cache_keys: List[Optional[str]] = [None] * len(batch_bytes)
+    if detection_cache.is_enabled():
+        # Hashing and SQLite lookups run off the event loop
+        cache_keys, batch_faces = await asyncio.to_thread(detection_cache.lookup_many, batch_bytes)
+    
+    missing = [i for i, faces in enumerate(batch_faces) if faces is None]
+    if len(missing) < len(batch_bytes):
+        logger.info(f"Detection cache: {len(batch_bytes) - len(missing)}/{len(batch_bytes)} media served from cache")
+    
+    if missing:
+        missing_bytes = [batch_bytes[i] for i in missing]
+        try:
+            if detection_pool.is_enabled():
+                detected = await detection_pool.detect(missing_bytes)
+            else:
+                detected = await inference_executor.run(
+                    lambda detector: detector.detect_faces_from_bytes(missing_bytes),
+                    wait=True
+                )
+        except Exception as e:
+            logger.error(f"Error detecting faces on batch of {len(missing_bytes)} media: {e}")
+            detected = [None] * len(missing)
+        
+        for i, faces in zip(missing, detected):
+            batch_faces[i] = faces
+        
+        new_entries = [
+            (cache_keys[i], batch_faces[i]) for i in missing
+            if batch_faces[i] is not None and cache_keys[i] is not None
+        ]
+        if new_entries:
+            await asyncio.to_thread(detection_cache.put_many, new_entries)
+    
+    for media, faces in zip(batch_media, batch_faces):
+        if faces is None:
+            logger.warning(f"Failed to detect faces for media {media['id']}")
+            continue
+        
+        # Save faces to database
+        if len(faces) == 0:
+            logger.info(f"No faces detected in media {media['id'][:8]}")
+        elif await supabase_service.insert_face_batch(faces, media['id'], event_id):
+            logger.info(f"Saved {len(faces)} faces for media {media['id'][:8]}")
+        else:
+            logger.error(f"Error saving faces for media {media['id']}")
+
+
+def centroids_enabled() -> bool:
+    """Cluster centroids are maintained once incremental mode is configured (needs its migration)"""
+    return settings.clustering_mode == 'incremental'
+
+
+def cluster_quality_report(
+    faces: List[Dict],
+    new_clusters: Dict[int, List],
+    embeddings: Optional[np.ndarray] = None
+) -> Optional[Dict]:
+    """
+    Quality metrics of the event clustering for ml_jobs.result
+    
+    Args:
+        faces: event faces with embeddings; face_person_id set for faces in existing clusters
+        new_clusters: clusters created in this run (label -> [(face_id, quality), ...])
+        embeddings: float32 matrix of the faces' embeddings (the faces' own,
+            possibly compact, rows when None; read in blocks)
+    
+    Returns:
+        Metrics from ClusteringService.compute_quality_metrics, None if disabled or failed
+    """
+    if not settings.cluster_quality_enabled or not faces:
+        return None
+    
+    labels_by_face = {f['id']: f['face_person_id'] for f in faces if f.get('face_person_id')}
+    for label, cluster_faces in new_clusters.items():
+        if label != -1:
+            labels_by_face.update({face_id: f"new-{label}" for face_id, _ in cluster_faces})
+    
+    try:
+        start = time.time()
+        if embeddings is None:
+            embeddings = [f['embedding'] for f in faces]
+        quality = clustering_service.compute_quality_metrics(
+            embeddings,
+            np.array([labels_by_face.get(f['id'], -1) for f in faces], dtype=object),
+            settings.cluster_quality_sample_size
+        )
+        if quality:
+            quality['seconds'] = round(time.time() - start, 3)
+            logger.info(f"Cluster quality: silhouette {quality['silhouette']:.3f}, "
+                       f"spread {quality['spread_mean']:.3f}, margin p10 {quality['margin_p10']:.3f}")
+        return quality or None
+    except Exception as e:
+        logger.warning(f"Could not compute cluster quality: {e}")
+        return None
+
+
+def prototypes_enabled() -> bool:
+    """Multi-prototype cluster representations are configured (needs its migration)"""
+    return settings.cluster_prototype_count > 0
+
+
+def cluster_representation(embeddings: List[np.ndarray]) -> Dict:
+    """face_persons centroid / prototypes columns for a set of face embeddings"""
+    matrix = np.array(embeddings, dtype=np.float32)
+    columns = {}
+    if centroids_enabled():
+        centroids, counts = smart_clustering_service.compute_centroids(
+            matrix, np.zeros(len(matrix), dtype=int), 1
+        )
+        columns.update({'centroid': centroids[0].tolist(), 'centroid_count': int(counts[0])})
+    if prototypes_enabled():
+        columns['prototypes'] = encode_prototypes(
+            smart_clustering_service.select_prototypes(matrix, settings.cluster_prototype_count)
+        )
+    return columns
+
+
+async def refresh_cluster_representations(
+    clusters: List[Dict],
+    faces: List[Dict],
+    representations: Dict[str, Dict],
+    assigned_faces: List[Dict]
+):
+    """
+    Recompute face count, centroid and prototypes of existing clusters from all their faces
+    
+    Only clusters whose membership changed are written: faces joined them
+    in this run, their face count differs from the stored one, or their
+    centroid / prototypes were never computed.
+    
+    Args:
+        clusters: preserved face_persons (with metadata)
+        faces: event faces with embeddings and up-to-date face_person_id
+        representations: face_person id -> stored centroid / centroid_count / prototypes
+        assigned_faces: assignments made to these clusters in this run
+    """
+    members = defaultdict(list)
+    for face in faces:
+        if face.get('face_person_id'):
+            members[face['face_person_id']].append(face['embedding'])
+    joined = {assignment['face_person_id'] for assignment in assigned_faces}
+    
+    updates = []
+    for cluster in clusters:
+        embeddings = members.get(cluster['id'])
+        if not embeddings:
+            continue
+        metadata = cluster.get('metadata') or {}
+        stored = representations.get(cluster['id'], {})
+        changed = (
+            cluster['id'] in joined
+            or metadata.get('face_count') != len(embeddings)
+            or (centroids_enabled() and (
+                stored.get('centroid') is None or stored.get('centroid_count') != len(embeddings)
+            ))
+            or (prototypes_enabled() and stored.get('prototypes') is None)
+        )
+        if changed:
+            updates.append({
+                'id': cluster['id'],
+                'metadata': {**metadata, 'face_count': len(embeddings)},
+                **cluster_representation(embeddings)
+            })
+    if updates:
+        await supabase_service.update_cluster_representations(updates)
+
+
+async def tag_linked_cluster_faces(event_id: str, linked_clusters: List[Dict], faces: List[Dict]):
+    """Create media_tags for the faces of clusters linked to a user"""
+    logger.info(f"Found {len(linked_clusters)} linked clusters, creating tags for all their faces...")
+    
+    # event_member of every linked user, fetched once for the event
+    members = await supabase_service.get_event_member_users(event_id)
+    
+    tags = []
+    for cluster in linked_clusters:
+        # Get all faces belonging to this cluster (now includes updated assignments)
+        cluster_faces = [f for f in faces if f.get('face_person_id') == cluster['id']]
+        logger.info(f"Cluster {cluster['id'][:8]}: {len(cluster_faces)} faces, linked_user_id: {cluster['linked_user_id'][:8]}")
+        
+        member_id = members.get(cluster['linked_user_id'])
+        if not member_id:
+            logger.warning(f"⚠️ No event_member found for user {cluster['linked_user_id'][:8]}")
+            continue
+        
+        for face in cluster_faces:
+            tags.append({
+                'media_id': face['media_id'],
+                'member_id': member_id,
+                'tagged_by': cluster['linked_user_id'],  # System-tagged
+                'source': 'face_clustering',
+                'bbox': face.get('bbox'),
+                'face_id': face['id']
+            })
+    
+    # Create or update all the media_tags in one request
+    if tags and await supabase_service.upsert_media_tags(tags):
+        logger.info(f"✅ Created {len(tags)} tags for {len(linked_clusters)} linked clusters")
+
+
+async def mark_identities_stale(linked_clusters: List[Dict], assignments: List[Dict]):
+    """Flag identity prototypes of users whose linked clusters received faces"""
+    if not settings.identity_index_enabled or not assignments:
+        return
+    cluster_users = {c['id']: c['linked_user_id'] for c in linked_clusters}
+    users = {cluster_users[a['face_person_id']] for a in assignments if a['face_person_id'] in cluster_users}
+    await supabase_service.mark_users_stale(sorted(users))
+
+
+async def prelink_new_clusters(event_id: str, face_assignments: List[Dict], faces: List[Dict]) -> int:
+    """
+    Link new clusters to event members recognized by the identity index
+    
+    Stale members of the index (links changed since their prototypes were
+    computed) are recomputed first; then the faces of all new clusters are
+    matched against all members' prototypes in one pass, and clusters with
+    a confident best member are linked and tagged.
+    
+    Args:
+        event_id: event being clustered
+        face_assignments: faces of the new clusters ({'face_id', 'face_person_id'})
+        faces: face dicts with their embedding (and media_id for tags)
+    
+    Returns:
+        Number of clusters linked
+    """
+    if not settings.identity_index_enabled or not face_assignments:
+        return 0
+    
+    members = await supabase_service.get_event_member_users(event_id)
+    index = await supabase_service.get_user_prototypes(list(members))
+    if index is None:
+        logger.warning("Identity index unavailable (is face_identity_index.sql applied?)")
+        return 0
+    
+    for user_id, entry in index.items():
+        if entry['stale']:
+            embeddings = await supabase_service.get_user_linked_embeddings(user_id)
+            entry['prototypes'] = smart_clustering_service.select_prototypes(
+                np.array(embeddings, dtype=np.float32), settings.identity_prototype_count
+            ) if embeddings else None
+            await supabase_service.save_user_prototypes(
+                user_id,
+                encode_prototypes(entry['prototypes']) if entry['prototypes'] is not None else None,
+                len(embeddings)
+            )
+    
+    users = [user_id for user_id, entry in index.items() if entry['prototypes'] is not None]
+    faces_by_id = {f['id']: f for f in faces}
+    assignments = [a for a in face_assignments if a['face_id'] in faces_by_id]
+    if not users or not assignments:
+        return 0
+    
+    cluster_ids = list(dict.fromkeys(a['face_person_id'] for a in assignments))
+    cluster_index = {cluster_id: i for i, cluster_id in enumerate(cluster_ids)}
+    best_idx, best_sim, _, accepted = identity_matcher.match_clusters_to_prototypes(
+        np.array([faces_by_id[a['face_id']]['embedding'] for a in assignments], dtype=np.float32),
+        np.array([cluster_index[a['face_person_id']] for a in assignments]),
+        len(cluster_ids),
+        [index[user_id]['prototypes'] for user_id in users]
+    )
+    
+    links = [
+        {'id': cluster_ids[i], 'linked_user_id': users[best_idx[i]]}
+        for i in np.flatnonzero(accepted).tolist()
+    ]
+    if links:
+        logger.info(f"Identity index: pre-linking {len(links)} of {len(cluster_ids)} new clusters "
+                   f"(min similarity {best_sim[accepted].min():.3f})")
+        await supabase_service.link_face_persons(links)
+        for a in assignments:
+            faces_by_id[a['face_id']]['face_person_id'] = a['face_person_id']
+        await tag_linked_cluster_faces(event_id, links, [faces_by_id[a['face_id']] for a in assignments])
+    return len(links)
+
+
+async def create_new_clusters(
+    event_id: str,
+    clusters: Dict[int, List],
+    embeddings_by_id: Dict[str, np.ndarray]
+) -> Tuple[List[ClusterInfo], int, int, List[Dict]]:
+    """
+    Create face_persons for new clusters and assign their faces
+    
+    Args:
+        event_id: event being clustered
+        clusters: create_smart_clusters output (label -> [(face_id, quality), ...])
+        embeddings_by_id: embedding of every clustered face (for centroids)
+    
+    Returns:
+        Tuple of (cluster infos, number of face_persons created, next free
+        cluster_label, face assignments made)
+    """
+    # Get max cluster_label to avoid conflicts
+    max_existing_label = await supabase_service.get_max_cluster_label(event_id)
+    label_offset = max_existing_label + 1
+    logger.info(f"Max existing cluster_label: {max_existing_label}, using offset: {label_offset}")
+    
+    # Create face_persons and update assignments
+    face_persons_data = []
+    face_assignments = []
+    cluster_infos = []
+    
+    # Map old labels to new labels (with offset)
+    label_mapping = {}
+    
+    for cluster_label, cluster_faces in clusters.items():
+        if cluster_label == -1:
+            # Skip noise for now (could handle separately)
+            continue
+        
+        # Apply offset to avoid conflicts
+        new_label = cluster_label + label_offset
+        label_mapping[cluster_label] = new_label
+        
+        # Select representative face
+        representative_id = clustering_service.select_representative_face(cluster_faces)
+        
+        # Compute stats
+        stats = clustering_service.compute_cluster_stats(cluster_faces)
+        
+        # Mark as AI-generated cluster
+        stats['is_ai_generated'] = True
+        stats['confidence'] = 'high' if len(cluster_faces) >= 2 else 'medium'
+        stats['face_count'] = len(cluster_faces)
+        
+        # Prepare face_person data with adjusted label
+        face_person = {
+            'event_id': event_id,
+            'cluster_label': new_label,
+            'representative_face_id': representative_id,
+            'status': 'pending',
+            'metadata': stats
+        }
+        face_person.update(cluster_representation([embeddings_by_id[face_id] for face_id, _ in cluster_faces]))
+        face_persons_data.append(face_person)
+    
+    # Insert face_persons (we need to get IDs back)
+    if face_persons_data:
+        logger.info(f"Creating {len(face_persons_data)} face_persons...")
+        success = await supabase_service.create_face_persons(face_persons_data)
+        if not success:
+            raise ValueError("Failed to create face_persons")
+        
+        # Fetch created face_persons to get IDs
+        label_to_id = await supabase_service.get_face_person_ids_by_label(event_id, label_offset)
+        
+        # Prepare face assignments using new labels
+        for old_label, cluster_faces in clusters.items():
+            if old_label == -1:
+                continue
+            
+            # Use the mapped label
+            new_label = label_mapping.get(old_label)
+            if new_label is None:
+                continue
+                
+            face_person_id = label_to_id.get(new_label)
+            if face_person_id:
+                for face_id, quality in cluster_faces:
+                    face_assignments.append({
+                        'face_id': face_id,
+                        'face_person_id': face_person_id
+                    })
+                
+                cluster_infos.append(ClusterInfo(
+                    cluster_label=new_label,
+                    face_count=len(cluster_faces),
+                    representative_face_id=clustering_service.select_representative_face(cluster_faces),
+                    avg_quality=float(np.mean([q for _, q in cluster_faces]))
+                ))
+        
+        # Update face assignments
+        if face_assignments:
+            logger.info(f"Updating {len(face_assignments)} face assignments...")
+            success = await supabase_service.update_face_assignments(face_assignments)
+            if not success:
+                logger.warning("Some face assignments may have failed")
+    
+    return cluster_infos, len(face_persons_data), label_offset + len(face_persons_data), face_assignments
+
+
 # ============================================
 # Face Detection Endpoint
 # ============================================
@@ -198,6 +756,9 @@ async def process_media(request: ProcessMediaRequest, background_tasks: Backgrou
     start_time = time.time()
     job_id = request.job_id
     
+    if inference_executor.is_saturated():
+        return await reject_queue_full(job_id)
+    
     logger.info(f"Processing media {request.media_id} for job {job_id}")
     
     try:
@@ -208,38 +769,33 @@ async def process_media(request: ProcessMediaRequest, background_tasks: Backgrou
         logger.info(f"Downloading image from {request.media_url[:50]}...")
         image_bytes = await download_image(request.media_url)
         
-        # Load image
-        image = face_detector.load_image_from_bytes(image_bytes)
-        if image is None:
-            raise ValueError("Failed to load image")
+        # Reuse cached detections when this exact image was already processed
+        # (hashing and SQLite lookups run off the event loop)
+        cache_key, faces = None, None
+        if detection_cache.is_enabled():
+            cache_keys, cached = await asyncio.to_thread(detection_cache.lookup_many, [image_bytes])
+            cache_key, faces = cache_keys[0], cached[0]
         
-        # Detect faces and generate embeddings
-        logger.info("Detecting faces...")
-        detected_faces = face_detector.detect_and_embed(image)
-        
-        # Prepare data for database
-        faces_data = []
-        for face in detected_faces:
-            faces_data.append({
-                'media_id': request.media_id,
-                'event_id': request.event_id,
-                'bbox': face.bbox.model_dump(),
-                'embedding': face.embedding,
-                'quality_score': face.quality_score,
-                'landmarks': face.landmarks.model_dump() if face.landmarks else None
-            })
+        if faces is None:
+            # Decode image, detect faces and generate embeddings off the event loop
+            logger.info("Detecting faces...")
+            faces = await inference_executor.run(decode_and_detect, image_bytes)
+            if cache_key:
+                await asyncio.to_thread(detection_cache.put, cache_key, faces)
+        else:
+            logger.info(f"Detection cache hit: {len(faces)} faces")
         
         # Insert into database
-        if faces_data:
-            success = await supabase_service.insert_faces(faces_data)
-            if not success:
-                raise ValueError("Failed to insert faces into database")
+        success = await supabase_service.insert_face_batch(faces, request.media_id, request.event_id)
+        if not success:
+            raise ValueError("Failed to insert faces into database")
+        clustering_service.invalidate_hierarchy(request.event_id)
         
         processing_time = time.time() - start_time
         
         result = {
             'media_id': request.media_id,
-            'faces_detected': len(detected_faces),
+            'faces_detected': len(faces),
             'processing_time_seconds': processing_time
         }
         
@@ -258,18 +814,22 @@ async def process_media(request: ProcessMediaRequest, background_tasks: Backgrou
             result=result
         )
         
-        logger.info(f"Successfully processed media {request.media_id}: {len(detected_faces)} faces in {processing_time:.2f}s")
+        logger.info(f"Successfully processed media {request.media_id}: {len(faces)} faces in {processing_time:.2f}s")
         
         return ProcessMediaResponse(
             job_id=job_id,
             media_id=request.media_id,
             event_id=request.event_id,
-            faces_detected=len(detected_faces),
-            faces=detected_faces,
+            faces_detected=len(faces),
+            faces=faces.to_detected_faces() if request.include_faces else [],
             processing_time_seconds=processing_time,
             status=JobStatus.COMPLETED
         )
         
+    except InferenceQueueFullError:
+        # Not a failure: the job is retried once the queue drains
+        return await reject_queue_full(job_id)
+        
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error processing media {request.media_id}: {error_msg}")
@@ -297,6 +857,180 @@ async def process_media(request: ProcessMediaRequest, background_tasks: Backgrou
 # Clustering Endpoint
 # ============================================
 
+async def cluster_event_incremental(
+    request: ClusterEventRequest,
+    background_tasks: BackgroundTasks,
+    start_time: float
+) -> Optional[ClusterEventResponse]:
+    """
+    Incremental clustering: only faces without a cluster are processed
+    
+    Unassigned faces are matched against the centroid of every active
+    cluster; matched faces join it (running-mean centroid update), the
+    others stay unassigned as a buffer and DBSCAN runs over that buffer
+    only. Faces left as noise are marked considered and stay in the buffer,
+    so a person whose photos arrive one or two per run is clustered once
+    enough of them accumulate. Only faces not yet considered count against
+    incremental_max_new_faces. The buffer is bounded: faces leave it after
+    incremental_buffer_max_age_hours (they are no longer read) and only the
+    incremental_max_buffered_faces most recently considered ones are kept.
+    Faces that leave it stay unassigned, like the noise of a full run, which
+    re-clusters them with every other face.
+    
+    Returns:
+        The job response, or None when a full run is needed (no centroids
+        yet, migration missing, or too many new faces)
+    """
+    job_id = request.job_id
+    event_id = request.event_id
+    
+    existing_clusters = await supabase_service.get_cluster_representations(event_id)
+    if existing_clusters is None:
+        logger.warning("Cluster centroids unavailable (is face_clustering_incremental.sql applied?)")
+        return None
+    
+    active_clusters = [c for c in existing_clusters if smart_clustering_service.should_preserve_cluster(c)]
+    if not active_clusters or any(c.get('centroid') is None for c in active_clusters):
+        logger.info("Clusters without centroids, a full run is needed first")
+        return None
+    
+    # Unassigned faces: new arrivals and the buffer recent runs left as noise
+    buffer_start = datetime.now(timezone.utc) - timedelta(hours=settings.incremental_buffer_max_age_hours)
+    unassigned_faces = await supabase_service.get_event_faces(
+        event_id, include_assigned=False, considered_after=buffer_start.isoformat()
+    )
+    arrived = [f for f in unassigned_faces if not f.get('cluster_considered_at')]
+    if len(arrived) > settings.incremental_max_new_faces:
+        logger.info(f"{len(arrived)} new faces, above incremental limit {settings.incremental_max_new_faces}")
+        return None
+    buffered = sorted(
+        (f for f in unassigned_faces if f.get('cluster_considered_at')),
+        key=lambda f: f['cluster_considered_at'],
+        reverse=True
+    )[:max(0, settings.incremental_max_buffered_faces)]
+    new_faces = arrived + buffered
+    arrived_count, buffered_count = len(arrived), len(buffered)
+    
+    logger.info(f"Incremental clustering: {arrived_count} new faces, {buffered_count} buffered, "
+               f"{len(active_clusters)} clusters")
+    
+    # Match new faces to cluster centroids (and prototypes when stored)
+    # (float32 matrix stacked once, for matching, clustering and quality metrics)
+    face_matrix = np.array([f['embedding'] for f in new_faces], dtype=np.float32)
+    assigned_faces = []
+    buffered_rows = list(range(len(new_faces)))
+    if new_faces:
+        centroids = np.array([c['centroid'] for c in active_clusters], dtype=np.float32)
+        counts = np.array([c.get('centroid_count') or 0 for c in active_clusters])
+        cluster_vectors = [
+            np.vstack([c['prototypes'], centroids[i]]) if c.get('prototypes') is not None else centroids[i:i + 1]
+            for i, c in enumerate(active_clusters)
+        ]
+        best_idx, _, _, accepted = smart_clustering_service.match_prototypes(face_matrix, cluster_vectors)
+        
+        buffered_rows = []
+        for row, (face, idx, is_accepted) in enumerate(zip(new_faces, best_idx.tolist(), accepted.tolist())):
+            if is_accepted:
+                face['face_person_id'] = active_clusters[idx]['id']
+                assigned_faces.append({'face_id': face['id'], 'face_person_id': face['face_person_id']})
+            else:
+                buffered_rows.append(row)
+        
+        if assigned_faces:
+            logger.info(f"Assigning {len(assigned_faces)} faces to existing clusters...")
+            await supabase_service.update_face_assignments(assigned_faces)
+            
+            new_centroids, new_counts = smart_clustering_service.update_centroids(
+                centroids, counts, face_matrix[accepted], best_idx[accepted]
+            )
+            updates = []
+            for i in np.unique(best_idx[accepted]).tolist():
+                metadata = active_clusters[i].get('metadata') or {}
+                update = {
+                    'id': active_clusters[i]['id'],
+                    'centroid': new_centroids[i].tolist(),
+                    'centroid_count': int(new_counts[i]),
+                    'metadata': {
+                        **metadata,
+                        'face_count': (metadata.get('face_count') or 0) + int(new_counts[i] - counts[i])
+                    }
+                }
+                if prototypes_enabled():
+                    # Re-select prototypes among the current ones and the new faces
+                    candidates = [face_matrix[accepted & (best_idx == i)]]
+                    if active_clusters[i].get('prototypes') is not None:
+                        candidates.append(active_clusters[i]['prototypes'])
+                    update['prototypes'] = encode_prototypes(smart_clustering_service.select_prototypes(
+                        np.vstack(candidates), settings.cluster_prototype_count
+                    ))
+                updates.append(update)
+            await supabase_service.update_cluster_representations(updates)
+            
+            linked_clusters = [c for c in active_clusters if c['status'] == 'linked' and c.get('linked_user_id')]
+            if linked_clusters:
+                await tag_linked_cluster_faces(
+                    event_id, linked_clusters, [f for f in new_faces if f.get('face_person_id')]
+                )
+                await mark_identities_stale(linked_clusters, assigned_faces)
+    
+    # DBSCAN over the buffer of unmatched faces only
+    buffered_faces = [new_faces[row] for row in buffered_rows]
+    cluster_infos = []
+    clusters_created = 0
+    clusters = {}
+    coreset_reduction = None
+    new_assignments = []
+    prelinked = 0
+    if len(buffered_faces) >= settings.min_cluster_size:
+        clusters, coreset_reduction = await asyncio.to_thread(
+            create_smart_clusters_with_stats, buffered_faces, clustering_service, face_matrix[buffered_rows]
+        )
+        cluster_infos, clusters_created, _, new_assignments = await create_new_clusters(
+            event_id, clusters, {f['id']: f['embedding'] for f in buffered_faces}
+        )
+        prelinked = await prelink_new_clusters(event_id, new_assignments, buffered_faces)
+    
+    # Faces still unassigned stay in the buffer for the next runs
+    clustered_ids = {assignment['face_id'] for assignment in new_assignments}
+    noise_faces = [f for f in buffered_faces if f['id'] not in clustered_ids]
+    await supabase_service.mark_faces_considered(
+        [f['id'] for f in noise_faces if not f.get('cluster_considered_at')]
+    )
+    still_buffered = len(noise_faces)
+    
+    processing_time = time.time() - start_time
+    result = {
+        'event_id': event_id,
+        'mode': 'incremental',
+        'total_faces': len(new_faces),
+        'preserved_clusters': len(active_clusters),
+        'assigned_to_existing': len(assigned_faces),
+        'new_clusters_created': clusters_created,
+        'prelinked_clusters': prelinked,
+        'noise_faces': still_buffered,
+        'processing_time_seconds': processing_time,
+        'coreset_reduction': coreset_reduction,
+        'quality': cluster_quality_report(new_faces, clusters, face_matrix)
+    }
+    
+    await supabase_service.update_job_status(job_id, "completed", result=result)
+    background_tasks.add_task(send_callback, job_id, "completed", result=result)
+    
+    logger.info(f"Incrementally clustered event {event_id}: {len(assigned_faces)} assigned, "
+               f"{clusters_created} new clusters, {still_buffered} buffered in {processing_time:.2f}s")
+    
+    return ClusterEventResponse(
+        job_id=job_id,
+        event_id=event_id,
+        total_faces=len(new_faces),
+        clusters_created=clusters_created,
+        noise_faces=still_buffered,
+        clusters=cluster_infos,
+        processing_time_seconds=processing_time,
+        status=JobStatus.COMPLETED
+    )
+
+
 @app.post("/cluster", response_model=ClusterEventResponse)
 async def cluster_event(request: ClusterEventRequest, background_tasks: BackgroundTasks):
     """
@@ -313,7 +1047,11 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
     start_time = time.time()
     job_id = request.job_id
     
+    if inference_executor.is_saturated():
+        return await reject_queue_full(job_id)
+    
     logger.info(f"Clustering event {request.event_id} for job {job_id}")
+    clustering_service.invalidate_hierarchy(request.event_id)
     
     try:
         # Update job status
@@ -322,79 +1060,49 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
         # Step 0: Detect faces on unprocessed media
         logger.info("Checking for unprocessed media...")
         
-        # Get all media for this event
-        media_response = supabase_service.client.table('media') \
-            .select('id, storage_path') \
-            .eq('event_id', request.event_id) \
-            .execute()
-        
-        all_media = media_response.data if media_response.data else []
-        
-        # Get media that already have faces detected
-        faces_response = supabase_service.client.table('faces') \
-            .select('media_id') \
-            .eq('event_id', request.event_id) \
-            .execute()
-        
-        processed_media_ids = set(f['media_id'] for f in (faces_response.data or []))
+        # Media of the event, media that already have faces and existing
+        # clusters (step 1, untouched by detection) are fetched concurrently
+        all_media, processed_media_ids, existing_clusters = await asyncio.gather(
+            supabase_service.get_event_media(request.event_id),
+            supabase_service.get_processed_media_ids(request.event_id),
+            supabase_service.get_existing_face_persons(request.event_id)
+        )
         unprocessed_media = [m for m in all_media if m['id'] not in processed_media_ids]
         
         logger.info(f"Found {len(unprocessed_media)} unprocessed media out of {len(all_media)} total")
         
-        # Detect faces on unprocessed media
+        # Detect faces on unprocessed media, settings.batch_size photos at a time
+        # so that recognition runs on all faces of the batch at once
         if unprocessed_media:
             logger.info(f"Detecting faces on {len(unprocessed_media)} new photos...")
-            for media in unprocessed_media:
-                try:
-                    # Generate signed URL
-                    signed_url_response = supabase_service.client.storage.from_('media').create_signed_url(
-                        media['storage_path'],
-                        60 * 5  # 5 minutes
-                    )
-                    
-                    if not signed_url_response or 'signedURL' not in signed_url_response:
-                        logger.warning(f"Failed to generate signed URL for media {media['id']}")
-                        continue
-                    
-                    signed_url = signed_url_response['signedURL']
-                    
-                    # Download and detect faces
-                    logger.info(f"Processing media {media['id'][:8]}...")
-                    image_bytes = await download_image(signed_url)
-                    image = face_detector.load_image_from_bytes(image_bytes)
-                    
-                    if image is None:
-                        logger.warning(f"Failed to load image for media {media['id']}")
-                        continue
-                    
-                    detected_faces = face_detector.detect_and_embed(image)
-                    
-                    # Save faces to database
-                    if detected_faces:
-                        faces_data = []
-                        for face in detected_faces:
-                            faces_data.append({
-                                'media_id': media['id'],
-                                'event_id': request.event_id,
-                                'bbox': face.bbox.model_dump(),
-                                'embedding': face.embedding,  # Already a list from face_detector
-                                'quality_score': float(face.quality_score)
-                            })
-                        
-                        supabase_service.client.table('faces').insert(faces_data).execute()
-                        logger.info(f"Saved {len(detected_faces)} faces for media {media['id'][:8]}")
-                    else:
-                        logger.info(f"No faces detected in media {media['id'][:8]}")
-                        
-                except Exception as e:
-                    logger.error(f"Error processing media {media['id']}: {e}")
-                    # Continue with other media
-                    continue
+            media_batches = [
+                unprocessed_media[batch_start:batch_start + settings.batch_size]
+                for batch_start in range(0, len(unprocessed_media), settings.batch_size)
+            ]
+            
+            if detection_pool.is_enabled():
+                # Spread batches over the pool processes, bounded in-flight
+                in_flight = asyncio.Semaphore(settings.detection_pool_max_in_flight)
+                
+                async def detect_bounded(media_batch):
+                    async with in_flight:
+                        await detect_media_batch(request.event_id, media_batch)
+                
+                await asyncio.gather(*[detect_bounded(media_batch) for media_batch in media_batches])
+            else:
+                for media_batch in media_batches:
+                    await detect_media_batch(request.event_id, media_batch)
         
-        # Step 1: Get existing clusters and determine which to preserve
-        logger.info("Fetching existing clusters...")
-        existing_clusters = await supabase_service.get_existing_face_persons(request.event_id)
+        # Incremental mode: match new faces against cluster centroids only
+        mode = request.mode or settings.clustering_mode
+        if mode == 'incremental':
+            if centroids_enabled():
+                response = await cluster_event_incremental(request, background_tasks, start_time)
+                if response is not None:
+                    return response
+            logger.info("Running a full clustering instead of an incremental one")
         
+        # Step 1: Determine which existing clusters to preserve
         preserve_clusters, delete_cluster_ids = smart_clustering_service.filter_preserved_and_deletable(existing_clusters)
         
         logger.info(f"Found {len(existing_clusters)} existing clusters: {len(preserve_clusters)} to preserve, {len(delete_cluster_ids)} to delete")
@@ -402,74 +1110,51 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
         # Step 2: Delete non-preserved clusters
         if delete_cluster_ids:
             logger.info(f"Deleting {len(delete_cluster_ids)} non-preserved clusters...")
-            for cluster_id in delete_cluster_ids:
-                supabase_service.client.table('face_persons').delete().eq('id', cluster_id).execute()
+            await supabase_service.delete_face_persons(delete_cluster_ids)
         
         # Step 3: Fetch ALL faces (including already assigned ones for potential reassignment)
         logger.info("Fetching all faces from database...")
         all_faces = await supabase_service.get_event_faces(request.event_id, include_assigned=True)
         
         # Step 4: Try to assign faces to existing preserved clusters
+        # (stored centroids / prototypes fetched once for the event when enabled)
+        representations = {}
+        if centroids_enabled() or prototypes_enabled():
+            representations = {
+                c['id']: c for c in await supabase_service.get_cluster_representations(request.event_id) or []
+            }
+        cluster_prototypes = {
+            cluster_id: c['prototypes'] for cluster_id, c in representations.items() if c.get('prototypes') is not None
+        }
+        
         assigned_faces, unassigned_faces = await smart_clustering_service.assign_faces_to_existing_clusters(
             all_faces,
             preserve_clusters,
-            supabase_service.get_face_embedding
+            supabase_service.get_face_embeddings,
+            cluster_prototypes
         )
         
         # Step 5: Update face assignments for faces matched to existing clusters
         if assigned_faces:
             logger.info(f"Updating {len(assigned_faces)} face assignments...")
+            await supabase_service.update_face_assignments(assigned_faces)
+            
+            # Also update in memory for the next step
+            faces_by_id = {face['id']: face for face in all_faces}
             for assignment in assigned_faces:
-                supabase_service.client.table('faces') \
-                    .update({'face_person_id': assignment['face_person_id']}) \
-                    .eq('id', assignment['face_id']) \
-                    .execute()
-                
-                # Also update in memory for the next step
-                for face in all_faces:
-                    if face['id'] == assignment['face_id']:
-                        face['face_person_id'] = assignment['face_person_id']
-                        break
+                faces_by_id[assignment['face_id']]['face_person_id'] = assignment['face_person_id']
+        
+        # Keep face count, centroid and prototypes of preserved clusters in sync with their faces
+        if preserve_clusters:
+            await refresh_cluster_representations(preserve_clusters, all_faces, representations, assigned_faces)
         
         # Step 5b: Create media_tags for ALL faces in 'linked' clusters (not just newly assigned)
         # Get all linked clusters
         linked_clusters = [c for c in preserve_clusters if c['status'] == 'linked' and c.get('linked_user_id')]
         
         if linked_clusters:
-            logger.info(f"Found {len(linked_clusters)} linked clusters, creating tags for all their faces...")
-            
-            for cluster in linked_clusters:
-                # Get all faces belonging to this cluster (now includes updated assignments)
-                cluster_faces = [f for f in all_faces if f.get('face_person_id') == cluster['id']]
-                logger.info(f"Cluster {cluster['id'][:8]}: {len(cluster_faces)} faces, linked_user_id: {cluster['linked_user_id'][:8]}")
-                
-                for face in cluster_faces:
-                    # Get the event_member entry for this user
-                    member_response = supabase_service.client.table('event_members') \
-                        .select('id') \
-                        .eq('event_id', request.event_id) \
-                        .eq('user_id', cluster['linked_user_id']) \
-                        .execute()
-                    
-                    if member_response.data and len(member_response.data) > 0:
-                        member_id = member_response.data[0]['id']
-                        
-                        # Create or update the media_tag
-                        try:
-                            supabase_service.client.table('media_tags').upsert({
-                                'media_id': face['media_id'],
-                                'member_id': member_id,
-                                'tagged_by': cluster['linked_user_id'],  # System-tagged
-                                'source': 'face_clustering',
-                                'bbox': face.get('bbox'),
-                                'face_id': face['id']
-                            }, on_conflict='media_id,member_id').execute()
-                            
-                            logger.info(f"✅ Created tag for media {face['media_id'][:8]} -> member {member_id[:8]}")
-                        except Exception as e:
-                            logger.warning(f"❌ Failed to create tag for face {face['id'][:8]}: {e}")
-                    else:
-                        logger.warning(f"⚠️ No event_member found for user {cluster['linked_user_id'][:8]}")
+            await tag_linked_cluster_faces(request.event_id, linked_clusters, all_faces)
+            await mark_identities_stale(linked_clusters, assigned_faces)
         
         # Step 6: Cluster the unassigned faces to create new clusters
         faces_data = unassigned_faces
@@ -482,7 +1167,9 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
                 'preserved_clusters': len(preserve_clusters),
                 'assigned_to_existing': len(assigned_faces),
                 'new_clusters_created': 0,
-                'noise_faces': 0
+                'prelinked_clusters': 0,
+                'noise_faces': 0,
+                'quality': cluster_quality_report(all_faces, {})
             }
             await supabase_service.update_job_status(job_id, "completed", result=result)
             background_tasks.add_task(send_callback, job_id, "completed", result=result)
@@ -498,125 +1185,31 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
                 status=JobStatus.COMPLETED
             )
         
-        # Extract embeddings and metadata
-        face_ids = [f['id'] for f in faces_data]
-        embeddings = np.array([f['embedding'] for f in faces_data], dtype=np.float32)
-        quality_scores = [f['quality_score'] for f in faces_data]
-        
-        logger.info(f"Clustering {len(embeddings)} faces...")
-        
-        # Create smart clusters using global analysis
+        # Create smart clusters using global analysis (stacks only the faces it clusters),
+        # in a worker thread so the event loop keeps serving requests meanwhile
         logger.info(f"Creating smart clusters from {len(faces_data)} faces...")
-        smart_clusters = create_smart_clusters(faces_data, clustering_service)
+        smart_clusters, coreset_reduction = await asyncio.to_thread(
+            create_smart_clusters_with_stats, faces_data, clustering_service
+        )
         
         # Use smart clusters
         clusters = smart_clusters
         
-        # Get max cluster_label to avoid conflicts
-        max_label_response = supabase_service.client.table('face_persons') \
-            .select('cluster_label') \
-            .eq('event_id', request.event_id) \
-            .order('cluster_label', desc=True) \
-            .limit(1) \
-            .execute()
-        
-        max_existing_label = max_label_response.data[0]['cluster_label'] if max_label_response.data else -1
-        label_offset = max_existing_label + 1
-        logger.info(f"Max existing cluster_label: {max_existing_label}, using offset: {label_offset}")
-        
-        # Create face_persons and update assignments
-        face_persons_data = []
-        face_assignments = []
-        cluster_infos = []
-        
-        # Map old labels to new labels (with offset)
-        label_mapping = {}
-        
-        for cluster_label, cluster_faces in clusters.items():
-            if cluster_label == -1:
-                # Skip noise for now (could handle separately)
-                continue
-            
-            # Apply offset to avoid conflicts
-            new_label = cluster_label + label_offset
-            label_mapping[cluster_label] = new_label
-            
-            # Select representative face
-            representative_id = clustering_service.select_representative_face(cluster_faces)
-            
-            # Compute stats
-            stats = clustering_service.compute_cluster_stats(cluster_faces)
-            
-            # Mark as AI-generated cluster
-            stats['is_ai_generated'] = True
-            stats['confidence'] = 'high' if len(cluster_faces) >= 2 else 'medium'
-            stats['face_count'] = len(cluster_faces)
-            
-            # Prepare face_person data with adjusted label
-            face_person = {
-                'event_id': request.event_id,
-                'cluster_label': new_label,
-                'representative_face_id': representative_id,
-                'status': 'pending',
-                'metadata': stats
-            }
-            face_persons_data.append(face_person)
+        # Create face_persons and assign their faces
+        embeddings_by_id = {f['id']: f['embedding'] for f in faces_data}
+        cluster_infos, clusters_created, next_label, new_assignments = await create_new_clusters(
+            request.event_id, clusters, embeddings_by_id
+        )
         
-        # Insert face_persons (we need to get IDs back)
-        if face_persons_data:
-            logger.info(f"Creating {len(face_persons_data)} face_persons...")
-            success = await supabase_service.create_face_persons(face_persons_data)
-            if not success:
-                raise ValueError("Failed to create face_persons")
-            
-            # Fetch created face_persons to get IDs
-            response = supabase_service.client.table('face_persons') \
-                .select('id, cluster_label') \
-                .eq('event_id', request.event_id) \
-                .execute()
-            
-            label_to_id = {fp['cluster_label']: fp['id'] for fp in response.data}
-            
-            # Prepare face assignments using new labels
-            for old_label, cluster_faces in clusters.items():
-                if old_label == -1:
-                    continue
-                
-                # Use the mapped label
-                new_label = label_mapping.get(old_label)
-                if new_label is None:
-                    continue
-                    
-                face_person_id = label_to_id.get(new_label)
-                if face_person_id:
-                    for face_id, quality in cluster_faces:
-                        face_assignments.append({
-                            'face_id': face_id,
-                            'face_person_id': face_person_id
-                        })
-                    
-                    cluster_infos.append(ClusterInfo(
-                        cluster_label=new_label,
-                        face_count=len(cluster_faces),
-                        representative_face_id=clustering_service.select_representative_face(cluster_faces),
-                        avg_quality=float(np.mean([q for _, q in cluster_faces]))
-                    ))
-            
-            # Update face assignments
-            if face_assignments:
-                logger.info(f"Updating {len(face_assignments)} face assignments...")
-                success = await supabase_service.update_face_assignments(face_assignments)
-                if not success:
-                    logger.warning("Some face assignments may have failed")
+        # Step 6b: Pre-link new clusters to event members known from other events
+        prelinked = await prelink_new_clusters(request.event_id, new_assignments, faces_data)
         
         # Step 7: Handle noise faces - create individual clusters for each
         noise_faces = clusters.get(-1, [])
         if noise_faces:
             logger.info(f"Creating individual clusters for {len(noise_faces)} noise faces...")
             
-            # Start from the next available label
-            next_label = max_existing_label + 1 + len(face_persons_data)
-            
+            # Labels start after the new clusters (next_label)
             noise_face_persons = []
             noise_assignments = []
             
@@ -637,19 +1230,16 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
                         'is_singleton': True  # Mark as single-face cluster
                     }
                 })
+                noise_face_persons[-1].update(cluster_representation([embeddings_by_id[face_id]]))
             
             # Insert noise face_persons
             if noise_face_persons:
                 success = await supabase_service.create_face_persons(noise_face_persons)
                 if success:
                     # Fetch created face_persons
-                    response = supabase_service.client.table('face_persons') \
-                        .select('id, cluster_label') \
-                        .eq('event_id', request.event_id) \
-                        .gte('cluster_label', next_label) \
-                        .execute()
-                    
-                    label_to_id_noise = {fp['cluster_label']: fp['id'] for fp in response.data}
+                    label_to_id_noise = await supabase_service.get_face_person_ids_by_label(
+                        request.event_id, next_label
+                    )
                     
                     # Assign noise faces
                     for idx, (face_id, quality) in enumerate(noise_faces):
@@ -676,9 +1266,12 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
             'total_faces': len(all_faces),
             'preserved_clusters': len(preserve_clusters),
             'assigned_to_existing': len(assigned_faces),
-            'new_clusters_created': len(face_persons_data),
+            'new_clusters_created': clusters_created,
+            'prelinked_clusters': prelinked,
             'noise_faces': noise_count,
-            'processing_time_seconds': processing_time
+            'processing_time_seconds': processing_time,
+            'coreset_reduction': coreset_reduction,
+            'quality': cluster_quality_report(all_faces, clusters)
         }
         
         # Update job status
@@ -689,13 +1282,13 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
         
         logger.info(f"Successfully clustered event {request.event_id}: "
                    f"{len(preserve_clusters)} preserved, {len(assigned_faces)} reassigned, "
-                   f"{len(face_persons_data)} new clusters, {noise_count} noise in {processing_time:.2f}s")
+                   f"{clusters_created} new clusters, {noise_count} noise in {processing_time:.2f}s")
         
         return ClusterEventResponse(
             job_id=job_id,
             event_id=request.event_id,
             total_faces=len(all_faces),
-            clusters_created=len(face_persons_data),
+            clusters_created=clusters_created,
             noise_faces=noise_count,
             clusters=cluster_infos,
             processing_time_seconds=processing_time,
@@ -716,6 +1309,75 @@ async def cluster_event(request: ClusterEventRequest, background_tasks: Backgrou
         raise HTTPException(status_code=500, detail=error_msg)
 
 
+@app.post("/cluster/preview", response_model=ClusterPreviewResponse)
+async def preview_clusters(request: ClusterPreviewRequest):
+    """
+    Preview an event re-split at another epsilon / min_samples
+    
+    The event's density hierarchy is built on the first request and cached
+    (until /process or /cluster touches the event), so changing the
+    parameters is a tree cut instead of a new DBSCAN run. Same faces and
+    confidence filter as /cluster over a whole event; nothing is written.
+    """
+    start_time = time.time()
+    eps = request.epsilon if request.epsilon is not None else settings.cluster_epsilon
+    min_samples = request.min_samples or settings.min_samples
+    if not 0 < eps <= settings.hierarchy_max_epsilon:
+        raise HTTPException(
+            status_code=422,
+            detail=f"epsilon must be in (0, {settings.hierarchy_max_epsilon}] (HIERARCHY_MAX_EPSILON)"
+        )
+    
+    hierarchy = None if request.refresh else clustering_service.get_hierarchy(request.event_id)
+    hierarchy_cached = hierarchy is not None
+    if hierarchy is None:
+        # Read before loading faces: an invalidation from now on keeps this build out of the cache
+        generation = clustering_service.hierarchy_generation(request.event_id)
+        
+        # Assemble the matrix page by page, keeping only confident faces
+        face_ids, quality_scores, blocks = [], [], [np.zeros((0, 512), dtype=np.float32)]
+        async for page, embeddings in supabase_service.iter_event_faces(request.event_id, include_assigned=True):
+            keep = [i for i, f in enumerate(page) if f['quality_score'] >= SMART_CLUSTER_MIN_QUALITY]
+            face_ids.extend(page[i]['id'] for i in keep)
+            quality_scores.extend(page[i]['quality_score'] for i in keep)
+            blocks.append(embeddings[keep].astype(np.float32))
+        hierarchy = await asyncio.to_thread(
+            clustering_service.build_hierarchy,
+            request.event_id,
+            np.concatenate(blocks),
+            face_ids,
+            quality_scores,
+            generation
+        )
+    
+    total_faces = len(hierarchy.face_ids)
+    clusters = {}
+    if total_faces >= settings.min_cluster_size:
+        clusters = filter_confident_clusters(hierarchy.clusters(eps, min_samples))
+    
+    previews = [
+        ClusterPreview(
+            cluster_label=label,
+            face_count=len(cluster_faces),
+            representative_face_id=clustering_service.select_representative_face(cluster_faces),
+            face_ids=[face_id for face_id, _ in cluster_faces]
+        )
+        for label, cluster_faces in clusters.items()
+    ]
+    
+    return ClusterPreviewResponse(
+        event_id=request.event_id,
+        epsilon=eps,
+        min_samples=min_samples,
+        total_faces=total_faces,
+        clusters_count=len(previews),
+        noise_faces=total_faces - sum(p.face_count for p in previews),
+        clusters=previews,
+        hierarchy_cached=hierarchy_cached,
+        processing_time_seconds=time.time() - start_time
+    )
+
+
 # ============================================
 # Error Handler
 # ============================================
@@ -1,7 +1,7 @@
 """Pydantic models for request/response validation"""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from enum import Enum
 
 
@@ -27,6 +27,7 @@ class ProcessMediaRequest(BaseModel):
     media_id: str
     event_id: str
     media_url: str  # Signed URL from Supabase Storage
+    include_faces: bool = False  # return detected faces (with embeddings) in the response
     
     class Config:
         json_schema_extra = {
@@ -43,6 +44,7 @@ class ClusterEventRequest(BaseModel):
     """Request to cluster faces in an event"""
     job_id: str
     event_id: str
+    mode: Optional[Literal['full', 'incremental']] = None  # None = settings.clustering_mode
     
     class Config:
         json_schema_extra = {
@@ -53,6 +55,23 @@ class ClusterEventRequest(BaseModel):
         }
 
 
+class ClusterPreviewRequest(BaseModel):
+    """Request to preview an event re-split at other clustering parameters"""
+    event_id: str
+    epsilon: Optional[float] = None  # None = settings.cluster_epsilon
+    min_samples: Optional[int] = Field(None, ge=1)  # None = settings.min_samples
+    refresh: bool = False  # rebuild the cached hierarchy from the database
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "event_id": "789e0123-e89b-12d3-a456-426614174222",
+                "epsilon": 0.45,
+                "min_samples": 2
+            }
+        }
+
+
 # ============================================
 # Response Models
 # ============================================
@@ -77,7 +96,7 @@ class Landmarks(BaseModel):
 class DetectedFace(BaseModel):
     """Single detected face"""
     bbox: BoundingBox
-    embedding: List[float]
+    embedding: Optional[List[float]] = None  # None when rejected by the quality gate
     quality_score: float
     landmarks: Optional[Landmarks] = None
 
@@ -88,7 +107,7 @@ class ProcessMediaResponse(BaseModel):
     media_id: str
     event_id: str
     faces_detected: int
-    faces: List[DetectedFace]
+    faces: List[DetectedFace] = []  # only filled when include_faces is set
     processing_time_seconds: float
     status: JobStatus
 
@@ -113,6 +132,27 @@ class ClusterEventResponse(BaseModel):
     status: JobStatus
 
 
+class ClusterPreview(BaseModel):
+    """Faces of a single previewed cluster"""
+    cluster_label: int
+    face_count: int
+    representative_face_id: str
+    face_ids: List[str]
+
+
+class ClusterPreviewResponse(BaseModel):
+    """Response from a clustering preview (nothing is written)"""
+    event_id: str
+    epsilon: float
+    min_samples: int
+    total_faces: int  # faces above the clustering quality threshold
+    clusters_count: int
+    noise_faces: int
+    clusters: List[ClusterPreview]
+    hierarchy_cached: bool  # False when the hierarchy was (re)built for this request
+    processing_time_seconds: float
+
+
 class ErrorResponse(BaseModel):
     """Error response"""
     job_id: str
@@ -121,6 +161,13 @@ class ErrorResponse(BaseModel):
     details: Optional[Dict[str, Any]] = None
 
 
+class ReadyResponse(BaseModel):
+    """Readiness probe response"""
+    ready: bool
+    warmup_seconds: Optional[float] = None
+    degraded: bool = False  # warm-up failed: models load on first request
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     model_config = {"protected_namespaces": ()}  # Allow model_ prefix
@@ -129,4 +176,5 @@ class HealthResponse(BaseModel):
     version: str
     model_loaded: bool
     gpu_available: bool
+    detection_cache: Optional[Dict[str, int]] = None  # hits, misses, size_bytes
 
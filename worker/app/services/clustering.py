@@ -1,26 +1,332 @@
 """Face clustering using DBSCAN (from scikit-learn)"""
 
+import multiprocessing
+import threading
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
 from sklearn.cluster import DBSCAN
 from sklearn.metrics.pairwise import cosine_distances
-from typing import List, Dict, Tuple, Any
+from sklearn.preprocessing import normalize
+from typing import List, Dict, Tuple, Any, Optional, Sequence
 import logging
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def radius_neighbor_graph(embeddings: np.ndarray, eps: float, block_size: int) -> sparse.csr_matrix:
+    """
+    Sparse cosine-distance graph keeping only pairs within eps
+    
+    Distances are computed block by block (block_size rows against all
+    faces), so peak memory is block_size x n_faces floats plus the graph
+    itself, instead of the full n x n matrix. Same arithmetic as
+    cosine_distances, so DBSCAN sees the same neighborhoods.
+    
+    Args:
+        embeddings: numpy array of shape (n_faces, 512)
+        eps: max cosine distance between neighbors
+        block_size: rows per distance block
+    
+    Returns:
+        (n_faces, n_faces) CSR matrix of distances <= eps, diagonal included
+    """
+    n_faces = embeddings.shape[0]
+    if n_faces == 0:
+        return sparse.csr_matrix((0, 0), dtype=np.float32)
+    normalized = normalize(embeddings)
+    
+    indptr = [0]
+    indices = []
+    distances = []
+    for start in range(0, n_faces, block_size):
+        stop = min(start + block_size, n_faces)
+        block = normalized[start:stop] @ normalized.T
+        block *= -1
+        block += 1
+        np.clip(block, 0, 2, out=block)
+        block[np.arange(stop - start), np.arange(start, stop)] = 0.0
+        
+        rows, cols = np.nonzero(block <= eps)
+        indices.append(cols)
+        distances.append(block[rows, cols])
+        indptr.extend((np.bincount(rows, minlength=stop - start).cumsum() + indptr[-1]).tolist())
+    
+    # csr_matrix keeps explicit zeros (self and duplicate faces stay neighbors)
+    return sparse.csr_matrix(
+        (np.concatenate(distances), np.concatenate(indices), np.array(indptr)),
+        shape=(n_faces, n_faces)
+    )
+
+
+def coreset_leaders(embeddings: np.ndarray, radius: float, block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Collapse near-duplicate faces onto leader faces (greedy leader pass)
+    
+    Faces are visited in order, block by block: a face within radius
+    (cosine distance) of an existing leader joins the closest one, otherwise
+    it becomes a leader. Every face is within radius of its leader.
+    
+    Args:
+        embeddings: numpy array of shape (n_faces, 512)
+        radius: max cosine distance to a leader
+        block_size: faces compared to the leaders per matrix product
+    
+    Returns:
+        (leader face indices, leader position per face)
+    """
+    normalized = normalize(embeddings)
+    n_faces = normalized.shape[0]
+    min_similarity = 1.0 - radius
+    
+    assignment = np.full(n_faces, -1, dtype=np.int64)
+    leaders: List[int] = []
+    leader_matrix = np.empty((0, normalized.shape[1]), dtype=normalized.dtype)
+    
+    for start in range(0, n_faces, block_size):
+        block = normalized[start:start + block_size]
+        
+        # Join existing leaders
+        if len(leaders):
+            similarities = block @ leader_matrix.T
+            best = similarities.argmax(axis=1)
+            joined = similarities[np.arange(len(block)), best] >= min_similarity
+            assignment[start:start + len(block)][joined] = best[joined]
+        
+        # Greedy leaders among the remaining faces of the block
+        remaining = np.flatnonzero(assignment[start:start + len(block)] == -1)
+        if len(remaining):
+            inner = block[remaining] @ block[remaining].T
+            free = np.ones(len(remaining), dtype=bool)
+            new_leaders = []
+            for i in range(len(remaining)):
+                if not free[i]:
+                    continue
+                members = free & (inner[i] >= min_similarity)
+                members[i] = True
+                assignment[start + remaining[members]] = len(leaders) + len(new_leaders)
+                free &= ~members
+                new_leaders.append(start + remaining[i])
+            leaders.extend(new_leaders)
+            leader_matrix = np.vstack([leader_matrix, normalized[new_leaders]])
+    
+    return np.array(leaders, dtype=np.int64), assignment
+
+
+def micro_cluster_labels(embeddings: np.ndarray, eps: float, block_size: int) -> np.ndarray:
+    """
+    Tight micro-clusters: connected components of the eps-radius graph
+    
+    Top-level so it can run in a worker process.
+    
+    Returns:
+        Micro-cluster index per face (0..n_micro-1)
+    """
+    graph = radius_neighbor_graph(embeddings, eps, block_size)
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def partition_faces(groups: List[Any], partition_size: int) -> List[np.ndarray]:
+    """
+    Split faces into partitions of about partition_size faces
+    
+    Faces of the same group (media) stay in the same partition, and groups
+    keep their input order, so partitions follow media batches.
+    
+    Returns:
+        Face indices of each partition
+    """
+    first_seen = {}
+    for group in groups:
+        first_seen.setdefault(group, len(first_seen))
+    order = np.argsort([first_seen[group] for group in groups], kind='stable')
+    
+    partitions = []
+    start = 0
+    while start < len(order):
+        stop = min(start + partition_size, len(order))
+        # Extend to the end of the current group
+        while stop < len(order) and groups[order[stop]] == groups[order[stop - 1]]:
+            stop += 1
+        partitions.append(order[start:stop])
+        start = stop
+    return partitions
+
+
+class DensityHierarchy:
+    """
+    Cached density hierarchy of a set of faces for instant DBSCAN re-cuts
+    
+    Built once from the eps-radius graph at max_eps. For each min_samples,
+    the minimum spanning tree over mutual reachability distances
+    max(d(a, b), core(a), core(b)) is computed once and cached. DBSCAN at
+    any eps <= max_eps is then a cut of that tree: core points joined by
+    tree edges <= eps form the clusters, and each border point joins its
+    nearest core point within eps. This matches DBSCAN except for border
+    points within eps of two clusters (DBSCAN picks by visiting order).
+    """
+    
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        face_ids: List[str],
+        quality_scores: List[float],
+        max_eps: float
+    ):
+        self.face_ids = face_ids
+        self.quality_scores = quality_scores
+        self.max_eps = max_eps
+        self.graph = radius_neighbor_graph(embeddings, max_eps, settings.cluster_block_size)
+        
+        n_faces = len(face_ids)
+        self._rows = np.repeat(np.arange(n_faces), np.diff(self.graph.indptr))
+        self._row_lengths = np.diff(self.graph.indptr)
+        # Neighbor distances sorted within each row (self included), for core distances
+        self._sorted_distances = self.graph.data[np.lexsort((self.graph.data, self._rows))]
+        self._trees: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    
+    def core_distances(self, min_samples: int) -> np.ndarray:
+        """Distance to the min_samples-th neighbor (self included), inf beyond max_eps"""
+        core = np.full(len(self.face_ids), np.inf, dtype=np.float32)
+        has_core = self._row_lengths >= min_samples
+        core[has_core] = self._sorted_distances[self.graph.indptr[:-1][has_core] + min_samples - 1]
+        return core
+    
+    def spanning_tree(self, min_samples: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Minimum spanning forest over mutual reachability, as (u, v, weight) edges"""
+        if min_samples not in self._trees:
+            core = self.core_distances(min_samples)
+            cols = self.graph.indices
+            weights = np.maximum(self.graph.data, np.maximum(core[self._rows], core[cols]))
+            keep = (self._rows != cols) & np.isfinite(weights)
+            
+            # Explicit zeros are not edges for minimum_spanning_tree
+            n_faces = len(self.face_ids)
+            reachability = sparse.csr_matrix(
+                (np.maximum(weights[keep], 1e-9), (self._rows[keep], cols[keep])),
+                shape=(n_faces, n_faces)
+            )
+            tree = minimum_spanning_tree(reachability).tocoo()
+            self._trees[min_samples] = (tree.row, tree.col, tree.data)
+        return self._trees[min_samples]
+    
+    def cut(self, eps: float, min_samples: int) -> np.ndarray:
+        """
+        DBSCAN labels at (eps, min_samples) from the cached tree
+        
+        Returns:
+            Label per face, -1 for noise; clusters numbered by their first face
+        """
+        if eps > self.max_eps:
+            raise ValueError(f"eps {eps} above the hierarchy max_eps {self.max_eps}")
+        
+        n_faces = len(self.face_ids)
+        is_core = self.core_distances(min_samples) <= eps
+        u, v, weights = self.spanning_tree(min_samples)
+        keep = weights <= eps
+        _, components = connected_components(
+            sparse.csr_matrix((np.ones(keep.sum()), (u[keep], v[keep])), shape=(n_faces, n_faces)),
+            directed=False
+        )
+        
+        labels = np.full(n_faces, -1)
+        core_components = components[is_core]
+        _, first_index, inverse = np.unique(core_components, return_index=True, return_inverse=True)
+        order = np.argsort(np.argsort(first_index))
+        labels[is_core] = order[inverse]
+        
+        # Border points join their nearest core point within eps
+        cols = self.graph.indices
+        border = ~is_core[self._rows] & is_core[cols] & (self.graph.data <= eps)
+        rows, cols, distances = self._rows[border], cols[border], self.graph.data[border]
+        nearest = np.lexsort((distances, rows))
+        rows, cols = rows[nearest], cols[nearest]
+        _, first = np.unique(rows, return_index=True)
+        labels[rows[first]] = labels[cols[first]]
+        return labels
+    
+    def clusters(self, eps: float, min_samples: int) -> Dict[int, List[Tuple[str, float]]]:
+        """Same contract as ClusteringService.cluster_faces"""
+        clusters: Dict[int, List[Tuple[str, float]]] = {}
+        for idx, label in enumerate(self.cut(eps, min_samples).tolist()):
+            clusters.setdefault(label, []).append((self.face_ids[idx], self.quality_scores[idx]))
+        return clusters
+
+
 class ClusteringService:
     """DBSCAN-based face clustering"""
     
     def __init__(self):
         self.clusterer = None
+        self.hierarchies: OrderedDict = OrderedDict()  # event_id -> DensityHierarchy (LRU)
+        self.hierarchy_generations: Dict[str, int] = {}  # event_id -> invalidation count
+        self._hierarchies_lock = threading.Lock()  # hierarchies are built in worker threads
+    
+    def hierarchy_generation(self, key: str) -> int:
+        """Invalidation count of key: read it before loading the faces of a hierarchy"""
+        with self._hierarchies_lock:
+            return self.hierarchy_generations.get(key, 0)
+    
+    def build_hierarchy(
+        self,
+        key: str,
+        embeddings: np.ndarray,
+        face_ids: List[str],
+        quality_scores: List[float],
+        generation: int
+    ) -> DensityHierarchy:
+        """
+        Build and cache the density hierarchy of a set of faces
+        
+        The hierarchy is only cached if key was not invalidated since
+        generation was read: faces loaded before an invalidation are stale.
+        
+        Args:
+            key: cache key (event_id)
+            embeddings: numpy array of shape (n_faces, 512)
+            face_ids: list of face IDs corresponding to embeddings
+            quality_scores: list of quality scores for each face
+            generation: hierarchy_generation(key) read before loading the faces
+        
+        Returns:
+            The hierarchy, cut-able at any eps <= settings.hierarchy_max_epsilon
+        """
+        hierarchy = DensityHierarchy(embeddings, face_ids, quality_scores, settings.hierarchy_max_epsilon)
+        with self._hierarchies_lock:
+            if self.hierarchy_generations.get(key, 0) == generation:
+                self.hierarchies[key] = hierarchy
+                self.hierarchies.move_to_end(key)
+                while len(self.hierarchies) > settings.hierarchy_cache_size:
+                    self.hierarchies.popitem(last=False)
+            else:
+                logger.info(f"Density hierarchy for {key} invalidated while building, not cached")
+        logger.info(f"Density hierarchy for {key}: {len(face_ids)} faces, {hierarchy.graph.nnz} neighbor pairs")
+        return hierarchy
+    
+    def get_hierarchy(self, key: str) -> Optional[DensityHierarchy]:
+        """Cached hierarchy for key, or None"""
+        with self._hierarchies_lock:
+            hierarchy = self.hierarchies.get(key)
+            if hierarchy is not None:
+                self.hierarchies.move_to_end(key)
+            return hierarchy
+    
+    def invalidate_hierarchy(self, key: str):
+        """Drop the cached hierarchy of key (its faces changed), including one being built"""
+        with self._hierarchies_lock:
+            self.hierarchies.pop(key, None)
+            self.hierarchy_generations[key] = self.hierarchy_generations.get(key, 0) + 1
     
     def cluster_faces(
         self,
         embeddings: np.ndarray,
         face_ids: List[str],
-        quality_scores: List[float]
+        quality_scores: List[float],
+        groups: Optional[List[Any]] = None
     ) -> Dict[int, List[Tuple[str, float]]]:
         """
         Cluster face embeddings using HDBSCAN
@@ -29,37 +335,68 @@ class ClusteringService:
             embeddings: numpy array of shape (n_faces, 512)
             face_ids: list of face IDs corresponding to embeddings
             quality_scores: list of quality scores for each face
+            groups: optional group per face (media_id), kept together by the
+                hierarchical engine when partitioning
         
         Returns:
             Dictionary mapping cluster_label -> [(face_id, quality_score), ...]
             cluster_label = -1 means noise (not assigned to any cluster)
         """
+        clusters, _ = self.cluster_faces_with_stats(embeddings, face_ids, quality_scores, groups)
+        return clusters
+    
+    def cluster_faces_with_stats(
+        self,
+        embeddings: np.ndarray,
+        face_ids: List[str],
+        quality_scores: List[float],
+        groups: Optional[List[Any]] = None
+    ) -> Tuple[Dict[int, List[Tuple[str, float]]], Optional[float]]:
+        """
+        Same as cluster_faces, also reporting the coreset pass
+        
+        Returns:
+            Tuple of (cluster_faces dictionary, share of faces collapsed by
+            the coreset pass or None when disabled)
+        """
         if len(embeddings) == 0:
             logger.warning("No embeddings provided for clustering")
-            return {}
+            return {}, None
         
         if len(embeddings) < settings.min_cluster_size:
             logger.warning(f"Too few faces ({len(embeddings)}) for clustering")
             # Return all as noise
-            return {-1: [(face_ids[i], quality_scores[i]) for i in range(len(face_ids))]}
+            return {-1: [(face_ids[i], quality_scores[i]) for i in range(len(face_ids))]}, None
         
         try:
             logger.info(f"Clustering {len(embeddings)} faces...")
             
-            # Calculate cosine distance matrix (DBSCAN needs a distance matrix)
-            distance_matrix = cosine_distances(embeddings)
+            if groups is None:
+                groups = list(range(len(embeddings)))
             
-            # Initialize DBSCAN with precomputed distances
-            # eps corresponds to cluster_epsilon (max distance between samples)
-            # min_samples is the same parameter
-            self.clusterer = DBSCAN(
-                eps=settings.cluster_epsilon,
-                min_samples=settings.min_samples,
-                metric='precomputed'
-            )
+            # Near-duplicates (bursts, duplicate uploads) clustered once, weighted by count
+            sample_weight = None
+            assignment = None
+            coreset_reduction = None
+            if settings.coreset_radius > 0:
+                leaders, assignment = coreset_leaders(
+                    embeddings, settings.coreset_radius, settings.cluster_block_size
+                )
+                coreset_reduction = 1.0 - len(leaders) / len(embeddings)
+                logger.info(f"Coreset: {len(embeddings)} faces -> {len(leaders)} representatives "
+                           f"({coreset_reduction:.0%} fewer)")
+                sample_weight = np.bincount(assignment, minlength=len(leaders))
+                embeddings = embeddings[leaders]
+                groups = [groups[i] for i in leaders.tolist()]
+            
+            if (settings.clustering_engine == 'hierarchical'
+                    and len(embeddings) >= settings.hierarchical_min_faces):
+                cluster_labels = self._hierarchical_labels(embeddings, groups, sample_weight)
+            else:
+                cluster_labels = self._dbscan_labels(embeddings, sample_weight)
             
-            # Fit and predict
-            cluster_labels = self.clusterer.fit_predict(distance_matrix)
+            if assignment is not None:
+                cluster_labels = cluster_labels[assignment]
             
             # Group faces by cluster
             clusters: Dict[int, List[Tuple[str, float]]] = {}
@@ -79,12 +416,84 @@ class ClusteringService:
                 if label != -1:
                     logger.debug(f"Cluster {label}: {len(faces)} faces")
             
-            return clusters
+            return clusters, coreset_reduction
             
         except Exception as e:
             logger.error(f"Error during clustering: {e}")
             raise
     
+    def _dbscan_labels(self, embeddings: np.ndarray, sample_weight: Optional[np.ndarray] = None) -> np.ndarray:
+        """DBSCAN labels with the sparse or dense distance engine"""
+        # Distances for DBSCAN: sparse eps-radius graph or full cosine matrix
+        if settings.clustering_engine == 'dense':
+            distance_matrix = cosine_distances(embeddings)
+        else:
+            distance_matrix = radius_neighbor_graph(
+                embeddings, settings.cluster_epsilon, settings.cluster_block_size
+            )
+            logger.info(f"Radius graph: {distance_matrix.nnz} neighbor pairs")
+        
+        # Initialize DBSCAN with precomputed distances
+        # eps corresponds to cluster_epsilon (max distance between samples)
+        # min_samples is the same parameter (local: jobs cluster concurrently in worker threads)
+        clusterer = self.clusterer = DBSCAN(
+            eps=settings.cluster_epsilon,
+            min_samples=settings.min_samples,
+            metric='precomputed'
+        )
+        
+        # Fit and predict
+        return clusterer.fit_predict(distance_matrix, sample_weight=sample_weight)
+    
+    def _hierarchical_labels(
+        self,
+        embeddings: np.ndarray,
+        groups: List[Any],
+        sample_weight: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Two-level clustering for very large inputs
+        
+        1. Faces are split into partitions (media batches), each reduced to
+           tight micro-clusters (micro_cluster_epsilon) in a process pool.
+        2. DBSCAN runs over the micro-cluster centroids, weighted by their
+           face counts, and every face takes the label of its micro-cluster.
+        """
+        partitions = partition_faces(groups, settings.hierarchical_partition_size)
+        parts = [embeddings[indices] for indices in partitions]
+        args = (
+            parts,
+            [settings.micro_cluster_epsilon] * len(parts),
+            [settings.cluster_block_size] * len(parts)
+        )
+        
+        workers = min(settings.hierarchical_workers, len(parts))
+        if workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            ) as executor:
+                part_labels = list(executor.map(micro_cluster_labels, *args))
+        else:
+            part_labels = list(map(micro_cluster_labels, *args))
+        
+        # Global micro-cluster index per face
+        micro = np.empty(len(embeddings), dtype=np.int64)
+        offset = 0
+        for indices, labels in zip(partitions, part_labels):
+            micro[indices] = labels + offset
+            offset += int(labels.max()) + 1
+        
+        weights = np.ones(len(embeddings)) if sample_weight is None else sample_weight
+        counts = np.bincount(micro, weights=weights, minlength=offset)
+        sums = np.zeros((offset, embeddings.shape[1]), dtype=np.float32)
+        np.add.at(sums, micro, normalize(embeddings) * weights[:, None].astype(np.float32))
+        centroids = normalize(sums)
+        logger.info(f"Hierarchical clustering: {len(partitions)} partitions, "
+                   f"{offset} micro-clusters from {len(embeddings)} faces")
+        
+        return self._dbscan_labels(centroids, sample_weight=counts)[micro]
+    
     def select_representative_face(
         self,
         cluster_faces: List[Tuple[str, float]]
@@ -147,22 +556,112 @@ class ClusteringService:
             silhouette score [-1, 1], higher is better
         """
         try:
-            from sklearn.metrics import silhouette_score
-            
-            # Filter out noise (-1)
-            mask = labels != -1
-            if np.sum(mask) < 2:
-                return 0.0
-            
-            score = silhouette_score(
-                embeddings[mask],
-                labels[mask],
-                metric='cosine'
-            )
-            return float(score)
+            quality = self.compute_quality_metrics(embeddings, labels, sample_size=0)
+            return quality['silhouette'] if quality else 0.0
         except Exception as e:
             logger.warning(f"Could not compute silhouette score: {e}")
             return 0.0
+    
+    def compute_quality_metrics(
+        self,
+        embeddings: Sequence,
+        labels: np.ndarray,
+        sample_size: int,
+        seed: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Sampled silhouette, intra-cluster spread and nearest-cluster margin
+        
+        With normalized embeddings, the mean cosine distance from a face to
+        the members of a cluster is 1 - face . cluster_sum / cluster_size, so
+        silhouette only needs (faces x clusters) similarities to cluster sums,
+        computed in blocks of settings.cluster_block_size faces. Silhouette and
+        margin are averaged over a random sample of faces, spread over all.
+        Rows are converted to float32 one block at a time, so compact
+        (float16 / int8) rows are never stacked whole.
+        
+        Args:
+            embeddings: numpy array of shape (n_faces, 512), or one row per face
+            labels: cluster label per face (any hashable), -1 = noise (ignored)
+            sample_size: faces sampled for silhouette / margin (0 = all faces)
+            seed: random seed of the sample
+        
+        Returns:
+            Dictionary with the metrics, empty if fewer than 2 clusters
+        """
+        labels = np.asarray(labels, dtype=object)
+        face_rows = np.flatnonzero(labels != -1)
+        _, cluster_idx = np.unique(labels[face_rows].astype(str), return_inverse=True)
+        n_clusters = int(cluster_idx.max()) + 1 if len(cluster_idx) else 0
+        if n_clusters < 2:
+            return {}
+        
+        def normalized_block(rows: np.ndarray) -> np.ndarray:
+            indices = face_rows[rows]
+            if isinstance(embeddings, np.ndarray):
+                return normalize(embeddings[indices].astype(np.float32, copy=False))
+            return normalize(np.array([embeddings[i] for i in indices.tolist()], dtype=np.float32))
+        
+        n_faces = len(cluster_idx)
+        blocks = [np.arange(start, min(start + settings.cluster_block_size, n_faces))
+                  for start in range(0, n_faces, settings.cluster_block_size)]
+        sizes = np.bincount(cluster_idx, minlength=n_clusters)
+        sums = None
+        for rows in blocks:
+            block = normalized_block(rows)
+            if sums is None:
+                sums = np.zeros((n_clusters, block.shape[1]), dtype=np.float32)
+            np.add.at(sums, cluster_idx[rows], block)
+        directions = normalize(sums)
+        
+        # Spread: cosine distance of every face to its cluster centroid direction
+        spread = np.concatenate([
+            1.0 - np.sum(normalized_block(rows) * directions[cluster_idx[rows]], axis=1)
+            for rows in blocks
+        ])
+        cluster_spread = np.bincount(cluster_idx, weights=spread, minlength=n_clusters) / sizes
+        
+        sample = np.arange(n_faces)
+        if 0 < sample_size < n_faces:
+            sample = np.sort(np.random.default_rng(seed).choice(n_faces, sample_size, replace=False))
+        
+        silhouettes = []
+        margins = []
+        for start in range(0, len(sample), settings.cluster_block_size):
+            rows = sample[start:start + settings.cluster_block_size]
+            own = cluster_idx[rows]
+            normalized = normalized_block(rows)
+            
+            # a: mean distance to the other faces of its cluster, b: nearest other cluster
+            dots = normalized @ sums.T
+            mean_distances = 1.0 - dots / sizes
+            own_sizes = sizes[own]
+            own_dots = dots[np.arange(len(rows)), own]
+            a = (own_sizes - own_dots) / np.maximum(own_sizes - 1, 1)
+            mean_distances[np.arange(len(rows)), own] = np.inf
+            b = mean_distances.min(axis=1)
+            silhouette = (b - a) / np.maximum(np.maximum(a, b), 1e-12)
+            silhouette[own_sizes == 1] = 0.0  # sklearn convention for singletons
+            silhouettes.append(silhouette)
+            
+            # Margin: similarity to own centroid minus best other centroid
+            centroid_sims = normalized @ directions.T
+            own_sims = centroid_sims[np.arange(len(rows)), own]
+            centroid_sims[np.arange(len(rows)), own] = -np.inf
+            margins.append(own_sims - centroid_sims.max(axis=1))
+        
+        silhouettes = np.concatenate(silhouettes)
+        margins = np.concatenate(margins)
+        return {
+            'clusters': n_clusters,
+            'clustered_faces': n_faces,
+            'sampled_faces': len(sample),
+            'silhouette': float(silhouettes.mean()),
+            'spread_mean': float(spread.mean()),
+            'spread_max_cluster': float(cluster_spread.max()),
+            'margin_mean': float(margins.mean()),
+            'margin_p10': float(np.percentile(margins, 10))
+        }
 
 
 # Global instance
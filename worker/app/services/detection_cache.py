@@ -0,0 +1,156 @@
+"""Persistent cache of detection results keyed by image content"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.face_batch import FaceBatch
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionCacheService:
+    """
+    SQLite-backed, size-bounded LRU cache of detected faces
+
+    Keys combine the SHA-256 of the encoded image with everything that
+    changes detection output (model, det_size, threshold, decoding), so
+    re-uploads of the same photo skip decoding and inference.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def is_enabled(self) -> bool:
+        """Check if a cache directory is configured"""
+        return bool(settings.detection_cache_dir)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the cache database on first use"""
+        if self._conn is None:
+            os.makedirs(settings.detection_cache_dir, exist_ok=True)
+            path = os.path.join(settings.detection_cache_dir, 'detections.sqlite3')
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS detections ('
+                'key TEXT PRIMARY KEY, payload BLOB NOT NULL, '
+                'size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_detections_last_access ON detections(last_access)'
+            )
+            self._total_bytes = self._conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM detections'
+            ).fetchone()[0]
+            logger.info(f"Detection cache opened at {path} ({self._total_bytes / 1e6:.1f} MB)")
+        return self._conn
+
+    def make_key(self, image_bytes: bytes) -> str:
+        """Cache key for an encoded image under the current detection settings"""
+        content_hash = hashlib.sha256(image_bytes).hexdigest()
+        config = (
+            f"buffalo_l|{settings.det_size}|{settings.detection_threshold}|"
+            f"{settings.reduced_decode}|{settings.decode_min_long_side}"
+        )
+        if settings.int8_model_dir:
+            config += f"|int8|{settings.int8_detection}"
+        if settings.quality_gate_enabled:
+            config += (
+                f"|gate|{settings.quality_gate_min_score}|{settings.quality_gate_min_face_px}|"
+                f"{settings.quality_gate_max_yaw}|{settings.quality_gate_min_sharpness}"
+            )
+        return f"{content_hash}:{hashlib.sha256(config.encode()).hexdigest()[:16]}"
+
+    def get(self, key: str) -> Optional[FaceBatch]:
+        """
+        Look up cached faces
+
+        Returns:
+            FaceBatch (possibly empty), or None on a miss
+        """
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute('SELECT payload FROM detections WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute('UPDATE detections SET last_access = ? WHERE key = ?', (time.time(), key))
+                conn.commit()
+                self.hits += 1
+            return FaceBatch.from_bytes(row[0])
+        except Exception as e:
+            logger.warning(f"Detection cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, faces: FaceBatch):
+        """Store faces for a key, evicting least recently used entries"""
+        try:
+            payload = faces.to_bytes()
+            with self._lock:
+                conn = self._connection()
+                previous = conn.execute('SELECT size FROM detections WHERE key = ?', (key,)).fetchone()
+                conn.execute(
+                    'INSERT OR REPLACE INTO detections (key, payload, size, last_access) VALUES (?, ?, ?, ?)',
+                    (key, payload, len(payload), time.time())
+                )
+                self._total_bytes += len(payload) - (previous[0] if previous else 0)
+                self._evict(conn)
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Detection cache write failed: {e}")
+
+    def lookup_many(self, images_bytes: List[bytes]) -> Tuple[List[str], List[Optional[FaceBatch]]]:
+        """
+        Keys and cached faces of several images
+
+        Blocking (SHA-256 of the full images, SQLite reads): call it off the
+        event loop, e.g. with asyncio.to_thread.
+
+        Returns:
+            Tuple of (keys, FaceBatch or None on a miss, per image)
+        """
+        keys = [self.make_key(image_bytes) for image_bytes in images_bytes]
+        return keys, [self.get(key) for key in keys]
+
+    def put_many(self, entries: List[Tuple[str, FaceBatch]]):
+        """Store several (key, faces) entries (blocking, see lookup_many)"""
+        for key, faces in entries:
+            self.put(key, faces)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries until the cache fits its size bound"""
+        max_bytes = settings.detection_cache_max_mb * 1024 * 1024
+        while self._total_bytes > max_bytes:
+            rows = conn.execute(
+                'SELECT key, size FROM detections ORDER BY last_access LIMIT 100'
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                conn.execute('DELETE FROM detections WHERE key = ?', (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size_bytes': int(self._total_bytes)
+        }
+
+
+# Global instance
+detection_cache = DetectionCacheService()
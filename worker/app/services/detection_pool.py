@@ -0,0 +1,143 @@
+"""Process pool running face detection on all CPU cores"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+from app.config import settings
+from app.face_batch import FaceBatch
+
+logger = logging.getLogger(__name__)
+
+# Seconds a warm-up task waits for the other pool processes to pick theirs
+WARMUP_BARRIER_TIMEOUT = 300
+
+# Detector owned by the current pool process (set by _init_pool_process)
+_process_detector = None
+
+# Barrier shared by the pool processes for warm-up (set by _init_pool_process)
+_warmup_barrier = None
+
+
+def _init_pool_process(onnx_threads: int, warmup_barrier):
+    """Load a dedicated FaceAnalysis instance in each pool process"""
+    global _process_detector, _warmup_barrier
+    from app.services.face_detector import FaceDetectorService
+
+    _warmup_barrier = warmup_barrier
+    _process_detector = FaceDetectorService(onnx_threads=onnx_threads)
+    _process_detector.initialize()
+
+
+def _detect_in_pool_process(images_bytes: List[bytes]) -> List[Optional[FaceBatch]]:
+    """Decode and detect a batch of images inside a pool process"""
+    return _process_detector.detect_faces_from_bytes(images_bytes)
+
+
+def _warmup_in_pool_process(det_sizes: List[int], iterations: int):
+    """
+    Run dummy inferences on the current pool process's model
+
+    The barrier holds each task until every process has picked one, so each
+    process gets exactly one warm-up task.
+    """
+    try:
+        _warmup_barrier.wait(WARMUP_BARRIER_TIMEOUT)
+    except threading.BrokenBarrierError:
+        # A process died or is stuck loading: warm this one anyway
+        pass
+    _process_detector.warmup(det_sizes, iterations)
+
+
+class DetectionPoolService:
+    """Pool of worker processes, each holding its own InsightFace model"""
+
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._restart_lock: Optional[asyncio.Lock] = None
+
+    def is_enabled(self) -> bool:
+        """Check if detection should be sent to the process pool"""
+        return settings.detection_pool_size > 0
+
+    def start(self):
+        """Start the pool (processes load their model on first use)"""
+        if self.executor is not None:
+            return
+
+        logger.info(
+            f"Starting detection pool: {settings.detection_pool_size} processes, "
+            f"{settings.detection_pool_onnx_threads} ONNX threads each"
+        )
+        # spawn: onnxruntime thread pools do not survive fork
+        # (the barrier is handed over at process creation, it cannot be pickled into a task)
+        mp_context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(
+            max_workers=settings.detection_pool_size,
+            mp_context=mp_context,
+            initializer=_init_pool_process,
+            initargs=(settings.detection_pool_onnx_threads, mp_context.Barrier(settings.detection_pool_size))
+        )
+
+    def shutdown(self):
+        """Stop the pool processes"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def warmup(self, det_sizes: List[int], iterations: int):
+        """Start every pool process and warm its model (one warm-up task per process)"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _warmup_in_pool_process, det_sizes, iterations)
+            for _ in range(settings.detection_pool_size)
+        ])
+    
+    async def restart(self, broken: ProcessPoolExecutor):
+        """
+        Replace a broken pool (a process died: OOM kill, segfault) and re-warm it
+
+        Concurrent callers that saw the same broken pool restart it only once.
+        """
+        if self._restart_lock is None:
+            self._restart_lock = asyncio.Lock()
+        async with self._restart_lock:
+            if self.executor is not broken:
+                return
+            logger.warning("Detection pool is broken (a process died), restarting it")
+            self.shutdown()
+            self.start()
+            try:
+                await self.warmup(settings.warmup_det_sizes or [settings.det_size], settings.warmup_iterations)
+            except Exception as e:
+                logger.error(f"Detection pool warm-up after restart failed: {e}")
+    
+    async def detect(self, images_bytes: List[bytes]) -> List[Optional[FaceBatch]]:
+        """
+        Detect faces on a batch of encoded images in a pool process
+
+        If the pool is broken, it is restarted and the batch retried once.
+
+        Args:
+            images_bytes: list of encoded images
+
+        Returns:
+            One FaceBatch per image (None if decoding failed),
+            see FaceDetectorService.detect_faces_from_bytes
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, _detect_in_pool_process, images_bytes)
+        except BrokenProcessPool:
+            await self.restart(executor)
+            return await loop.run_in_executor(self.executor, _detect_in_pool_process, images_bytes)
+
+
+# Global instance
+detection_pool = DetectionPoolService()
@@ -1,21 +1,58 @@
 """Face detection and embedding using InsightFace"""
 
+import io
+import os
 import numpy as np
 import cv2
+import onnxruntime
+from PIL import Image
 from insightface.app import FaceAnalysis
+from insightface.utils import face_align
 from typing import List, Tuple, Optional
 import logging
 from app.config import settings
-from app.models import DetectedFace, BoundingBox, Landmarks
+from app.face_batch import FaceBatch, EMBEDDING_DIM
 
 logger = logging.getLogger(__name__)
 
+# JPEG DCT-domain downscaling flags, largest reduction first
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+# Settings values -> onnxruntime enums
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    'sequential': onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+# Suffix of the INT8 copies written by quantize_models.py
+INT8_MODEL_SUFFIX = '.int8.onnx'
+
+# Marker written once every model of the pack has been optimized
+OPTIMIZED_CACHE_MARKER = '.complete'
+
 
 class FaceDetectorService:
     """InsightFace-based face detection and embedding"""
     
-    def __init__(self):
+    def __init__(self, onnx_threads: Optional[int] = None):
+        """
+        Args:
+            onnx_threads: intra-op thread count for every ONNX session
+                (None keeps the onnxruntime default of one thread per core)
+        """
         self.app: Optional[FaceAnalysis] = None
+        self.onnx_threads = onnx_threads
+        self.providers: List[str] = []
         self._initialized = False
     
     def initialize(self):
@@ -34,9 +71,25 @@ class FaceDetectorService:
                 providers = ['CPUExecutionProvider']
                 logger.info("CPU mode enabled")
             
+            self.providers = providers
+            
+            # Load pre-optimized graphs when the cache is complete
+            root_kwargs = {}
+            optimized_root = self._optimized_model_root()
+            cache_ready = optimized_root is not None and os.path.exists(
+                os.path.join(optimized_root, 'models', 'buffalo_l', OPTIMIZED_CACHE_MARKER)
+            )
+            if cache_ready:
+                logger.info(f"Using optimized ONNX models from {optimized_root}")
+                root_kwargs['root'] = optimized_root
+            
+            # Only detection (bbox, score, 5-point kps) and recognition outputs are
+            # used: genderage and the 2D/3D landmark models are never loaded
             self.app = FaceAnalysis(
                 name='buffalo_l',
-                providers=providers
+                providers=providers,
+                allowed_modules=['detection', 'recognition'],
+                **root_kwargs
             )
             
             # Prepare model with detection size
@@ -46,6 +99,18 @@ class FaceDetectorService:
                 det_thresh=settings.detection_threshold
             )
             
+            if optimized_root is not None and not cache_ready:
+                self._export_optimized_models(optimized_root)
+            
+            # insightface 0.7.3 model_zoo.get_model only forwards providers and
+            # provider_options, so FaceAnalysis sessions always use default options:
+            # recreate them with the configured ones (and the swapped INT8 files)
+            swapped = self._use_int8_models()
+            if self._needs_session_tuning():
+                self._configure_sessions(list(self.app.models))
+            elif swapped:
+                self._configure_sessions(swapped)
+            
             self._initialized = True
             logger.info("InsightFace model loaded successfully")
             
@@ -57,7 +122,149 @@ class FaceDetectorService:
         """Check if model is loaded"""
         return self._initialized
     
-    def detect_and_embed(self, image: np.ndarray) -> List[DetectedFace]:
+    def _session_options(self) -> onnxruntime.SessionOptions:
+        """ONNX Runtime session options from settings (per-instance thread count wins)"""
+        sess_options = onnxruntime.SessionOptions()
+        sess_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[settings.onnx_graph_optimization]
+        sess_options.execution_mode = EXECUTION_MODES[settings.onnx_execution_mode]
+        sess_options.enable_cpu_mem_arena = settings.onnx_enable_mem_arena
+        
+        intra_op_threads = self.onnx_threads or settings.onnx_intra_op_threads
+        if intra_op_threads:
+            sess_options.intra_op_num_threads = intra_op_threads
+        if settings.onnx_inter_op_threads:
+            sess_options.inter_op_num_threads = settings.onnx_inter_op_threads
+        elif self.onnx_threads:
+            sess_options.inter_op_num_threads = 1
+        return sess_options
+    
+    def _needs_session_tuning(self) -> bool:
+        """Check if sessions differ from the ones FaceAnalysis creates by default"""
+        return bool(
+            self.onnx_threads
+            or settings.onnx_intra_op_threads
+            or settings.onnx_inter_op_threads
+            or settings.onnx_graph_optimization != 'all'
+            or settings.onnx_execution_mode != 'sequential'
+            or not settings.onnx_enable_mem_arena
+        )
+    
+    def _configure_sessions(self, tasknames: List[str]):
+        """Recreate the sessions of the given models with the configured session options"""
+        sess_options = self._session_options()
+        for taskname in tasknames:
+            model = self.app.models[taskname]
+            model.session = onnxruntime.InferenceSession(
+                model.model_file,
+                sess_options=sess_options,
+                providers=self.providers
+            )
+        
+        # Log what the sessions actually run with, not what was requested
+        applied = self.app.models[tasknames[0]].session.get_session_options()
+        logger.info(
+            f"ONNX sessions configured ({', '.join(tasknames)}): "
+            f"intra-op {applied.intra_op_num_threads or 'default'}, "
+            f"inter-op {applied.inter_op_num_threads or 'default'}, "
+            f"optimization {settings.onnx_graph_optimization}, mode {settings.onnx_execution_mode}"
+        )
+    
+    def _use_int8_models(self) -> List[str]:
+        """
+        Point models at their INT8 copies from settings.int8_model_dir
+        
+        Preprocessing (input mean/std, input size) was read from the FP32
+        graphs and stays valid. Sessions of the swapped models are recreated
+        by _configure_sessions; the other models keep their sessions.
+        
+        Returns:
+            Tasks whose model was swapped
+        """
+        if not settings.int8_model_dir:
+            return []
+        
+        tasks = ['recognition'] + (['detection'] if settings.int8_detection else [])
+        for taskname in tasks:
+            model = self.app.models[taskname]
+            filename = os.path.basename(model.model_file).replace('.onnx', INT8_MODEL_SUFFIX)
+            int8_file = os.path.join(settings.int8_model_dir, filename)
+            if not os.path.exists(int8_file):
+                raise FileNotFoundError(
+                    f"INT8 {taskname} model not found: {int8_file} (run quantize_models.py)"
+                )
+            model.model_file = int8_file
+            logger.info(f"Using INT8 {taskname} model {int8_file}")
+        return tasks
+    
+    def _optimized_model_root(self) -> Optional[str]:
+        """
+        FaceAnalysis root holding optimized graphs for this onnxruntime setup
+        
+        Optimized graphs depend on the onnxruntime version, optimization level
+        and execution provider, so each combination gets its own directory.
+        """
+        if not settings.onnx_optimized_model_dir:
+            return None
+        device = 'gpu' if settings.use_gpu else 'cpu'
+        tag = f"ort{onnxruntime.__version__}-{settings.onnx_graph_optimization}-{device}"
+        return os.path.join(settings.onnx_optimized_model_dir, tag)
+    
+    def _export_optimized_models(self, optimized_root: str):
+        """
+        Serialize the optimized graph of every model of the pack
+        
+        Files are written under a temporary name and renamed, so concurrent
+        workers never load a partial graph. The marker is written last.
+        """
+        try:
+            source_dir = os.path.dirname(self.app.models['detection'].model_file)
+            target_dir = os.path.join(optimized_root, 'models', 'buffalo_l')
+            os.makedirs(target_dir, exist_ok=True)
+            
+            for filename in sorted(os.listdir(source_dir)):
+                if not filename.endswith('.onnx'):
+                    continue
+                target = os.path.join(target_dir, filename)
+                tmp_target = f"{target}.{os.getpid()}.tmp"
+                sess_options = onnxruntime.SessionOptions()
+                sess_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[settings.onnx_graph_optimization]
+                sess_options.optimized_model_filepath = tmp_target
+                onnxruntime.InferenceSession(
+                    os.path.join(source_dir, filename),
+                    sess_options=sess_options,
+                    providers=self.providers
+                )
+                os.replace(tmp_target, target)
+            
+            with open(os.path.join(target_dir, OPTIMIZED_CACHE_MARKER), 'w') as marker:
+                marker.write(onnxruntime.__version__)
+            logger.info(f"Optimized ONNX models saved to {target_dir}")
+        except Exception as e:
+            logger.warning(f"Failed to save optimized ONNX models: {e}")
+    
+    def warmup(self, det_sizes: List[int], iterations: int):
+        """
+        Load the model and run dummy inferences so ONNX kernels are ready
+        
+        Args:
+            det_sizes: detection input sizes to warm (square)
+            iterations: dummy inferences per size
+        """
+        if not self._initialized:
+            self.initialize()
+        
+        rec_model = self.app.models['recognition']
+        crop_size = rec_model.input_size[0]
+        crops = [np.zeros((crop_size, crop_size, 3), dtype=np.uint8)] * self._recognition_batch_size()
+        
+        for det_size in det_sizes:
+            image = np.zeros((det_size, det_size, 3), dtype=np.uint8)
+            for _ in range(iterations):
+                self.app.det_model.detect(image, max_num=0, metric='default', input_size=(det_size, det_size))
+        for _ in range(iterations):
+            self._embed_crops(crops)
+    
+    def detect_and_embed(self, image: np.ndarray) -> FaceBatch:
         """
         Detect faces and generate embeddings
         
@@ -65,73 +272,238 @@ class FaceDetectorService:
             image: numpy array (BGR format from cv2.imread)
         
         Returns:
-            List of DetectedFace objects
+            FaceBatch with the faces of the image
         """
         if not self._initialized:
             self.initialize()
         
+        if settings.quality_gate_enabled:
+            return self.detect_and_embed_batch([image])[0]
+        
         try:
             # Detect faces
             faces = self.app.get(image)
             
             if len(faces) == 0:
                 logger.debug("No faces detected in image")
-                return []
-            
-            # Get image dimensions for normalization
-            img_height, img_width = image.shape[:2]
-            
-            detected_faces = []
-            for face in faces:
-                # Extract bbox and normalize to [0-1]
-                bbox_raw = face.bbox.astype(int)
-                x1, y1, x2, y2 = bbox_raw
-                
-                # Clip to image boundaries (sometimes InsightFace returns slightly out of bounds)
-                x1 = max(0, x1)
-                y1 = max(0, y1)
-                x2 = min(img_width, x2)
-                y2 = min(img_height, y2)
-                
-                bbox = BoundingBox(
-                    x=max(0.0, float(x1) / img_width),
-                    y=max(0.0, float(y1) / img_height),
-                    w=min(1.0, float(x2 - x1) / img_width),
-                    h=min(1.0, float(y2 - y1) / img_height)
-                )
-                
-                # Extract embedding (512-dimensional for buffalo_l)
-                embedding = face.normed_embedding.tolist()
-                
-                # Quality score (detection confidence)
-                quality_score = float(face.det_score)
-                
-                # Extract landmarks (5 points)
-                landmarks = None
-                if hasattr(face, 'kps') and face.kps is not None:
-                    kps = face.kps.astype(float)
-                    landmarks = Landmarks(
-                        left_eye=[float(kps[0][0]) / img_width, float(kps[0][1]) / img_height],
-                        right_eye=[float(kps[1][0]) / img_width, float(kps[1][1]) / img_height],
-                        nose=[float(kps[2][0]) / img_width, float(kps[2][1]) / img_height],
-                        mouth_left=[float(kps[3][0]) / img_width, float(kps[3][1]) / img_height],
-                        mouth_right=[float(kps[4][0]) / img_width, float(kps[4][1]) / img_height]
-                    )
-                
-                detected_faces.append(DetectedFace(
-                    bbox=bbox,
-                    embedding=embedding,
-                    quality_score=quality_score,
-                    landmarks=landmarks
-                ))
+                return FaceBatch.empty()
+            
+            kpss = None
+            if all(getattr(face, 'kps', None) is not None for face in faces):
+                kpss = np.stack([face.kps for face in faces])
+            
+            face_batch = self._build_face_batch(
+                np.stack([face.bbox for face in faces]),
+                kpss,
+                np.array([face.det_score for face in faces], dtype=np.float32),
+                np.stack([face.normed_embedding for face in faces]),
+                image.shape
+            )
             
-            logger.info(f"Detected {len(detected_faces)} faces")
-            return detected_faces
+            logger.info(f"Detected {len(face_batch)} faces")
+            return face_batch
             
         except Exception as e:
             logger.error(f"Error during face detection: {e}")
             raise
     
+    def detect_and_embed_batch(self, images: List[np.ndarray]) -> List[FaceBatch]:
+        """
+        Detect faces on several images and embed them with batched recognition
+        
+        Detection still runs image by image, but the aligned crops of every face
+        found in the batch are stacked and sent to the recognition model in
+        chunks of `settings.recognition_batch_size`, instead of one ONNX call
+        per face. Only detection and recognition run (no genderage/3D landmarks).
+        
+        With `settings.quality_gate_enabled`, faces failing the quality gate
+        are kept (bbox, landmarks, score) but not embedded.
+        
+        Args:
+            images: list of numpy arrays (BGR format from cv2.imread)
+        
+        Returns:
+            One FaceBatch per input image, in the same order
+        """
+        if not self._initialized:
+            self.initialize()
+        
+        try:
+            rec_model = self.app.models['recognition']
+            
+            # Detect faces and collect aligned crops of the faces to embed
+            detections = []  # (bboxes with scores, kpss, embed mask) per image
+            crops = []
+            for image in images:
+                bboxes, kpss = self.app.det_model.detect(image, max_num=0, metric='default')
+                to_embed = self._quality_gate(bboxes, kpss)
+                for i in np.flatnonzero(to_embed):
+                    crop = face_align.norm_crop(image, landmark=kpss[i], image_size=rec_model.input_size[0])
+                    if self._is_sharp(crop):
+                        crops.append(crop)
+                    else:
+                        to_embed[i] = False
+                detections.append((bboxes, kpss, to_embed))
+            
+            n_detected = sum(bboxes.shape[0] for bboxes, _, _ in detections)
+            if n_detected == 0:
+                logger.debug(f"No faces detected in batch of {len(images)} images")
+                return [FaceBatch.empty() for _ in images]
+            
+            embeddings = self._embed_crops(crops) if crops else None
+            
+            results: List[FaceBatch] = []
+            offset = 0
+            for image, (bboxes, kpss, to_embed) in zip(images, detections):
+                n_faces = bboxes.shape[0]
+                if n_faces == 0:
+                    results.append(FaceBatch.empty())
+                    continue
+                n_embedded = int(to_embed.sum())
+                image_embeddings = np.zeros((n_faces, EMBEDDING_DIM), dtype=np.float32)
+                if n_embedded:
+                    image_embeddings[to_embed] = embeddings[offset:offset + n_embedded]
+                results.append(self._build_face_batch(
+                    bboxes[:, 0:4],
+                    kpss,
+                    bboxes[:, 4],
+                    image_embeddings,
+                    image.shape,
+                    embedded=to_embed
+                ))
+                offset += n_embedded
+            
+            logger.info(
+                f"Detected {n_detected} faces in batch of {len(images)} images "
+                f"({len(crops)} embedded)"
+            )
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error during batch face detection: {e}")
+            raise
+    
+    def detect_faces_from_bytes(self, images_bytes: List[bytes]) -> List[Optional[FaceBatch]]:
+        """
+        Decode a batch of encoded images and detect faces on them
+        
+        FaceBatch objects are plain arrays, cheap to pickle, so this can run
+        inside a detection pool process.
+        
+        Args:
+            images_bytes: list of encoded images (JPEG, PNG, ...)
+        
+        Returns:
+            One FaceBatch per input image, or None when the image could not be decoded
+        """
+        images = [self.load_image_from_bytes(image_bytes) for image_bytes in images_bytes]
+        decoded = [image for image in images if image is not None]
+        
+        batch_faces = iter(self.detect_and_embed_batch(decoded) if decoded else [])
+        return [None if image is None else next(batch_faces) for image in images]
+    
+    def _quality_gate(self, bboxes: np.ndarray, kpss: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Cheap per-face checks run before recognition
+        
+        Args:
+            bboxes: (n, 5) detector output [x1, y1, x2, y2, score] in decoded pixels
+            kpss: (n, 5, 2) detector landmarks, or None
+        
+        Returns:
+            Boolean mask of the faces to embed (all True when the gate is disabled)
+        """
+        n_faces = bboxes.shape[0]
+        if not settings.quality_gate_enabled or n_faces == 0:
+            return np.ones(n_faces, dtype=bool)
+        
+        sides = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1])
+        passed = (bboxes[:, 4] >= settings.quality_gate_min_score) & (sides >= settings.quality_gate_min_face_px)
+        
+        if kpss is not None:
+            # Yaw proxy: horizontal nose offset from the eye midpoint, relative to eye distance
+            eye_mid_x = (kpss[:, 0, 0] + kpss[:, 1, 0]) / 2
+            eye_distance = np.linalg.norm(kpss[:, 1] - kpss[:, 0], axis=1)
+            yaw = np.abs(kpss[:, 2, 0] - eye_mid_x) / np.maximum(eye_distance, 1e-6)
+            passed &= yaw <= settings.quality_gate_max_yaw
+        
+        return passed
+    
+    def _is_sharp(self, crop: np.ndarray) -> bool:
+        """Blur check on an aligned crop (variance of the Laplacian)"""
+        if not settings.quality_gate_enabled or settings.quality_gate_min_sharpness <= 0:
+            return True
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        return cv2.Laplacian(gray, cv2.CV_64F).var() >= settings.quality_gate_min_sharpness
+    
+    def _recognition_batch_size(self) -> int:
+        """Batch size for recognition calls (1 if the model has a fixed batch dim)"""
+        batch_dim = self.app.models['recognition'].input_shape[0]
+        if isinstance(batch_dim, int) and batch_dim > 0:
+            return batch_dim
+        return max(1, settings.recognition_batch_size)
+    
+    def _embed_crops(self, crops: List[np.ndarray]) -> np.ndarray:
+        """
+        Run the recognition model on aligned face crops
+        
+        Args:
+            crops: list of aligned 112x112 BGR face crops
+        
+        Returns:
+            L2-normalized float32 embeddings of shape (n_crops, 512)
+        """
+        rec_model = self.app.models['recognition']
+        batch_size = self._recognition_batch_size()
+        
+        chunks = []
+        for start in range(0, len(crops), batch_size):
+            chunks.append(rec_model.get_feat(crops[start:start + batch_size]))
+        
+        embeddings = np.concatenate(chunks, axis=0).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+    
+    def _build_face_batch(
+        self,
+        bboxes_raw: np.ndarray,
+        kpss: Optional[np.ndarray],
+        det_scores: np.ndarray,
+        embeddings: np.ndarray,
+        image_shape: Tuple[int, ...],
+        embedded: Optional[np.ndarray] = None
+    ) -> FaceBatch:
+        """Build a FaceBatch with bboxes and landmarks normalized to [0-1]"""
+        img_height, img_width = image_shape[:2]
+        
+        # Clip to image boundaries (sometimes InsightFace returns slightly out of bounds)
+        corners = bboxes_raw.astype(int)
+        x1 = np.maximum(0, corners[:, 0])
+        y1 = np.maximum(0, corners[:, 1])
+        x2 = np.minimum(img_width, corners[:, 2])
+        y2 = np.minimum(img_height, corners[:, 3])
+        
+        bboxes = np.stack([
+            x1 / img_width,
+            y1 / img_height,
+            (x2 - x1) / img_width,
+            (y2 - y1) / img_height
+        ], axis=1)
+        
+        # Landmarks (5 points), NaN when the detector doesn't provide them
+        if kpss is not None:
+            landmarks = kpss.astype(np.float32) / np.array([img_width, img_height], dtype=np.float32)
+        else:
+            landmarks = np.full((len(bboxes), 5, 2), np.nan, dtype=np.float32)
+        
+        return FaceBatch(
+            bboxes=np.clip(bboxes, 0.0, 1.0).astype(np.float32),
+            landmarks=landmarks,
+            scores=np.asarray(det_scores, dtype=np.float32),
+            embeddings=np.asarray(embeddings, dtype=np.float32),
+            embedded=np.ones(len(bboxes), dtype=bool) if embedded is None else embedded
+        )
+    
     def load_image_from_path(self, image_path: str) -> Optional[np.ndarray]:
         """Load image from file path"""
         try:
@@ -145,17 +517,59 @@ class FaceDetectorService:
             return None
     
     def load_image_from_bytes(self, image_bytes: bytes) -> Optional[np.ndarray]:
-        """Load image from bytes"""
+        """
+        Load image from bytes
+        
+        Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale directly in the DCT
+        domain, keeping at least `settings.decode_min_long_side` pixels on the
+        long side (the detector downsizes to det_size anyway). Bboxes and
+        landmarks are normalized to [0-1], so they still map onto the original
+        image. Images above `settings.max_image_pixels` are refused.
+        """
         try:
+            decode_flag = cv2.IMREAD_COLOR
+            
+            header = self._read_image_header(image_bytes)
+            if header is not None:
+                width, height, image_format = header
+                if width * height > settings.max_image_pixels:
+                    logger.error(f"Image too large ({width}x{height}), max {settings.max_image_pixels} pixels")
+                    return None
+                if settings.reduced_decode and image_format == 'JPEG':
+                    decode_flag = self._reduced_decode_flag(width, height)
+            
             nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            image = cv2.imdecode(nparr, decode_flag)
             if image is None:
                 logger.error("Failed to decode image from bytes")
                 return None
+            
+            if header is not None and decode_flag != cv2.IMREAD_COLOR:
+                logger.debug(f"Decoded {header[0]}x{header[1]} JPEG at {image.shape[1]}x{image.shape[0]}")
             return image
         except Exception as e:
             logger.error(f"Error loading image from bytes: {e}")
             return None
+    
+    def _read_image_header(self, image_bytes: bytes) -> Optional[Tuple[int, int, str]]:
+        """Read (width, height, format) from the image header without decoding pixels"""
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as header:
+                return header.width, header.height, header.format
+        except Image.DecompressionBombError:
+            # Pillow's own guard: report a size that trips ours
+            return settings.max_image_pixels + 1, 1, 'UNKNOWN'
+        except Exception:
+            # Unknown to Pillow, let OpenCV try a full decode
+            return None
+    
+    def _reduced_decode_flag(self, width: int, height: int) -> int:
+        """Pick the strongest JPEG reduction keeping decode_min_long_side pixels"""
+        long_side = max(width, height)
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if long_side // factor >= settings.decode_min_long_side:
+                return flag
+        return cv2.IMREAD_COLOR
 
 
 # Global instance
@@ -0,0 +1,130 @@
+"""Bounded thread executor keeping decoding and inference off the event loop"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from app.config import settings
+from app.services.face_detector import FaceDetectorService
+
+logger = logging.getLogger(__name__)
+
+# Detector owned by the current inference thread
+_thread_state = threading.local()
+
+
+class InferenceQueueFullError(Exception):
+    """Raised when the inference queue is at its configured depth"""
+
+
+class InferenceExecutorService:
+    """Runs detection work on a fixed set of threads, one FaceAnalysis per thread"""
+
+    def __init__(self):
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0  # queued + running tasks
+        self.loaded_detectors = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the thread pool (detectors are loaded lazily per thread)"""
+        if self.executor is not None:
+            return
+
+        logger.info(
+            f"Starting inference executor: {settings.inference_threads} threads, "
+            f"queue depth {settings.inference_max_queue_depth}"
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.inference_threads,
+            thread_name_prefix='inference'
+        )
+        self._slots = asyncio.Semaphore(settings.inference_max_queue_depth)
+
+    def shutdown(self):
+        """Stop the inference threads"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def is_saturated(self) -> bool:
+        """Check if the queue is full and new work should be rejected"""
+        return self._slots is not None and self._slots.locked()
+
+    def model_loaded(self) -> bool:
+        """Check if at least one inference thread has its model loaded"""
+        return self.loaded_detectors > 0
+
+    def _onnx_threads(self) -> int:
+        """ONNX intra-op threads per inference thread (cores split evenly by default)"""
+        if settings.inference_onnx_threads > 0:
+            return settings.inference_onnx_threads
+        return max(1, (os.cpu_count() or 1) // max(1, settings.inference_threads))
+
+    def _thread_detector(self) -> FaceDetectorService:
+        """Get the calling thread's detector, loading it on first use"""
+        detector = getattr(_thread_state, 'detector', None)
+        if detector is None:
+            detector = FaceDetectorService(onnx_threads=self._onnx_threads())
+            detector.initialize()
+            _thread_state.detector = detector
+            with self._lock:
+                self.loaded_detectors += 1
+        return detector
+
+    def warmup(self, det_sizes: List[int], iterations: int):
+        """
+        Load and warm the model of every inference thread (blocking)
+        
+        A barrier holds each task until all threads have picked one, so every
+        thread gets exactly one warm-up task.
+        """
+        self.start()
+        n_threads = settings.inference_threads
+        barrier = threading.Barrier(n_threads)
+        
+        def warm_thread():
+            barrier.wait()
+            self._thread_detector().warmup(det_sizes, iterations)
+        
+        futures = [self.executor.submit(warm_thread) for _ in range(n_threads)]
+        for future in futures:
+            future.result()
+    
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        return fn(self._thread_detector(), *args)
+
+    async def run(self, fn: Callable[..., Any], *args, wait: bool = False) -> Any:
+        """
+        Run fn(detector, *args) on an inference thread
+
+        Args:
+            fn: callable receiving the thread's FaceDetectorService first
+            wait: wait for a queue slot instead of failing when the queue is full
+
+        Returns:
+            fn's return value
+
+        Raises:
+            InferenceQueueFullError: queue is full and wait is False
+        """
+        self.start()
+        if not wait and self.is_saturated():
+            raise InferenceQueueFullError(
+                f"Inference queue full ({settings.inference_max_queue_depth} tasks)"
+            )
+
+        async with self._slots:
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, self._call, fn, args)
+            finally:
+                self.pending -= 1
+
+
+# Global instance
+inference_executor = InferenceExecutorService()
@@ -0,0 +1,223 @@
+"""Async PostgREST / Storage client over one shared, pooled HTTP connection pool"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import httpx
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Characters that force a PostgREST filter value to be double-quoted
+RESERVED_CHARS = set(',.:()" ')
+
+
+class APIError(Exception):
+    """Error response from PostgREST or Storage"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+
+
+class APIResponse:
+    """Decoded response body (rows, one row with single(), or an RPC result)"""
+
+    def __init__(self, data: Any):
+        self.data = data
+
+
+def format_value(value: Any, quote: bool = False) -> str:
+    """Render a filter value in PostgREST syntax"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    text = str(value)
+    if quote or RESERVED_CHARS.intersection(text):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return text
+
+
+class QueryBuilder:
+    """
+    Chainable request on one table (same chain as the supabase client)
+
+    Example:
+        response = await client.table('faces').select('id').eq('event_id', event_id).execute()
+    """
+
+    def __init__(self, client: 'AsyncPostgrestClient', path: str):
+        self.client = client
+        self.path = path
+        self.method = 'GET'
+        self.params: List[Tuple[str, str]] = []
+        self.headers: Dict[str, str] = {}
+        self.body: Any = None
+        self.order_by: List[str] = []
+        self.negate = False
+
+    # Operations
+
+    def select(self, columns: str = '*') -> 'QueryBuilder':
+        self.params.append(('select', columns.replace(' ', '')))
+        return self
+
+    def insert(self, rows) -> 'QueryBuilder':
+        return self._write('POST', rows, 'return=representation')
+
+    def upsert(self, rows, on_conflict: Optional[str] = None) -> 'QueryBuilder':
+        if on_conflict:
+            self.params.append(('on_conflict', on_conflict))
+        return self._write('POST', rows, 'return=representation,resolution=merge-duplicates')
+
+    def update(self, values: Dict[str, Any]) -> 'QueryBuilder':
+        return self._write('PATCH', values, 'return=representation')
+
+    def delete(self) -> 'QueryBuilder':
+        return self._write('DELETE', None, 'return=representation')
+
+    def _write(self, method: str, body: Any, prefer: str) -> 'QueryBuilder':
+        self.method = method
+        self.body = body
+        self.headers['Prefer'] = prefer
+        return self
+
+    # Filters
+
+    @property
+    def not_(self) -> 'QueryBuilder':
+        """Negate the next filter"""
+        self.negate = True
+        return self
+
+    def _filter(self, column: str, operator: str, value: str) -> 'QueryBuilder':
+        prefix = 'not.' if self.negate else ''
+        self.negate = False
+        self.params.append((column, f"{prefix}{operator}.{value}"))
+        return self
+
+    def eq(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'eq', format_value(value))
+
+    def neq(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'neq', format_value(value))
+
+    def gt(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'gt', format_value(value))
+
+    def gte(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'gte', format_value(value))
+
+    def lt(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'lt', format_value(value))
+
+    def lte(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'lte', format_value(value))
+
+    def in_(self, column: str, values) -> 'QueryBuilder':
+        return self._filter(column, 'in', '(' + ','.join(format_value(v, quote=True) for v in values) + ')')
+
+    def is_(self, column: str, value: Any) -> 'QueryBuilder':
+        return self._filter(column, 'is', format_value(value))
+
+    def or_(self, filters: str) -> 'QueryBuilder':
+        """Match any of comma-separated PostgREST filters, e.g. 'a.is.null,a.gt.5'"""
+        self.params.append(('or', f"({filters})"))
+        return self
+
+    # Modifiers
+
+    def order(self, column: str, desc: bool = False) -> 'QueryBuilder':
+        self.order_by.append(f"{column}.{'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count: int) -> 'QueryBuilder':
+        self.params.append(('limit', str(count)))
+        return self
+
+    def single(self) -> 'QueryBuilder':
+        """Return one row as an object (error unless exactly one row matches)"""
+        self.headers['Accept'] = 'application/vnd.pgrst.object+json'
+        return self
+
+    async def execute(self) -> APIResponse:
+        params = self.params + ([('order', ','.join(self.order_by))] if self.order_by else [])
+        return await self.client.request(self.method, self.path, params, self.body, self.headers)
+
+
+class AsyncPostgrestClient:
+    """
+    Supabase REST (PostgREST) and Storage access for the worker
+
+    All requests share one httpx.AsyncClient: connections are kept alive
+    and pooled (up to max_connections, multiplexed over HTTP/2 when the
+    server negotiates it), and requests never block the event loop, so
+    independent queries can run concurrently with asyncio.gather.
+    """
+
+    def __init__(self, url: str, key: str, max_connections: int = 20, timeout: float = 30.0, http2: bool = True):
+        self.url = url.rstrip('/')
+        self.headers = {'apikey': key, 'Authorization': f"Bearer {key}"}
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.timeout = timeout
+        self.http2 = http2 and importlib.util.find_spec('h2') is not None
+        if http2 and not self.http2:
+            logger.warning("h2 is not installed (pip install 'httpx[http2]'), using HTTP/1.1 keep-alive")
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created in (and bound to) the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            self._http = httpx.AsyncClient(
+                base_url=self.url,
+                headers=self.headers,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+            self._loop = loop
+        return self._http
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, f"/rest/v1/{name}")
+
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> QueryBuilder:
+        query = QueryBuilder(self, f"/rest/v1/rpc/{function}")
+        query.method = 'POST'
+        query.body = params or {}
+        return query
+
+    async def create_signed_url(self, bucket: str, path: str, expires_in: int) -> str:
+        """Signed download URL of a Storage object, valid expires_in seconds"""
+        response = await self.request('POST', f"/storage/v1/object/sign/{bucket}/{path}", body={'expiresIn': expires_in})
+        return f"{self.url}/storage/v1{response.data['signedURL']}"
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[List[Tuple[str, str]]] = None,
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> APIResponse:
+        response = await self.http.request(
+            method,
+            path,
+            params=params,
+            content=json.dumps(body) if body is not None else None,
+            headers={'Content-Type': 'application/json', **(headers or {})}
+        )
+        if response.status_code >= 400:
+            raise APIError(response.status_code, response.text)
+        return APIResponse(response.json() if response.content else None)
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
@@ -3,7 +3,7 @@
 import numpy as np
 from typing import List, Dict, Tuple, Optional, Any
 import logging
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 
 logger = logging.getLogger(__name__)
 
@@ -11,26 +11,35 @@ logger = logging.getLogger(__name__)
 class SmartClusteringService:
     """Intelligent clustering that preserves existing face_person assignments"""
     
-    def __init__(self, similarity_threshold: float = 0.6):
+    def __init__(self, similarity_threshold: float = 0.6, min_margin: float = 0.0):
         """
         Args:
             similarity_threshold: Minimum cosine similarity to assign face to existing cluster
+            min_margin: Minimum gap between best and second-best cluster similarity
         """
         self.similarity_threshold = similarity_threshold
+        self.min_margin = min_margin
     
     async def assign_faces_to_existing_clusters(
         self,
         faces_data: List[Dict[str, Any]],
         existing_clusters: List[Dict[str, Any]],
-        get_embedding_func
+        get_embeddings_func,
+        cluster_prototypes: Optional[Dict[str, np.ndarray]] = None
     ) -> Tuple[List[Dict], List[Dict]]:
         """
         Assign new faces to existing clusters based on similarity
         
+        All faces are scored against all cluster representatives with one
+        (faces x clusters) matrix product.
+        
         Args:
             faces_data: List of face data with embeddings
             existing_clusters: List of existing face_persons
-            get_embedding_func: Async function to get embedding for a face_id
+            get_embeddings_func: Async function returning {face_id: embedding} for a list of face_ids
+            cluster_prototypes: Optional stored prototypes per cluster id; a face's
+                similarity to a cluster is its best prototype similarity. Clusters
+                without prototypes use their representative face embedding.
             
         Returns:
             Tuple of (assigned_faces, unassigned_faces)
@@ -44,55 +53,210 @@ class SmartClusteringService:
         
         logger.info(f"Assigning {len(faces_data)} faces to {len(existing_clusters)} existing clusters...")
         
-        # Get representative embeddings for each existing cluster
-        cluster_embeddings = {}
+        cluster_prototypes = cluster_prototypes or {}
+        
+        # Get representative embeddings of clusters without prototypes in one query
+        rep_face_ids = [
+            c['representative_face_id'] for c in existing_clusters
+            if c.get('representative_face_id') and c['id'] not in cluster_prototypes
+        ]
+        rep_embeddings = await get_embeddings_func(rep_face_ids) if rep_face_ids else {}
+        
+        cluster_ids = []
+        cluster_embeddings = []
         for cluster in existing_clusters:
-            rep_face_id = cluster.get('representative_face_id')
-            if rep_face_id:
-                embedding = await get_embedding_func(rep_face_id)
-                if embedding:
-                    cluster_embeddings[cluster['id']] = np.array(embedding, dtype=np.float32)
+            prototypes = cluster_prototypes.get(cluster['id'])
+            embedding = rep_embeddings.get(cluster.get('representative_face_id'))
+            if prototypes is not None and len(prototypes):
+                cluster_ids.append(cluster['id'])
+                cluster_embeddings.append(np.asarray(prototypes, dtype=np.float32))
+            elif embedding is not None and len(embedding):
+                cluster_ids.append(cluster['id'])
+                cluster_embeddings.append(np.array([embedding], dtype=np.float32))
         
-        if not cluster_embeddings:
+        if not cluster_ids:
             logger.warning("No cluster embeddings found, all faces will be unassigned")
             return [], faces_data
         
-        # Convert to arrays for vectorized operations
-        cluster_ids = list(cluster_embeddings.keys())
-        cluster_emb_matrix = np.array([cluster_embeddings[cid] for cid in cluster_ids], dtype=np.float32)
+        # Faces already assigned are skipped
+        candidates = [face for face in faces_data if not face.get('face_person_id')]
+        if not candidates:
+            return [], []
         
-        # Assign each face
-        for face in faces_data:
-            if face.get('face_person_id'):
-                # Already assigned, skip
-                continue
-            
-            face_embedding = np.array(face['embedding'], dtype=np.float32).reshape(1, -1)
-            
-            # Compute similarities to all clusters
-            similarities = cosine_similarity(face_embedding, cluster_emb_matrix)[0]
-            
-            # Find best match
-            max_sim_idx = np.argmax(similarities)
-            max_similarity = similarities[max_sim_idx]
-            
-            if max_similarity >= self.similarity_threshold:
-                # Assign to existing cluster
-                matched_cluster_id = cluster_ids[max_sim_idx]
+        best_idx, best_sim, margins, accepted = self.match_prototypes(
+            np.array([face['embedding'] for face in candidates], dtype=np.float32),
+            cluster_embeddings
+        )
+        
+        for face, is_accepted, idx, similarity, margin in zip(
+            candidates, accepted.tolist(), best_idx.tolist(), best_sim.tolist(), margins.tolist()
+        ):
+            if is_accepted:
                 assigned.append({
                     'face_id': face['id'],
-                    'face_person_id': matched_cluster_id,
-                    'similarity': float(max_similarity)
+                    'face_person_id': cluster_ids[idx],
+                    'similarity': similarity,
+                    'margin': margin
                 })
-                logger.debug(f"Face {face['id'][:8]} assigned to cluster {matched_cluster_id[:8]} (sim: {max_similarity:.3f})")
             else:
-                # No good match, add to unassigned
                 unassigned.append(face)
-                logger.debug(f"Face {face['id'][:8]} unassigned (max sim: {max_similarity:.3f})")
         
         logger.info(f"Assigned {len(assigned)} faces, {len(unassigned)} remain unassigned")
         return assigned, unassigned
     
+    def match_embeddings(
+        self,
+        face_embeddings: np.ndarray,
+        cluster_embeddings: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Match faces to clusters with one (faces x clusters) matrix product
+        
+        Args:
+            face_embeddings: (n_faces, 512) embeddings
+            cluster_embeddings: (n_clusters, 512) representatives or centroids
+        
+        Returns:
+            Tuple of (best cluster index, best similarity, best - second-best
+            similarity, accepted mask) per face
+        """
+        return self._best_matches(normalize(face_embeddings) @ normalize(cluster_embeddings).T)
+    
+    def match_prototypes(
+        self,
+        face_embeddings: np.ndarray,
+        cluster_prototypes: List[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Match faces to clusters represented by several prototypes each
+        
+        A face's similarity to a cluster is its best similarity over the
+        cluster's prototypes, computed with one (faces x all prototypes) product.
+        
+        Args:
+            face_embeddings: (n_faces, 512) embeddings
+            cluster_prototypes: one (k_i, 512) prototype matrix per cluster
+        
+        Returns:
+            Same as match_embeddings
+        """
+        prototypes = normalize(np.concatenate(cluster_prototypes).astype(np.float32))
+        offsets = np.cumsum([0] + [len(p) for p in cluster_prototypes[:-1]])
+        similarities = normalize(face_embeddings) @ prototypes.T
+        return self._best_matches(np.maximum.reduceat(similarities, offsets, axis=1))
+    
+    def match_clusters_to_prototypes(
+        self,
+        face_embeddings: np.ndarray,
+        face_clusters: np.ndarray,
+        n_clusters: int,
+        identity_prototypes: List[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Match whole clusters to identities represented by prototypes
+        
+        Each face is scored against every identity (best prototype), then the
+        scores are averaged over the faces of each cluster, so one odd face
+        cannot link a cluster on its own.
+        
+        Args:
+            face_embeddings: (n_faces, 512) embeddings of the clusters' faces
+            face_clusters: cluster index in [0, n_clusters) of each face
+            n_clusters: number of clusters
+            identity_prototypes: one (k_i, 512) prototype matrix per identity
+        
+        Returns:
+            Same as match_embeddings, per cluster (index of the best identity)
+        """
+        prototypes = normalize(np.concatenate(identity_prototypes).astype(np.float32))
+        offsets = np.cumsum([0] + [len(p) for p in identity_prototypes[:-1]])
+        face_scores = np.maximum.reduceat(normalize(face_embeddings) @ prototypes.T, offsets, axis=1)
+        
+        sums = np.zeros((n_clusters, len(identity_prototypes)), dtype=np.float32)
+        np.add.at(sums, face_clusters, face_scores)
+        counts = np.bincount(face_clusters, minlength=n_clusters)
+        return self._best_matches(sums / np.maximum(counts, 1)[:, None])
+    
+    def _best_matches(self, similarities: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Best cluster, similarity, margin and acceptance from a (faces x clusters) matrix"""
+        rows = np.arange(similarities.shape[0])
+        best_idx = np.argmax(similarities, axis=1)
+        best_sim = similarities[rows, best_idx]
+        if similarities.shape[1] > 1:
+            second_sim = np.partition(similarities, -2, axis=1)[:, -2]
+        else:
+            second_sim = np.full(similarities.shape[0], -1.0, dtype=np.float32)
+        margins = best_sim - second_sim
+        accepted = (best_sim >= self.similarity_threshold) & (margins >= self.min_margin)
+        return best_idx, best_sim, margins, accepted
+    
+    def select_prototypes(self, embeddings: np.ndarray, k: int) -> np.ndarray:
+        """
+        Pick k diverse embeddings of a cluster (farthest-point sampling)
+        
+        Starts from the face closest to the cluster mean, then repeatedly adds
+        the face least similar to the prototypes chosen so far, so profile and
+        frontal shots of a person both get a prototype.
+        
+        Args:
+            embeddings: (n_faces, 512) embeddings of the cluster
+            k: max number of prototypes
+        
+        Returns:
+            (min(k, n_faces), 512) normalized prototypes
+        """
+        normalized = normalize(embeddings.astype(np.float32))
+        if len(normalized) <= k:
+            return normalized
+        
+        chosen = [int(np.argmax(normalized @ normalized.mean(axis=0)))]
+        max_sim = normalized @ normalized[chosen[0]]
+        for _ in range(k - 1):
+            candidate = int(np.argmin(max_sim))
+            chosen.append(candidate)
+            np.maximum(max_sim, normalized @ normalized[candidate], out=max_sim)
+        return normalized[chosen]
+    
+    def compute_centroids(
+        self,
+        embeddings: np.ndarray,
+        labels: np.ndarray,
+        n_clusters: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mean of the normalized embeddings of each cluster
+        
+        Args:
+            embeddings: (n_faces, 512) embeddings
+            labels: cluster index in [0, n_clusters) for each face
+            n_clusters: number of clusters
+        
+        Returns:
+            Tuple of (centroids (n_clusters, 512), counts (n_clusters,))
+        """
+        sums = np.zeros((n_clusters, embeddings.shape[1]), dtype=np.float32)
+        np.add.at(sums, labels, normalize(embeddings.astype(np.float32)))
+        counts = np.bincount(labels, minlength=n_clusters)
+        return sums / np.maximum(counts, 1)[:, None], counts
+    
+    def update_centroids(
+        self,
+        centroids: np.ndarray,
+        counts: np.ndarray,
+        embeddings: np.ndarray,
+        labels: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Running-mean update of centroids with newly assigned faces
+        
+        Returns:
+            Tuple of (updated centroids, updated counts)
+        """
+        added, added_counts = self.compute_centroids(embeddings, labels, len(centroids))
+        new_counts = counts + added_counts
+        weighted = centroids * counts[:, None] + added * added_counts[:, None]
+        return weighted / np.maximum(new_counts, 1)[:, None], new_counts
+    
     def should_preserve_cluster(self, cluster: Dict[str, Any]) -> bool:
         """
         Determine if a cluster should be preserved (not deleted/recreated)
@@ -1,9 +1,15 @@
 """Supabase client for database operations"""
 
-from supabase import create_client, Client
-from typing import List, Dict, Any, Optional
+import asyncio
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, AsyncIterator, Set, Tuple
 import logging
 from app.config import settings
+from app.embedding_codec import decode_embedding, decode_embeddings, decode_prototypes
+from app.embedding_precision import compact_embeddings, quantize_embeddings
+from app.face_batch import FaceBatch
+from app.services.postgrest_client import AsyncPostgrestClient, format_value
 
 logger = logging.getLogger(__name__)
 
@@ -12,15 +18,34 @@ class SupabaseService:
     """Handles all Supabase database operations"""
     
     def __init__(self):
-        self.client: Client = create_client(
+        # One pooled, keep-alive connection pool shared by every query
+        self.client = AsyncPostgrestClient(
             settings.supabase_url,
-            settings.supabase_service_role_key
+            settings.supabase_service_role_key,
+            max_connections=settings.db_max_connections,
+            timeout=settings.db_timeout,
+            http2=settings.db_http2
         )
+        self.embedding_cache: OrderedDict = OrderedDict()  # face_id -> embedding row (LRU)
+    
+    async def close(self):
+        """Close pooled database connections"""
+        await self.client.aclose()
+    
+    async def _gather_bounded(self, queries) -> list:
+        """Execute independent queries concurrently, at most db_max_connections at a time"""
+        slots = asyncio.Semaphore(settings.db_max_connections)
+        
+        async def run(query):
+            async with slots:
+                return await query.execute()
+        
+        return await asyncio.gather(*[run(query) for query in queries])
     
     async def get_media_info(self, media_id: str) -> Optional[Dict[str, Any]]:
         """Get media metadata from database"""
         try:
-            response = self.client.table('media') \
+            response = await self.client.table('media') \
                 .select('*') \
                 .eq('id', media_id) \
                 .single() \
@@ -30,10 +55,65 @@ class SupabaseService:
             logger.error(f"Error fetching media {media_id}: {e}")
             return None
     
+    async def create_signed_url(self, storage_path: str, expires_in: int) -> Optional[str]:
+        """Signed download URL of a media file (None on failure)"""
+        try:
+            return await self.client.create_signed_url('media', storage_path, expires_in)
+        except Exception as e:
+            logger.error(f"Error signing URL for {storage_path}: {e}")
+            return None
+    
+    async def get_event_media(self, event_id: str) -> List[Dict[str, Any]]:
+        """Get id and storage_path of every media of an event"""
+        try:
+            response = await self.client.table('media') \
+                .select('id, storage_path') \
+                .eq('event_id', event_id) \
+                .execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Error fetching media for event {event_id}: {e}")
+            return []
+    
+    async def get_processed_media_ids(self, event_id: str) -> Set[str]:
+        """Get ids of the media of an event that already have faces (keyset-paginated)"""
+        media_ids = set()
+        after_id = None
+        try:
+            while True:
+                query = self.client.table('faces') \
+                    .select('id, media_id') \
+                    .eq('event_id', event_id)
+                if after_id is not None:
+                    query = query.gt('id', after_id)
+                page = (await query.order('id').limit(settings.face_page_size).execute()).data
+                if not page:
+                    return media_ids
+                media_ids.update(face['media_id'] for face in page)
+                after_id = page[-1]['id']
+        except Exception as e:
+            logger.error(f"Error fetching processed media for event {event_id}: {e}")
+            return media_ids
+    
+    async def get_next_pending_job(self) -> Optional[Dict[str, Any]]:
+        """Get the pending ml_job to run next (highest priority, oldest first)"""
+        try:
+            response = await self.client.table('ml_jobs') \
+                .select('*') \
+                .eq('status', 'pending') \
+                .order('priority', desc=True) \
+                .order('created_at', desc=False) \
+                .limit(1) \
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error fetching pending jobs: {e}")
+            return None
+    
     async def insert_faces(self, faces_data: List[Dict[str, Any]]) -> bool:
         """Bulk insert detected faces"""
         try:
-            response = self.client.table('faces') \
+            response = await self.client.table('faces') \
                 .insert(faces_data) \
                 .execute()
             logger.info(f"Inserted {len(faces_data)} faces")
@@ -42,30 +122,111 @@ class SupabaseService:
             logger.error(f"Error inserting faces: {e}")
             return False
     
-    async def get_event_faces(self, event_id: str, include_assigned: bool = False) -> List[Dict[str, Any]]:
-        """Get all faces with embeddings for an event"""
+    async def insert_face_batch(self, faces: FaceBatch, media_id: str, event_id: str) -> bool:
+        """Insert the faces detected on one media"""
+        if len(faces) == 0:
+            return True
+        return await self.insert_faces(faces.to_rows(media_id, event_id))
+    
+    async def _fetch_event_faces_page(
+        self,
+        event_id: str,
+        include_assigned: bool,
+        after_id: Optional[str],
+        page_size: int,
+        considered_after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """One page of faces with embeddings, ordered by id, after after_id"""
+        columns = 'id, embedding, quality_score, media_id, face_person_id'
+        if considered_after is not None:
+            columns += ', cluster_considered_at'
+        query = self.client.table('faces') \
+            .select(columns) \
+            .eq('event_id', event_id) \
+            .not_.is_('embedding', 'null')
+        
+        # Optionally filter for unassigned faces only
+        if not include_assigned:
+            query = query.is_('face_person_id', 'null')
+        if considered_after is not None:
+            query = query.or_(
+                f"cluster_considered_at.is.null,cluster_considered_at.gt.{format_value(considered_after, quote=True)}"
+            )
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        
+        return (await query.order('id').limit(page_size).execute()).data
+    
+    async def iter_event_faces(
+        self,
+        event_id: str,
+        include_assigned: bool = False,
+        page_size: Optional[int] = None,
+        considered_after: Optional[str] = None
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """
+        Stream the faces of an event page by page
+        
+        Pages are keyset-paginated on id (no OFFSET scan, and no silent
+        truncation at PostgREST's max-rows). The next page is requested
+        while the current one is decoded: decoding runs in a worker thread,
+        so the event loop sends the prefetch request meanwhile.
+        
+        Args:
+            event_id: event to read
+            include_assigned: also return faces already in a cluster
+            page_size: faces per request (defaults to settings.face_page_size)
+            considered_after: ISO timestamp; when set, also return
+                cluster_considered_at and skip faces an incremental run left
+                unassigned before it (needs face_clustering_incremental.sql)
+        
+        Yields:
+            Tuple of (face dicts without 'embedding', (n, 512) embeddings at
+            settings.embedding_precision)
+        """
+        page_size = page_size or settings.face_page_size
+        
+        def fetch(after_id: Optional[str]) -> asyncio.Future:
+            return asyncio.ensure_future(
+                self._fetch_event_faces_page(event_id, include_assigned, after_id, page_size, considered_after)
+            )
+        
+        pending = fetch(None)
         try:
-            query = self.client.table('faces') \
-                .select('id, embedding, quality_score, media_id, face_person_id') \
-                .eq('event_id', event_id) \
-                .not_.is_('embedding', 'null')
-            
-            # Optionally filter for unassigned faces only
-            if not include_assigned:
-                query = query.is_('face_person_id', 'null')
-            
-            response = query.execute()
-            
-            # Parse embeddings from string to list if needed
-            for face in response.data:
-                if isinstance(face['embedding'], str):
-                    # pgvector returns as string, parse it
-                    import json
-                    # Remove brackets and parse
-                    emb_str = face['embedding'].strip('[]')
-                    face['embedding'] = [float(x) for x in emb_str.split(',')]
-            
-            return response.data
+            while pending is not None:
+                page = await pending
+                # A short page is not proof of the end when max-rows < page_size
+                pending = fetch(page[-1]['id']) if page else None
+                if page:
+                    embeddings, _ = await asyncio.to_thread(
+                        self._decode_page, [face.pop('embedding') for face in page]
+                    )
+                    yield page, embeddings
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    @staticmethod
+    def _decode_page(values: List[Any]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Decode a page of embeddings at settings.embedding_precision (blocking)"""
+        return quantize_embeddings(decode_embeddings(values), settings.embedding_precision)
+    
+    async def get_event_faces(
+        self,
+        event_id: str,
+        include_assigned: bool = False,
+        considered_after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get all faces with embeddings for an event (embeddings as compact rows, see iter_event_faces)"""
+        try:
+            faces = []
+            async for page, embeddings in self.iter_event_faces(
+                event_id, include_assigned, considered_after=considered_after
+            ):
+                for face, embedding in zip(page, embeddings):
+                    face['embedding'] = embedding
+                faces.extend(page)
+            return faces
         except Exception as e:
             logger.error(f"Error fetching faces for event {event_id}: {e}")
             return []
@@ -73,8 +234,8 @@ class SupabaseService:
     async def get_existing_face_persons(self, event_id: str) -> List[Dict[str, Any]]:
         """Get existing face_persons for an event"""
         try:
-            response = self.client.table('face_persons') \
-                .select('id, cluster_label, status, linked_user_id, representative_face_id') \
+            response = await self.client.table('face_persons') \
+                .select('id, cluster_label, status, linked_user_id, representative_face_id, metadata') \
                 .eq('event_id', event_id) \
                 .execute()
             return response.data
@@ -82,30 +243,294 @@ class SupabaseService:
             logger.error(f"Error fetching face_persons for event {event_id}: {e}")
             return []
     
-    async def get_face_embedding(self, face_id: str) -> Optional[List[float]]:
-        """Get embedding for a specific face"""
+    async def get_max_cluster_label(self, event_id: str) -> int:
+        """Highest cluster_label used in an event (-1 when there is none)"""
+        response = await self.client.table('face_persons') \
+            .select('cluster_label') \
+            .eq('event_id', event_id) \
+            .order('cluster_label', desc=True) \
+            .limit(1) \
+            .execute()
+        return response.data[0]['cluster_label'] if response.data else -1
+    
+    async def get_face_person_ids_by_label(self, event_id: str, min_label: int = 0) -> Dict[int, str]:
+        """Get cluster_label -> face_person id for labels >= min_label"""
+        response = await self.client.table('face_persons') \
+            .select('id, cluster_label') \
+            .eq('event_id', event_id) \
+            .gte('cluster_label', min_label) \
+            .execute()
+        return {fp['cluster_label']: fp['id'] for fp in response.data}
+    
+    async def delete_face_persons(self, face_person_ids: List[str]) -> bool:
+        """Delete several face_persons in one request"""
+        if not face_person_ids:
+            return True
         try:
-            response = self.client.table('faces') \
-                .select('embedding') \
-                .eq('id', face_id) \
-                .single() \
+            await self.client.table('face_persons') \
+                .delete() \
+                .in_('id', face_person_ids) \
+                .execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting {len(face_person_ids)} face_persons: {e}")
+            return False
+    
+    async def get_cluster_representations(self, event_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get face_persons with their centroid and / or prototypes in one query
+        
+        Only the columns of the enabled features are selected (centroids with
+        CLUSTERING_MODE=incremental, prototypes with CLUSTER_PROTOTYPE_COUNT > 0),
+        so each works with only its own migration applied.
+        
+        Returns:
+            face_persons with metadata, a parsed 'centroid' (None when not
+            computed yet or not selected) and 'prototypes' as a (k, 512)
+            array (None when not computed yet or not selected). None if the
+            columns are missing (migrations not applied).
+        """
+        columns = 'id, cluster_label, status, linked_user_id, representative_face_id, metadata'
+        if settings.clustering_mode == 'incremental':
+            columns += ', centroid, centroid_count'
+        if settings.cluster_prototype_count > 0:
+            columns += ', prototypes'
+        try:
+            response = await self.client.table('face_persons') \
+                .select(columns) \
+                .eq('event_id', event_id) \
                 .execute()
             
-            embedding = response.data.get('embedding')
-            if embedding and isinstance(embedding, str):
-                import json
-                emb_str = embedding.strip('[]')
-                embedding = [float(x) for x in emb_str.split(',')]
-            
-            return embedding
+            for face_person in response.data:
+                centroid = face_person.get('centroid')
+                face_person['centroid'] = decode_embedding(centroid) if centroid else None
+                prototypes = face_person.get('prototypes')
+                face_person['prototypes'] = decode_prototypes(prototypes) if prototypes else None
+            return response.data
         except Exception as e:
-            logger.error(f"Error fetching embedding for face {face_id}: {e}")
+            logger.error(f"Error fetching cluster representations for event {event_id}: {e}")
             return None
     
+    async def update_cluster_representations(self, updates: List[Dict[str, Any]]) -> bool:
+        """Update centroid / centroid_count / prototypes for multiple face_persons"""
+        try:
+            await self._gather_bounded(
+                self.client.table('face_persons')
+                    .update({key: value for key, value in update.items() if key != 'id'})
+                    .eq('id', update['id'])
+                for update in updates
+            )
+            logger.info(f"Updated {len(updates)} cluster representations")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating cluster representations: {e}")
+            return False
+    
+    async def get_event_member_users(self, event_id: str) -> Dict[str, str]:
+        """Get user_id -> event_members.id for members of an event with an account"""
+        try:
+            response = await self.client.table('event_members') \
+                .select('id, user_id') \
+                .eq('event_id', event_id) \
+                .not_.is_('user_id', 'null') \
+                .execute()
+            return {member['user_id']: member['id'] for member in response.data}
+        except Exception as e:
+            logger.error(f"Error fetching members of event {event_id}: {e}")
+            return {}
+    
+    async def upsert_media_tags(self, tags: List[Dict[str, Any]]) -> bool:
+        """Create or update media_tags (one per media and member) in one request"""
+        if not tags:
+            return True
+        try:
+            # A batch may not touch the same (media, member) row twice: last one wins
+            unique_tags = {(tag['media_id'], tag['member_id']): tag for tag in tags}
+            await self.client.table('media_tags') \
+                .upsert(list(unique_tags.values()), on_conflict='media_id,member_id') \
+                .execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error upserting {len(tags)} media_tags: {e}")
+            return False
+    
+    async def get_user_prototypes(self, user_ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Get identity index rows of several users in one query
+        
+        Returns:
+            user_id -> {'prototypes': (k, 512) array or None, 'stale': bool} for
+            users with a row (users never linked have none). None if the table
+            is missing (face_identity_index.sql not applied).
+        """
+        if not user_ids:
+            return {}
+        try:
+            response = await self.client.table('user_face_prototypes') \
+                .select('user_id, prototypes, stale') \
+                .in_('user_id', user_ids) \
+                .execute()
+            return {
+                row['user_id']: {
+                    'prototypes': decode_prototypes(row['prototypes']) if row.get('prototypes') else None,
+                    'stale': row['stale']
+                }
+                for row in response.data
+            }
+        except Exception as e:
+            logger.error(f"Error fetching identity prototypes: {e}")
+            return None
+    
+    async def get_user_linked_embeddings(self, user_id: str) -> List[np.ndarray]:
+        """
+        Get embeddings of all faces in clusters linked to a user, across events
+        
+        Clusters are read settings.embedding_fetch_chunk_size ids at a time,
+        their faces in settings.face_page_size pages keyed on id (like
+        iter_event_faces), so users with many faces are not truncated at
+        PostgREST's max-rows.
+        """
+        try:
+            clusters = await self.client.table('face_persons') \
+                .select('id') \
+                .eq('linked_user_id', user_id) \
+                .eq('status', 'linked') \
+                .execute()
+            cluster_ids = [cluster['id'] for cluster in clusters.data]
+            if not cluster_ids:
+                return []
+            
+            blocks = []
+            chunk_size = settings.embedding_fetch_chunk_size
+            for start in range(0, len(cluster_ids), chunk_size):
+                after_id = None
+                while True:
+                    query = self.client.table('faces') \
+                        .select('id, embedding') \
+                        .in_('face_person_id', cluster_ids[start:start + chunk_size]) \
+                        .not_.is_('embedding', 'null')
+                    if after_id is not None:
+                        query = query.gt('id', after_id)
+                    page = (await query.order('id').limit(settings.face_page_size).execute()).data
+                    # A short page is not proof of the end when max-rows < face_page_size
+                    if not page:
+                        break
+                    blocks.append(decode_embeddings([face['embedding'] for face in page]))
+                    after_id = page[-1]['id']
+            
+            return compact_embeddings(np.concatenate(blocks)) if blocks else []
+        except Exception as e:
+            logger.error(f"Error fetching linked faces of user {user_id}: {e}")
+            return []
+    
+    async def save_user_prototypes(self, user_id: str, prototypes: Optional[str], face_count: int) -> bool:
+        """Store recomputed identity prototypes (encode_prototypes text) and clear stale"""
+        try:
+            await self.client.table('user_face_prototypes').upsert({
+                'user_id': user_id,
+                'prototypes': prototypes,
+                'face_count': face_count,
+                'stale': False
+            }, on_conflict='user_id').execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving identity prototypes of user {user_id}: {e}")
+            return False
+    
+    async def mark_users_stale(self, user_ids: List[str]) -> bool:
+        """Flag identity prototypes for recomputation (faces of their clusters changed)"""
+        if not user_ids:
+            return True
+        try:
+            await self.client.table('user_face_prototypes') \
+                .upsert([{'user_id': user_id, 'stale': True} for user_id in user_ids], on_conflict='user_id') \
+                .execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking identity prototypes stale: {e}")
+            return False
+    
+    async def link_face_persons(self, links: List[Dict[str, str]]) -> bool:
+        """Link face_persons ({'id', 'linked_user_id'}) to users"""
+        try:
+            await self._gather_bounded(
+                self.client.table('face_persons')
+                    .update({'status': 'linked', 'linked_user_id': link['linked_user_id']})
+                    .eq('id', link['id'])
+                for link in links
+            )
+            logger.info(f"Linked {len(links)} face_persons")
+            return True
+        except Exception as e:
+            logger.error(f"Error linking face_persons: {e}")
+            return False
+    
+    async def get_face_embedding(self, face_id: str) -> Optional[np.ndarray]:
+        """Get embedding for a specific face (cached, see get_face_embeddings)"""
+        return (await self.get_face_embeddings([face_id])).get(face_id)
+    
+    async def get_face_embeddings(self, face_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Get embeddings for several faces, from the cache or in bulk queries
+        
+        Faces missing from the LRU cache (settings.embedding_cache_size) are
+        fetched with in_ filters of settings.embedding_fetch_chunk_size ids,
+        run concurrently, then cached: repeated cluster jobs only query the
+        representatives they have not seen yet.
+        
+        Returns:
+            face_id -> embedding row at settings.embedding_precision
+            (faces without embedding are omitted)
+        """
+        embeddings = {}
+        missing = []
+        for face_id in dict.fromkeys(face_ids):
+            if face_id in self.embedding_cache:
+                self.embedding_cache.move_to_end(face_id)
+                embeddings[face_id] = self.embedding_cache[face_id]
+            else:
+                missing.append(face_id)
+        if not missing:
+            return embeddings
+        
+        try:
+            chunk_size = settings.embedding_fetch_chunk_size
+            responses = await self._gather_bounded(
+                self.client.table('faces')
+                    .select('id, embedding')
+                    .in_('id', missing[start:start + chunk_size])
+                for start in range(0, len(missing), chunk_size)
+            )
+            
+            faces = [face for response in responses for face in response.data if face.get('embedding')]
+            matrix = decode_embeddings([face['embedding'] for face in faces])
+            fetched = dict(zip([face['id'] for face in faces], compact_embeddings(matrix)))
+            self._cache_embeddings(fetched)
+            embeddings.update(fetched)
+            logger.info(f"Face embeddings: {len(embeddings) - len(fetched)} cached, {len(fetched)} fetched")
+        except Exception as e:
+            logger.error(f"Error fetching embeddings for {len(missing)} faces: {e}")
+        return embeddings
+    
+    def _cache_embeddings(self, embeddings: Dict[str, np.ndarray]):
+        """Add embeddings to the LRU cache, evicting the least recently used"""
+        if settings.embedding_cache_size <= 0:
+            return
+        for face_id, embedding in embeddings.items():
+            self.embedding_cache[face_id] = embedding
+            self.embedding_cache.move_to_end(face_id)
+        while len(self.embedding_cache) > settings.embedding_cache_size:
+            self.embedding_cache.popitem(last=False)
+    
+    def invalidate_face_embeddings(self, face_ids: List[str]):
+        """Drop cached embeddings of faces whose row is being updated"""
+        for face_id in face_ids:
+            self.embedding_cache.pop(face_id, None)
+    
     async def create_face_persons(self, face_persons_data: List[Dict[str, Any]]) -> bool:
         """Create face_person clusters"""
         try:
-            response = self.client.table('face_persons') \
+            response = await self.client.table('face_persons') \
                 .insert(face_persons_data) \
                 .execute()
             logger.info(f"Created {len(face_persons_data)} face_persons")
@@ -115,20 +540,65 @@ class SupabaseService:
             return False
     
     async def update_face_assignments(self, assignments: List[Dict[str, str]]) -> bool:
-        """Update face_person_id for multiple faces"""
-        try:
-            # Supabase doesn't have bulk update, so we batch them
-            for assignment in assignments:
-                self.client.table('faces') \
-                    .update({'face_person_id': assignment['face_person_id']}) \
-                    .eq('id', assignment['face_id']) \
-                    .execute()
+        """
+        Update face_person_id for multiple faces
+        
+        One assign_faces_bulk RPC per settings.assignment_chunk_size faces;
+        falls back to one UPDATE per face when the function is missing
+        (face_assignments_bulk.sql not applied).
+        """
+        self.invalidate_face_embeddings([assignment['face_id'] for assignment in assignments])
+        chunk_size = settings.assignment_chunk_size
+        try:
+            for start in range(0, len(assignments), chunk_size):
+                chunk = assignments[start:start + chunk_size]
+                await self.client.rpc('assign_faces_bulk', {
+                    'p_face_ids': [assignment['face_id'] for assignment in chunk],
+                    'p_face_person_ids': [assignment['face_person_id'] for assignment in chunk]
+                }).execute()
+            logger.info(f"Updated {len(assignments)} face assignments in "
+                       f"{-(-len(assignments) // chunk_size)} bulk calls")
+            return True
+        except Exception as e:
+            logger.warning(f"Bulk face assignment failed, updating faces one by one: {e}")
+        
+        try:
+            # Idempotent: faces of chunks already applied are simply rewritten
+            await self._gather_bounded(
+                self.client.table('faces')
+                    .update({'face_person_id': assignment['face_person_id']})
+                    .eq('id', assignment['face_id'])
+                for assignment in assignments
+            )
             logger.info(f"Updated {len(assignments)} face assignments")
             return True
         except Exception as e:
             logger.error(f"Error updating face assignments: {e}")
             return False
     
+    async def mark_faces_considered(self, face_ids: List[str]) -> bool:
+        """
+        Stamp cluster_considered_at on faces an incremental run left unassigned
+        
+        Stamped faces stay in the incremental buffer (re-clustered with new
+        arrivals) for settings.incremental_buffer_max_age_hours, but no
+        longer count as new faces.
+        """
+        if not face_ids:
+            return True
+        try:
+            chunk_size = settings.embedding_fetch_chunk_size
+            await self._gather_bounded(
+                self.client.table('faces')
+                    .update({'cluster_considered_at': 'now()'})
+                    .in_('id', face_ids[start:start + chunk_size])
+                for start in range(0, len(face_ids), chunk_size)
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error marking {len(face_ids)} faces as considered: {e}")
+            return False
+    
     async def update_job_status(
         self,
         job_id: str,
@@ -151,7 +621,7 @@ class SupabaseService:
             elif status in ['completed', 'failed']:
                 update_data['completed_at'] = 'now()'
             
-            self.client.table('ml_jobs') \
+            await self.client.table('ml_jobs') \
                 .update(update_data) \
                 .eq('id', job_id) \
                 .execute()
@@ -163,7 +633,7 @@ class SupabaseService:
     async def increment_job_attempts(self, job_id: str) -> bool:
         """Increment job attempts counter"""
         try:
-            self.client.rpc('increment_job_attempts', {'job_id': job_id}).execute()
+            await self.client.rpc('increment_job_attempts', {'job_id': job_id}).execute()
             return True
         except Exception as e:
             logger.error(f"Error incrementing attempts for job {job_id}: {e}")
@@ -14,30 +14,40 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 POLL_INTERVAL = 10  # seconds
+BUSY_STATUS_CODES = (429, 503)  # worker inference queue is full
+
+
+def retry_after_seconds(response: httpx.Response) -> int:
+    """Back-off delay requested by the worker (Retry-After header)"""
+    try:
+        return int(response.headers.get('Retry-After', POLL_INTERVAL))
+    except ValueError:
+        return POLL_INTERVAL
+
+
+async def post_when_ready(client: httpx.AsyncClient, url: str, payload: dict) -> httpx.Response:
+    """POST to the worker, retrying while its inference queue is full"""
+    while True:
+        response = await client.post(url, json=payload)
+        if response.status_code not in BUSY_STATUS_CODES:
+            return response
+        delay = retry_after_seconds(response)
+        logger.info(f"Worker busy, retrying job {payload['job_id']} in {delay}s")
+        await asyncio.sleep(delay)
 
 
 async def get_signed_url(media_id: str) -> Optional[str]:
     """Generate signed URL for media download"""
     try:
         # Get media storage path
-        response = supabase_service.client.table('media') \
-            .select('storage_path') \
-            .eq('id', media_id) \
-            .single() \
-            .execute()
+        media = await supabase_service.get_media_info(media_id)
         
-        if not response.data:
+        if not media:
             logger.error(f"Media {media_id} not found")
             return None
         
-        storage_path = response.data['storage_path']
-        
         # Generate signed URL (valid for 1 hour)
-        signed_url_response = supabase_service.client.storage \
-            .from_('media') \
-            .create_signed_url(storage_path, 3600)
-        
-        return signed_url_response.get('signedURL')
+        return await supabase_service.create_signed_url(media['storage_path'], 3600)
         
     except Exception as e:
         logger.error(f"Error getting signed URL for {media_id}: {e}")
@@ -60,11 +70,12 @@ async def process_detect_job(job: dict):
                 logger.error(f"Could not get URL for media {media_id}")
                 continue
             
-            # Call worker /process endpoint
+            # Call worker /process endpoint, backing off while it is busy
             async with httpx.AsyncClient(timeout=300.0) as client:
-                response = await client.post(
+                response = await post_when_ready(
+                    client,
                     'http://localhost:8080/process',
-                    json={
+                    {
                         'job_id': job['id'],
                         'media_id': media_id,
                         'event_id': job['event_id'],
@@ -85,9 +96,10 @@ async def process_cluster_job(job: dict):
     """Process a cluster job by calling worker's /cluster endpoint"""
     try:
         async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
+            response = await post_when_ready(
+                client,
                 'http://localhost:8080/cluster',
-                json={
+                {
                     'job_id': job['id'],
                     'event_id': job['event_id']
                 }
@@ -108,19 +120,10 @@ async def poll_and_process():
     
     while True:
         try:
-            # Fetch pending jobs (ordered by priority and creation time)
-            response = supabase_service.client.table('ml_jobs') \
-                .select('*') \
-                .eq('status', 'pending') \
-                .order('priority', desc=True) \
-                .order('created_at', desc=False) \
-                .limit(1) \
-                .execute()
-            
-            jobs = response.data
+            # Fetch the next pending job (ordered by priority and creation time)
+            job = await supabase_service.get_next_pending_job()
             
-            if jobs and len(jobs) > 0:
-                job = jobs[0]
+            if job:
                 logger.info(f"Processing job {job['id']} (type: {job['job_type']})")
                 
                 # Mark as processing
@@ -0,0 +1,100 @@
+"""
+Benchmark du débit de reconnaissance (faces/sec) selon la taille de batch
+
+Compare detect_and_embed (un appel ONNX par visage) avec detect_and_embed_batch
+pour des batchs de reconnaissance de 1, 8, 32 et 64 visages.
+
+Usage :
+    python benchmark_batch_recognition.py <dossier_images> [--repeat 3]
+"""
+
+import argparse
+import glob
+import os
+import time
+
+from dotenv import load_dotenv
+from insightface.utils import face_align
+
+load_dotenv()
+
+from app.config import settings
+from app.services.face_detector import face_detector
+
+BATCH_SIZES = [1, 8, 32, 64]
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG')
+
+
+def load_images(directory: str):
+    paths = []
+    for pattern in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    images = []
+    for path in sorted(paths):
+        image = face_detector.load_image_from_path(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la reconnaissance batchée")
+    parser.add_argument('images_dir', help="Dossier contenant des photos de test")
+    parser.add_argument('--repeat', type=int, default=3, help="Nombre de répétitions par mesure")
+    args = parser.parse_args()
+
+    face_detector.initialize()
+
+    images = load_images(args.images_dir)
+    if not images:
+        print(f"❌ Aucune image trouvée dans {args.images_dir}")
+        return
+
+    print(f"📊 {len(images)} images chargées\n")
+
+    # Détection seule, une fois, pour isoler le coût de la reconnaissance
+    rec_model = face_detector.app.models['recognition']
+    crops = []
+    for image in images:
+        bboxes, kpss = face_detector.app.det_model.detect(image, max_num=0, metric='default')
+        for i in range(bboxes.shape[0]):
+            crops.append(face_align.norm_crop(image, landmark=kpss[i], image_size=rec_model.input_size[0]))
+
+    if not crops:
+        print("❌ Aucun visage détecté, impossible de mesurer la reconnaissance")
+        return
+
+    print(f"🙂 {len(crops)} visages détectés\n")
+
+    # Référence : pipeline actuel, un appel FaceAnalysis.get par image
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for image in images:
+            face_detector.detect_and_embed(image)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  detect_and_embed (référence) : {args.repeat * len(crops) / elapsed:8.1f} faces/sec (détection incluse)\n")
+
+    print("⚙️  Reconnaissance seule :")
+    for batch_size in BATCH_SIZES:
+        settings.recognition_batch_size = batch_size
+        face_detector._embed_crops(crops[:batch_size])  # warm-up
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            face_detector._embed_crops(crops)
+        elapsed = time.perf_counter() - start
+        print(f"  - batch {batch_size:3d} : {args.repeat * len(crops) / elapsed:8.1f} faces/sec")
+
+    print("\n⚙️  detect_and_embed_batch (détection incluse) :")
+    for batch_size in BATCH_SIZES:
+        settings.recognition_batch_size = batch_size
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            face_detector.detect_and_embed_batch(images)
+        elapsed = time.perf_counter() - start
+        print(f"  - batch {batch_size:3d} : {args.repeat * len(crops) / elapsed:8.1f} faces/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark de passage à l'échelle du clustering (dense, graphe de rayon, hiérarchique)
+
+Génère des visages synthétiques (identités + bruit) et mesure, pour chaque taille,
+le temps et le pic mémoire de ClusteringService.cluster_faces avec chaque moteur.
+Le moteur dense n'est lancé que jusqu'à --dense-max visages (n² floats en mémoire).
+Le moteur hiérarchique (micro-clusters puis fusion) est comparé au graphe de rayon (ARI).
+Avec --burst, une part des visages sont des quasi-doublons (rafales, doublons d'upload)
+et le coreset (CORESET_RADIUS) est comparé au graphe de rayon sans réduction.
+
+Usage :
+    python benchmark_clustering_scaling.py [--sizes 1000 10000 50000] [--dense-max 10000]
+        [--block-size 2048] [--workers 4] [--burst 0.4] [--coreset-radius 0.05]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.metrics import adjusted_rand_score
+
+load_dotenv()
+
+from app.config import settings
+from app.services.clustering import ClusteringService
+
+
+def synthetic_faces(n_faces: int, seed: int = 0, burst: float = 0.0) -> np.ndarray:
+    """~20 visages par identité, 10% de visages isolés (bruit), burst = part de quasi-doublons"""
+    rng = np.random.default_rng(seed)
+    n_identities = max(2, n_faces // 20)
+    centers = rng.normal(size=(n_identities, 512))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    # sigma 0.03 par dimension : distance cosinus intra-identité ~0.3
+    embeddings = centers[rng.integers(0, n_identities, n_faces)]
+    embeddings += rng.normal(scale=0.03, size=(n_faces, 512))
+    n_noise = n_faces // 10
+    embeddings[:n_noise] = rng.normal(size=(n_noise, 512))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    # Quasi-doublons d'un visage précédent (sigma 0.005 : distance cosinus ~0.01)
+    n_burst = int(n_faces * burst)
+    if n_burst:
+        sources = rng.integers(0, n_faces - n_burst, n_burst)
+        embeddings[n_faces - n_burst:] = embeddings[sources] + rng.normal(scale=0.005, size=(n_burst, 512))
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype(np.float32)
+
+
+def run(engine: str, embeddings: np.ndarray, coreset_radius: float = 0.0):
+    """Retourne (labels, secondes, pic mémoire en Mo, réduction du coreset)"""
+    settings.clustering_engine = engine
+    settings.coreset_radius = coreset_radius
+    face_ids = [str(i) for i in range(len(embeddings))]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    service = ClusteringService()
+    clusters, coreset_reduction = service.cluster_faces_with_stats(embeddings, face_ids, [1.0] * len(face_ids))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    labels = np.full(len(face_ids), -1)
+    for label, faces in clusters.items():
+        for face_id, _ in faces:
+            labels[int(face_id)] = label
+    return labels, elapsed, peak / 1e6, coreset_reduction
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de passage à l'échelle du clustering")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--dense-max', type=int, default=10000, help="Taille max pour le moteur dense")
+    parser.add_argument('--block-size', type=int, default=settings.cluster_block_size)
+    parser.add_argument('--workers', type=int, default=settings.hierarchical_workers,
+                        help="Processus du moteur hiérarchique")
+    parser.add_argument('--burst', type=float, default=0.0, help="Part de quasi-doublons")
+    parser.add_argument('--coreset-radius', type=float, default=0.05, help="Rayon du coreset")
+    args = parser.parse_args()
+
+    settings.cluster_block_size = args.block_size
+    settings.hierarchical_workers = args.workers
+    settings.hierarchical_min_faces = 0
+    print(f"⚙️  eps = {settings.cluster_epsilon}, min_samples = {settings.min_samples}, "
+          f"bloc = {args.block_size} lignes\n")
+
+    for n_faces in args.sizes:
+        embeddings = synthetic_faces(n_faces, burst=args.burst)
+        print(f"📊 {n_faces} visages")
+
+        sparse_labels, elapsed, peak, _ = run('sparse', embeddings)
+        n_clusters = len(set(sparse_labels.tolist()) - {-1})
+        print(f"  - graphe de rayon : {elapsed:7.2f}s, pic {peak:8.1f} Mo, {n_clusters} clusters")
+
+        coreset_labels, elapsed, peak, reduction = run('sparse', embeddings, args.coreset_radius)
+        ari = adjusted_rand_score(sparse_labels, coreset_labels)
+        print(f"  - coreset + graphe: {elapsed:7.2f}s, pic {peak:8.1f} Mo, ARI vs graphe {ari:.4f}, "
+              f"{reduction:.0%} de points en moins")
+
+        hier_labels, elapsed, peak, _ = run('hierarchical', embeddings)
+        ari = adjusted_rand_score(sparse_labels, hier_labels)
+        print(f"  - hiérarchique    : {elapsed:7.2f}s, pic {peak:8.1f} Mo, ARI vs graphe {ari:.4f}")
+
+        if n_faces <= args.dense_max:
+            dense_labels, elapsed, peak, _ = run('dense', embeddings)
+            identical = np.array_equal(dense_labels, sparse_labels)
+            print(f"  - dense           : {elapsed:7.2f}s, pic {peak:8.1f} Mo, "
+                  f"labels {'identiques ✅' if identical else 'différents ❌'}")
+        else:
+            print(f"  - dense           : ignoré (~{n_faces * n_faces * 4 / 1e9:.1f} Go de distances)")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Microbenchmark du décodage des embeddings pgvector
+
+Compare, sur des lignes au format texte pgvector ('[0.1,0.2,...]') :
+  - l'ancien parseur (strip('[]') puis float() par élément, 512 par visage)
+  - app.embedding_codec.decode_embeddings (un seul buffer parsé par numpy)
+  - le format binaire base64 float32 (si la base le fournit)
+et vérifie que les matrices obtenues sont identiques.
+
+Usage :
+    python benchmark_embedding_codec.py [--faces 1000 20000] [--repeat 3]
+"""
+
+import argparse
+import base64
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.embedding_codec import decode_embeddings
+
+
+def legacy_parse(rows):
+    """Parseur d'origine de SupabaseService"""
+    return np.array([[float(x) for x in row.strip('[]').split(',')] for row in rows], dtype=np.float32)
+
+
+def best_time(fn, rows, repeat: int):
+    """Meilleur temps sur repeat exécutions, et le résultat"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark du décodage des embeddings")
+    parser.add_argument('--faces', type=int, nargs='+', default=[1000, 20000])
+    parser.add_argument('--repeat', type=int, default=3, help="Nombre de répétitions par mesure")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_faces in args.faces:
+        embeddings = rng.normal(size=(n_faces, 512)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # Même rendu que pgvector : shortest repr float32, sans espaces
+        text_rows = ['[' + ','.join(map(repr, row.tolist())) + ']' for row in embeddings]
+        binary_rows = [base64.b64encode(row.astype('<f4').tobytes()).decode('ascii') for row in embeddings]
+
+        legacy_time, reference = best_time(legacy_parse, text_rows, args.repeat)
+        text_time, text_matrix = best_time(decode_embeddings, text_rows, args.repeat)
+        binary_time, binary_matrix = best_time(decode_embeddings, binary_rows, args.repeat)
+
+        identical = np.array_equal(reference, text_matrix) and np.array_equal(embeddings, binary_matrix)
+        print(f"📊 {n_faces} visages :")
+        print(f"  - ancien parseur   : {legacy_time:7.3f}s ({n_faces / legacy_time:9.0f} visages/s)")
+        print(f"  - codec texte      : {text_time:7.3f}s ({n_faces / text_time:9.0f} visages/s), "
+              f"x{legacy_time / text_time:.1f}")
+        print(f"  - codec base64     : {binary_time:7.3f}s ({n_faces / binary_time:9.0f} visages/s), "
+              f"x{legacy_time / binary_time:.1f}")
+        print(f"  - résultats        : {'identiques ✅' if identical else 'différents ❌'}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark du temps de chargement du modèle (démarrage à froid)
+
+Chaque mesure charge buffalo_l dans un processus Python neuf, avec le même nombre
+de threads ONNX par modèle que les threads d'inférence / processus du pool
+(sessions recréées avec ces options après le chargement, comme dans le worker) :
+  1. sans cache de graphes optimisés
+  2. premier démarrage avec cache (optimisation + écriture des graphes)
+  3. démarrages suivants avec cache (graphes déjà optimisés)
+
+Usage :
+    python benchmark_model_load.py [--cache-dir /tmp/onnx_cache] [--repeat 3] [--onnx-threads 1]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def load_once(onnx_threads: int):
+    """Mode enfant : charge le modèle et affiche le temps en secondes"""
+    from app.services.face_detector import FaceDetectorService
+
+    start = time.perf_counter()
+    FaceDetectorService(onnx_threads=onnx_threads or None).initialize()
+    print(f"{time.perf_counter() - start:.3f}")
+
+
+def measure(cache_dir, onnx_threads: int):
+    """Lance un processus neuf qui charge le modèle, retourne le temps mesuré"""
+    env = dict(os.environ)
+    env.pop('ONNX_OPTIMIZED_MODEL_DIR', None)
+    if cache_dir:
+        env['ONNX_OPTIMIZED_MODEL_DIR'] = cache_dir
+
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', '--onnx-threads', str(onnx_threads)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du chargement du modèle")
+    parser.add_argument('--cache-dir', default=None, help="Dossier du cache (temporaire par défaut)")
+    parser.add_argument('--repeat', type=int, default=3, help="Nombre de démarrages par mesure")
+    parser.add_argument('--onnx-threads', type=int, default=1,
+                        help="Threads ONNX par modèle, comme l'exécuteur et le pool (0 = défaut onnxruntime)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        load_once(args.onnx_threads)
+        return
+
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix='onnx_cache_')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"⏱️  Chargement de buffalo_l (un processus neuf par mesure, {args.onnx_threads or 'défaut'} threads ONNX)\n")
+
+    without_cache = [measure(None, args.onnx_threads) for _ in range(args.repeat)]
+    print(f"  - sans cache              : {min(without_cache):6.2f}s (min sur {args.repeat})")
+
+    first_run = measure(cache_dir, args.onnx_threads)
+    print(f"  - 1er démarrage + export  : {first_run:6.2f}s")
+
+    with_cache = [measure(cache_dir, args.onnx_threads) for _ in range(args.repeat)]
+    print(f"  - avec cache              : {min(with_cache):6.2f}s (min sur {args.repeat})")
+
+    gain = 100 * (1 - min(with_cache) / min(without_cache))
+    print(f"\n📊 Gain au démarrage : {gain:.0f}%")
+
+    if not args.cache_dir:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark INT8 vs FP32 : débit, dérive des embeddings et accord DBSCAN
+
+Compare sur des photos locales :
+  - le débit de reconnaissance (faces/sec) et du pipeline complet
+  - la dérive cosinus des embeddings INT8 par rapport au FP32 (mêmes visages alignés)
+  - l'accord du clustering DBSCAN (ClusteringService.cluster_faces) entre les deux
+
+Usage :
+    python quantize_models.py /tmp/int8
+    python benchmark_quantization.py <dossier_images> --int8-dir /tmp/int8 [--detection] [--repeat 3]
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from insightface.utils import face_align
+from sklearn.metrics import adjusted_rand_score
+
+load_dotenv()
+
+from app.config import settings
+from app.services.clustering import ClusteringService
+from app.services.face_detector import FaceDetectorService
+
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG')
+
+
+def load_detector(int8_dir, int8_detection: bool) -> FaceDetectorService:
+    settings.int8_model_dir = int8_dir
+    settings.int8_detection = int8_detection
+    detector = FaceDetectorService()
+    detector.initialize()
+    return detector
+
+
+def load_images(detector: FaceDetectorService, directory: str):
+    paths = []
+    for pattern in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    images = []
+    for path in sorted(paths):
+        image = detector.load_image_from_path(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def faces_per_sec(fn, n_faces: int, repeat: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return repeat * n_faces / (time.perf_counter() - start)
+
+
+def cluster_labels(embeddings: np.ndarray) -> np.ndarray:
+    """Labels DBSCAN par visage, via le service utilisé en production"""
+    face_ids = [str(i) for i in range(len(embeddings))]
+    clusters = ClusteringService().cluster_faces(embeddings, face_ids, [1.0] * len(face_ids))
+    labels = np.full(len(face_ids), -1)
+    for label, faces in clusters.items():
+        for face_id, _ in faces:
+            labels[int(face_id)] = label
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark INT8 vs FP32")
+    parser.add_argument('images_dir', help="Dossier contenant des photos de test")
+    parser.add_argument('--int8-dir', required=True, help="Sortie de quantize_models.py")
+    parser.add_argument('--detection', action='store_true', help="Détecteur INT8 aussi")
+    parser.add_argument('--repeat', type=int, default=3, help="Nombre de répétitions par mesure")
+    args = parser.parse_args()
+
+    fp32 = load_detector(None, False)
+    int8 = load_detector(args.int8_dir, args.detection)
+
+    images = load_images(fp32, args.images_dir)
+    if not images:
+        print(f"❌ Aucune image trouvée dans {args.images_dir}")
+        return
+
+    # Mêmes visages alignés (détection FP32) pour isoler l'effet de la reconnaissance
+    rec_size = fp32.app.models['recognition'].input_size[0]
+    crops = []
+    for image in images:
+        bboxes, kpss = fp32.app.det_model.detect(image, max_num=0, metric='default')
+        for i in range(bboxes.shape[0]):
+            crops.append(face_align.norm_crop(image, landmark=kpss[i], image_size=rec_size))
+
+    if len(crops) < 2:
+        print("❌ Pas assez de visages détectés pour comparer")
+        return
+
+    print(f"📊 {len(images)} images, {len(crops)} visages\n")
+
+    print("⚙️  Débit :")
+    for name, detector in (('FP32', fp32), ('INT8', int8)):
+        rec_speed = faces_per_sec(lambda: detector._embed_crops(crops), len(crops), args.repeat)
+        full_speed = faces_per_sec(lambda: detector.detect_and_embed_batch(images), len(crops), args.repeat)
+        print(f"  - {name} : reconnaissance {rec_speed:8.1f} faces/sec, pipeline complet {full_speed:8.1f} faces/sec")
+
+    emb_fp32 = fp32._embed_crops(crops)
+    emb_int8 = int8._embed_crops(crops)
+    drift = 1.0 - np.sum(emb_fp32 * emb_int8, axis=1)
+    print("\n📐 Dérive cosinus INT8 vs FP32 :")
+    print(f"  - moyenne : {drift.mean():.5f}")
+    print(f"  - p99     : {np.percentile(drift, 99):.5f}")
+    print(f"  - max     : {drift.max():.5f}")
+    print(f"  (eps DBSCAN = {settings.cluster_epsilon})")
+
+    labels_fp32 = cluster_labels(emb_fp32)
+    labels_int8 = cluster_labels(emb_int8)
+    ari = adjusted_rand_score(labels_fp32, labels_int8)
+    n_fp32 = len(set(labels_fp32) - {-1})
+    n_int8 = len(set(labels_int8) - {-1})
+    print("\n🔍 Accord DBSCAN :")
+    print(f"  - clusters FP32 / INT8 : {n_fp32} / {n_int8}")
+    print(f"  - bruit FP32 / INT8    : {(labels_fp32 == -1).sum()} / {(labels_int8 == -1).sum()}")
+    print(f"  - Adjusted Rand Index  : {ari:.4f}")
+
+    if ari >= 0.99:
+        print("\n✅ Clustering inchangé, INT8 utilisable")
+    else:
+        print("\n⚠️  Clustering différent, vérifier avant de passer en production")
+
+
+if __name__ == '__main__':
+    main()
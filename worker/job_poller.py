@@ -17,6 +17,7 @@ WORKER_URL = os.getenv('WORKER_URL', 'http://localhost:8080')
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 POLL_INTERVAL = 5  # seconds
+BUSY_STATUS_CODES = (429, 503)  # worker inference queue is full
 
 class JobPoller:
     def __init__(self):
@@ -68,14 +69,24 @@ class JobPoller:
             if job_type == 'cluster':
                 # Call clustering endpoint
                 async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{self.worker_url}/cluster",
-                        json={
-                            'job_id': job_id,
-                            'event_id': event_id
-                        },
-                        timeout=60.0
-                    )
+                    while True:
+                        response = await client.post(
+                            f"{self.worker_url}/cluster",
+                            json={
+                                'job_id': job_id,
+                                'event_id': event_id
+                            },
+                            timeout=60.0
+                        )
+                        if response.status_code not in BUSY_STATUS_CODES:
+                            break
+                        # The worker leaves the job as is: retry it here after Retry-After
+                        try:
+                            delay = int(response.headers.get('Retry-After', POLL_INTERVAL))
+                        except ValueError:
+                            delay = POLL_INTERVAL
+                        print(f"⏸️ Worker busy, job {job_id[:8]} retried in {delay}s")
+                        await asyncio.sleep(delay)
                     
                     if response.status_code == 200:
                         result = response.json()
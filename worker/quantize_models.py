@@ -0,0 +1,169 @@
+"""
+Quantification INT8 des modèles buffalo_l
+
+Écrit des copies <modèle>.int8.onnx utilisables avec INT8_MODEL_DIR :
+  - dynamic : poids INT8, activations quantifiées à la volée (aucune donnée requise)
+  - static  : QDQ calibré sur des photos locales (plus rapide sur CPU, nécessite --calibration-dir)
+
+Usage :
+    python quantize_models.py <dossier_sortie> [--mode dynamic|static]
+        [--calibration-dir <dossier_images>] [--detection] [--max-samples 200]
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+from insightface.utils import face_align
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+load_dotenv()
+
+from app.config import settings
+from app.services.face_detector import face_detector, INT8_MODEL_SUFFIX
+
+IMAGE_EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG')
+
+
+class BlobReader(CalibrationDataReader):
+    """Fournit des blobs pré-calculés à quantize_static, un par appel"""
+
+    def __init__(self, input_name: str, blobs):
+        self.input_name = input_name
+        self.blobs = iter(blobs)
+
+    def get_next(self):
+        blob = next(self.blobs, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def load_calibration_images(directory: str, max_samples: int):
+    paths = []
+    for pattern in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    images = []
+    for path in sorted(paths)[:max_samples]:
+        image = face_detector.load_image_from_path(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def detection_blobs(images):
+    """Entrées du détecteur, prétraitées comme RetinaFace.detect"""
+    det_model = face_detector.app.det_model
+    width, height = det_model.input_size
+    for image in images:
+        scale = min(width / image.shape[1], height / image.shape[0])
+        resized = cv2.resize(image, (int(image.shape[1] * scale), int(image.shape[0] * scale)))
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        canvas[:resized.shape[0], :resized.shape[1]] = resized
+        yield cv2.dnn.blobFromImage(
+            canvas, 1.0 / det_model.input_std, (width, height),
+            (det_model.input_mean,) * 3, swapRB=True
+        )
+
+
+def recognition_blobs(images, max_samples: int):
+    """Visages alignés détectés par le modèle FP32, prétraités comme ArcFaceONNX.get_feat"""
+    rec_model = face_detector.app.models['recognition']
+    count = 0
+    for image in images:
+        bboxes, kpss = face_detector.app.det_model.detect(image, max_num=0, metric='default')
+        for i in range(bboxes.shape[0]):
+            crop = face_align.norm_crop(image, landmark=kpss[i], image_size=rec_model.input_size[0])
+            yield cv2.dnn.blobFromImages(
+                [crop], 1.0 / rec_model.input_std, rec_model.input_size,
+                (rec_model.input_mean,) * 3, swapRB=True
+            )
+            count += 1
+            if count >= max_samples:
+                return
+
+
+def quantize(model, output_dir: str, mode: str, blobs=None):
+    """Quantifie un modèle et retourne le chemin de la copie INT8"""
+    source = model.model_file
+    target = os.path.join(output_dir, os.path.basename(source).replace('.onnx', INT8_MODEL_SUFFIX))
+
+    if mode == 'dynamic':
+        quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+        return target
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Inférence de formes recommandée avant la quantification statique
+        preprocessed = os.path.join(tmp_dir, 'preprocessed.onnx')
+        try:
+            quant_pre_process(source, preprocessed)
+        except Exception as e:
+            print(f"⚠️  Pré-traitement ignoré ({e})")
+            preprocessed = source
+
+        quantize_static(
+            preprocessed,
+            target,
+            BlobReader(model.input_name, blobs),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8
+        )
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantification INT8 des modèles buffalo_l")
+    parser.add_argument('output_dir', help="Dossier de sortie (à utiliser comme INT8_MODEL_DIR)")
+    parser.add_argument('--mode', choices=['dynamic', 'static'], default='dynamic')
+    parser.add_argument('--calibration-dir', help="Photos de calibration (mode static)")
+    parser.add_argument('--detection', action='store_true', help="Quantifier aussi le détecteur")
+    parser.add_argument('--max-samples', type=int, default=200, help="Échantillons de calibration max")
+    args = parser.parse_args()
+
+    if args.mode == 'static' and not args.calibration_dir:
+        parser.error("--calibration-dir est requis en mode static")
+
+    # Toujours partir des modèles FP32 d'origine
+    settings.int8_model_dir = None
+    settings.onnx_optimized_model_dir = None
+    face_detector.initialize()
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    images = []
+    if args.mode == 'static':
+        images = load_calibration_images(args.calibration_dir, args.max_samples)
+        if not images:
+            print(f"❌ Aucune image trouvée dans {args.calibration_dir}")
+            return
+        print(f"📊 {len(images)} images de calibration\n")
+
+    rec_model = face_detector.app.models['recognition']
+    print(f"⚙️  Reconnaissance ({os.path.basename(rec_model.model_file)}, {args.mode})...")
+    blobs = recognition_blobs(images, args.max_samples) if images else None
+    target = quantize(rec_model, args.output_dir, args.mode, blobs)
+    print(f"✅ {target} ({os.path.getsize(target) / 1e6:.1f} MB)")
+
+    if args.detection:
+        det_model = face_detector.app.det_model
+        print(f"⚙️  Détection ({os.path.basename(det_model.model_file)}, {args.mode})...")
+        blobs = detection_blobs(images) if images else None
+        target = quantize(det_model, args.output_dir, args.mode, blobs)
+        print(f"✅ {target} ({os.path.getsize(target) / 1e6:.1f} MB)")
+
+    print(f"\n👉 INT8_MODEL_DIR={os.path.abspath(args.output_dir)}"
+          + (" INT8_DETECTION=true" if args.detection else ""))
+
+
+if __name__ == '__main__':
+    main()
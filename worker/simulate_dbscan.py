@@ -12,6 +12,8 @@ import json
 
 load_dotenv()
 
+from app.services.clustering import DensityHierarchy
+
 # Connexion à Supabase
 supabase = create_client(
     os.getenv('SUPABASE_URL'),
@@ -138,3 +140,17 @@ if noise_indices:
     print(f"   → DBSCAN nécessite min_samples={MIN_SAMPLES} voisins dans un rayon eps={EPSILON}")
     print(f"   → Si une face a < {MIN_SAMPLES} voisins proches, elle est marquée 'noise'")
 
+# Balayage d'eps : une seule hiérarchie de densité, puis des coupes instantanées
+print(f"\n📈 Balayage eps (hiérarchie de densité, min_samples = {MIN_SAMPLES}) :\n")
+hierarchy = DensityHierarchy(
+    embeddings.astype(np.float32),
+    [info['full_id'] for info in face_info],
+    [1.0] * len(face_info),
+    max_eps=0.7
+)
+for eps in [0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7]:
+    sweep_labels = hierarchy.cut(eps, MIN_SAMPLES)
+    sweep_sizes = np.bincount(sweep_labels[sweep_labels != -1])
+    n_valid = int((sweep_sizes >= MIN_CLUSTER_SIZE).sum())
+    print(f"  eps = {eps:.2f} : {len(sweep_sizes)} clusters ({n_valid} valides), "
+          f"{int((sweep_labels == -1).sum())} noise")
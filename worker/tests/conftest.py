@@ -0,0 +1,33 @@
+"""Shared test setup: required settings, synthetic faces"""
+
+import os
+
+import numpy as np
+import pytest
+
+# Settings fields without defaults (no database is contacted by the tests)
+os.environ.setdefault('SUPABASE_URL', 'http://localhost:54321')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'test-key')
+os.environ.setdefault('CALLBACK_URL', 'http://localhost/callback')
+os.environ.setdefault('CALLBACK_SECRET', 'test-secret')
+
+
+def synthetic_faces(n_people: int, faces_per_person: int, n_noise: int = 0, spread: float = 0.7, seed: int = 0):
+    """L2-normalized 512-d embeddings around random identities, plus uniform noise faces"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_people, 512))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    people = np.repeat(centers, faces_per_person, axis=0)
+    people += rng.normal(scale=spread / np.sqrt(512), size=people.shape)
+    noise = rng.normal(size=(n_noise, 512))
+    embeddings = np.vstack([people, noise]).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    labels = np.concatenate([np.repeat(np.arange(n_people), faces_per_person), np.full(n_noise, -1)])
+    order = rng.permutation(len(embeddings))
+    return embeddings[order], labels[order]
+
+
+@pytest.fixture
+def faces():
+    """8 people x 12 faces plus 20 noise faces, shuffled"""
+    return synthetic_faces(8, 12, n_noise=20)
@@ -0,0 +1,119 @@
+"""Sparse radius graph, density hierarchy, coreset and quality metrics"""
+
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+from sklearn.metrics.pairwise import cosine_distances
+
+from app.config import settings
+from app.embedding_precision import compact_embeddings
+from app.services.clustering import ClusteringService, DensityHierarchy, coreset_leaders, radius_neighbor_graph
+from conftest import synthetic_faces
+
+
+def dbscan(distances, eps: float, min_samples: int) -> np.ndarray:
+    return DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(distances)
+
+
+@pytest.mark.parametrize('block_size', [1, 17, 1000])
+def test_radius_graph_keeps_pairs_within_eps(faces, block_size):
+    embeddings, _ = faces
+    eps = 0.33
+    graph = radius_neighbor_graph(embeddings, eps, block_size).toarray()
+    dense = cosine_distances(embeddings)
+    within = dense <= eps
+    np.fill_diagonal(within, True)
+    np.testing.assert_array_equal(graph != 0, within & (dense != 0) & ~np.eye(len(dense), dtype=bool))
+    np.testing.assert_allclose(graph[graph != 0], dense[graph != 0], atol=1e-6)
+
+
+@pytest.mark.parametrize('eps,min_samples', [(0.3, 2), (0.33, 4), (0.36, 8)])
+def test_radius_graph_dbscan_matches_dense(faces, eps, min_samples):
+    embeddings, _ = faces
+    sparse_labels = dbscan(radius_neighbor_graph(embeddings, eps, 32), eps, min_samples)
+    dense_labels = dbscan(cosine_distances(embeddings), eps, min_samples)
+    np.testing.assert_array_equal(sparse_labels, dense_labels)
+
+
+def test_radius_graph_empty():
+    assert radius_neighbor_graph(np.zeros((0, 512), dtype=np.float32), 0.3, 8).shape == (0, 0)
+
+
+def test_radius_graph_keeps_duplicates_as_neighbors():
+    embeddings = np.repeat(np.eye(512, dtype=np.float32)[:2], 3, axis=0)
+    labels = dbscan(radius_neighbor_graph(embeddings, 0.1, 4), 0.1, 3)
+    assert labels.tolist() == [0, 0, 0, 1, 1, 1]
+
+
+@pytest.mark.parametrize('min_samples', [2, 4])
+def test_hierarchy_cut_matches_dbscan(faces, min_samples):
+    embeddings, _ = faces
+    hierarchy = DensityHierarchy(embeddings, [str(i) for i in range(len(embeddings))], [1.0] * len(embeddings), 0.4)
+    dense = cosine_distances(embeddings)
+    for eps in (0.3, 0.33, 0.36, 0.4):
+        cut = hierarchy.cut(eps, min_samples)
+        expected = dbscan(dense, eps, min_samples)
+        np.testing.assert_array_equal(cut == -1, expected == -1)
+        assert adjusted_rand_score(expected, cut) == pytest.approx(1.0)
+
+
+def test_hierarchy_rejects_eps_above_max(faces):
+    embeddings, _ = faces
+    hierarchy = DensityHierarchy(embeddings, [str(i) for i in range(len(embeddings))], [1.0] * len(embeddings), 0.3)
+    with pytest.raises(ValueError):
+        hierarchy.cut(0.35, 2)
+
+
+def test_coreset_leaders_within_radius(faces):
+    embeddings, _ = faces
+    radius = 0.3
+    leaders, assignment = coreset_leaders(embeddings, radius, 16)
+    assert (assignment >= 0).all()
+    np.testing.assert_array_equal(assignment[leaders], np.arange(len(leaders)))
+    distances = 1.0 - np.sum(embeddings * embeddings[leaders[assignment]], axis=1)
+    assert distances.max() <= radius + 1e-6
+
+
+def test_coreset_collapses_duplicates_only():
+    distinct = np.eye(512, dtype=np.float32)[:5]
+    embeddings = np.vstack([distinct, distinct[[1, 1, 3]]])
+    leaders, assignment = coreset_leaders(embeddings, 0.01, 3)
+    assert leaders.tolist() == [0, 1, 2, 3, 4]
+    assert assignment.tolist() == [0, 1, 2, 3, 4, 1, 1, 3]
+
+
+def test_coreset_clustering_matches_plain_clustering(faces, monkeypatch):
+    embeddings, _ = faces
+    embeddings = np.vstack([embeddings, embeddings[:30]])
+    face_ids = [str(i) for i in range(len(embeddings))]
+    service = ClusteringService()
+    plain = service.cluster_faces(embeddings, face_ids, [1.0] * len(face_ids))
+    monkeypatch.setattr(settings, 'coreset_radius', 1e-6)
+    clusters, reduction = service.cluster_faces_with_stats(embeddings, face_ids, [1.0] * len(face_ids))
+    assert reduction == pytest.approx(30 / len(embeddings))
+    assert sorted(map(sorted, clusters.values())) == sorted(map(sorted, plain.values()))
+
+
+def test_silhouette_matches_sklearn():
+    embeddings, labels = synthetic_faces(6, 15, n_noise=10, spread=1.2, seed=3)
+    clustered = labels != -1
+    expected = silhouette_score(embeddings[clustered], labels[clustered], metric='cosine')
+    quality = ClusteringService().compute_quality_metrics(embeddings, labels, sample_size=0)
+    assert quality['clusters'] == 6 and quality['clustered_faces'] == clustered.sum()
+    assert quality['silhouette'] == pytest.approx(expected, abs=1e-5)
+
+
+def test_quality_metrics_from_compact_rows(monkeypatch):
+    embeddings, labels = synthetic_faces(6, 15, spread=1.2, seed=4)
+    monkeypatch.setattr(settings, 'cluster_block_size', 7)
+    service = ClusteringService()
+    reference = service.compute_quality_metrics(embeddings, labels, sample_size=40)
+    assert service.compute_quality_metrics(list(embeddings), labels, sample_size=40) == pytest.approx(reference)
+    int8 = service.compute_quality_metrics(compact_embeddings(embeddings, 'int8'), labels, sample_size=40)
+    assert int8['silhouette'] == pytest.approx(reference['silhouette'], abs=1e-3)
+
+
+def test_quality_metrics_need_two_clusters():
+    embeddings, labels = synthetic_faces(1, 10, n_noise=5)
+    assert ClusteringService().compute_quality_metrics(embeddings, labels, sample_size=0) == {}
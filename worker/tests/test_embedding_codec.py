@@ -0,0 +1,69 @@
+"""pgvector text / base64 embedding codec"""
+
+import base64
+
+import numpy as np
+import pytest
+
+from app.embedding_codec import decode_embedding, decode_embeddings, decode_prototypes, encode_prototypes
+
+
+def pgvector_text(vector: np.ndarray) -> str:
+    return '[' + ','.join(repr(float(x)) for x in vector) + ']'
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(4, 512)).astype(np.float32)
+
+
+def test_decode_embedding_formats(vectors):
+    vector = vectors[0]
+    raw = vector.astype('<f4').tobytes()
+    for value in (pgvector_text(vector), base64.b64encode(raw).decode('ascii'), raw, vector.tolist()):
+        decoded = decode_embedding(value)
+        assert decoded.dtype == np.float32
+        np.testing.assert_array_equal(decoded, vector)
+
+
+def test_decode_embedding_rejects_wrong_length(vectors):
+    with pytest.raises(ValueError):
+        decode_embedding(pgvector_text(vectors[0][:511]))
+    with pytest.raises(ValueError):
+        decode_embedding(base64.b64encode(vectors[0][:511].tobytes()).decode('ascii'))
+
+
+def test_decode_embeddings_matches_per_row_decoding(vectors):
+    values = [
+        pgvector_text(vectors[0]),
+        base64.b64encode(vectors[1].tobytes()).decode('ascii'),
+        pgvector_text(vectors[2]),
+        vectors[3].tolist()
+    ]
+    matrix = decode_embeddings(values)
+    assert matrix.shape == (4, 512) and matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix, np.array([decode_embedding(v) for v in values]))
+    np.testing.assert_array_equal(matrix, vectors)
+
+
+def test_decode_embeddings_text_matches_python_floats(vectors):
+    text = '[' + ','.join(f"{x:.9g}" for x in vectors[0]) + ']'
+    expected = np.array([np.float32(float(x)) for x in text[1:-1].split(',')])
+    np.testing.assert_array_equal(decode_embeddings([text])[0], expected)
+
+
+def test_decode_embeddings_rejects_short_row_next_to_long_row(vectors):
+    short = pgvector_text(vectors[0][:511])
+    long = pgvector_text(np.append(vectors[1], 1.0))
+    with pytest.raises(ValueError):
+        decode_embeddings([short, long])
+
+
+def test_decode_embeddings_empty():
+    assert decode_embeddings([]).shape == (0, 512)
+
+
+def test_prototypes_round_trip(vectors):
+    np.testing.assert_array_equal(decode_prototypes(encode_prototypes(vectors)), vectors)
+    with pytest.raises(ValueError):
+        decode_prototypes(base64.b64encode(b'\0' * 12).decode('ascii'))
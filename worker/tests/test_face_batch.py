@@ -0,0 +1,44 @@
+"""FaceBatch npz serialization"""
+
+import numpy as np
+
+from app.face_batch import FaceBatch
+
+
+def random_batch(n_faces: int) -> FaceBatch:
+    rng = np.random.default_rng(n_faces)
+    landmarks = rng.random((n_faces, 5, 2), dtype=np.float32)
+    landmarks[:1] = np.nan
+    return FaceBatch(
+        bboxes=rng.random((n_faces, 4), dtype=np.float32),
+        landmarks=landmarks,
+        scores=rng.random(n_faces, dtype=np.float32),
+        embeddings=rng.normal(size=(n_faces, 512)).astype(np.float32),
+        embedded=rng.random(n_faces) > 0.3
+    )
+
+
+def assert_batches_equal(actual: FaceBatch, expected: FaceBatch):
+    for field in ('bboxes', 'landmarks', 'scores', 'embeddings', 'embedded'):
+        actual_values, expected_values = getattr(actual, field), getattr(expected, field)
+        assert actual_values.dtype == expected_values.dtype, field
+        np.testing.assert_array_equal(actual_values, expected_values, err_msg=field)
+
+
+def test_round_trip():
+    batch = random_batch(7)
+    restored = FaceBatch.from_bytes(batch.to_bytes())
+    assert len(restored) == 7
+    assert_batches_equal(restored, batch)
+
+
+def test_round_trip_empty():
+    restored = FaceBatch.from_bytes(FaceBatch.empty().to_bytes())
+    assert len(restored) == 0
+    assert_batches_equal(restored, FaceBatch.empty())
+
+
+def test_round_trip_of_subset_and_concat():
+    batch = random_batch(6)
+    combined = FaceBatch.concat([batch.take([0, 2]), batch.take(np.arange(6) >= 4)])
+    assert_batches_equal(FaceBatch.from_bytes(combined.to_bytes()), batch.take([0, 2, 4, 5]))
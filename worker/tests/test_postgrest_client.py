@@ -0,0 +1,103 @@
+"""PostgREST query building"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.postgrest_client import APIError, AsyncPostgrestClient, format_value
+
+
+@pytest.fixture
+def client():
+    return AsyncPostgrestClient('http://db.test/', 'key', http2=False)
+
+
+def test_format_value():
+    assert format_value(None) == 'null'
+    assert format_value(True) == 'true'
+    assert format_value(3) == '3'
+    assert format_value('plain') == 'plain'
+    assert format_value('a,b') == '"a,b"'
+    assert format_value('say "hi"') == '"say \\"hi\\""'
+    assert format_value('x', quote=True) == '"x"'
+
+
+def test_select_and_filters(client):
+    query = client.table('faces') \
+        .select('id, embedding') \
+        .eq('event_id', 'ev-1') \
+        .not_.is_('embedding', 'null') \
+        .is_('face_person_id', None) \
+        .gt('id', 'f-9') \
+        .in_('media_id', ['m1', 'm,2']) \
+        .or_('cluster_considered_at.is.null,cluster_considered_at.gt."2026-01-01"') \
+        .limit(50)
+    assert query.path == '/rest/v1/faces'
+    assert query.method == 'GET'
+    assert query.params == [
+        ('select', 'id,embedding'),
+        ('event_id', 'eq.ev-1'),
+        ('embedding', 'not.is.null'),
+        ('face_person_id', 'is.null'),
+        ('id', 'gt.f-9'),
+        ('media_id', 'in.("m1","m,2")'),
+        ('or', '(cluster_considered_at.is.null,cluster_considered_at.gt."2026-01-01")'),
+        ('limit', '50')
+    ]
+
+
+def test_writes_set_method_body_and_prefer(client):
+    upsert = client.table('face_persons').upsert([{'id': 1}], on_conflict='event_id,cluster_label')
+    assert upsert.method == 'POST' and upsert.body == [{'id': 1}]
+    assert ('on_conflict', 'event_id,cluster_label') in upsert.params
+    assert upsert.headers['Prefer'] == 'return=representation,resolution=merge-duplicates'
+    
+    update = client.table('faces').update({'face_person_id': 'p'}).in_('id', ['a'])
+    assert update.method == 'PATCH' and update.params == [('id', 'in.("a")')]
+    
+    assert client.table('faces').delete().eq('id', 'a').method == 'DELETE'
+    assert client.rpc('assign_faces_bulk', {'rows': []}).path == '/rest/v1/rpc/assign_faces_bulk'
+
+
+def test_execute_sends_params_order_and_single(client):
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={'id': 'a'})
+    
+    async def run():
+        client._http = httpx.AsyncClient(base_url=client.url, headers=client.headers,
+                                         transport=httpx.MockTransport(handler))
+        client._loop = asyncio.get_running_loop()
+        try:
+            return await client.table('faces').select('id').eq('id', 'a') \
+                .order('created_at', desc=True).order('id').single().execute()
+        finally:
+            await client.aclose()
+    
+    response = asyncio.run(run())
+    assert response.data == {'id': 'a'}
+    request = requests[0]
+    assert request.url.path == '/rest/v1/faces'
+    assert list(request.url.params.multi_items()) == [
+        ('select', 'id'), ('id', 'eq.a'), ('order', 'created_at.desc,id.asc')
+    ]
+    assert request.headers['Accept'] == 'application/vnd.pgrst.object+json'
+    assert request.headers['apikey'] == 'key'
+
+
+def test_error_status_raises(client):
+    async def run():
+        client._http = httpx.AsyncClient(base_url=client.url,
+                                         transport=httpx.MockTransport(lambda r: httpx.Response(404, text='missing')))
+        client._loop = asyncio.get_running_loop()
+        try:
+            await client.table('faces').select().execute()
+        finally:
+            await client.aclose()
+    
+    with pytest.raises(APIError) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 404
@@ -0,0 +1,85 @@
+"""Keyset pagination of event faces"""
+
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.supabase_client import SupabaseService
+
+
+class FakeFacesTable:
+    """faces endpoint answering id > after / limit requests, capped at max_rows like PostgREST"""
+    
+    def __init__(self, n_faces: int, max_rows: int):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(n_faces, 512)).astype(np.float32)
+        self.rows = [
+            {
+                'id': f"face-{i:04d}",
+                'embedding': '[' + ','.join(repr(float(x)) for x in self.embeddings[i]) + ']',
+                'quality_score': 0.9,
+                'media_id': f"media-{i // 3}",
+                'face_person_id': 'person' if i % 4 == 0 else None
+            }
+            for i in range(n_faces)
+        ]
+        self.max_rows = max_rows
+        self.requests = []
+    
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params.multi_items())
+        self.requests.append(params)
+        rows = [r for r in self.rows if params.get('event_id') == 'eq.ev']
+        if params.get('face_person_id') == 'is.null':
+            rows = [r for r in rows if r['face_person_id'] is None]
+        if 'id' in params:
+            after = params['id'].removeprefix('gt.')
+            rows = [r for r in rows if r['id'] > after]
+        assert params.get('order') == 'id.asc'
+        rows = sorted(rows, key=lambda r: r['id'])[:min(int(params['limit']), self.max_rows)]
+        return httpx.Response(200, json=rows)
+
+
+def read_faces(table: FakeFacesTable, **kwargs):
+    service = SupabaseService()
+    
+    async def run():
+        service.client._http = httpx.AsyncClient(base_url=service.client.url, transport=httpx.MockTransport(table))
+        service.client._loop = asyncio.get_running_loop()
+        try:
+            return await service.get_event_faces('ev', **kwargs)
+        finally:
+            await service.close()
+    
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def float32_embeddings(monkeypatch):
+    monkeypatch.setattr(settings, 'embedding_precision', 'float32')
+    monkeypatch.setattr(settings, 'face_page_size', 5)
+
+
+def test_reads_every_face_once_in_id_order():
+    table = FakeFacesTable(23, max_rows=100)
+    faces = read_faces(table, include_assigned=True)
+    assert [f['id'] for f in faces] == [r['id'] for r in table.rows]
+    np.testing.assert_array_equal(np.array([f['embedding'] for f in faces]), table.embeddings)
+    # 5 full pages, then the empty page that ends the scan
+    assert [r.get('id') for r in table.requests] == [None] + [f"gt.face-{i:04d}" for i in (4, 9, 14, 19, 22)]
+
+
+def test_short_pages_from_max_rows_do_not_truncate():
+    table = FakeFacesTable(23, max_rows=3)
+    faces = read_faces(table, include_assigned=True)
+    assert [f['id'] for f in faces] == [r['id'] for r in table.rows]
+
+
+def test_unassigned_only():
+    table = FakeFacesTable(23, max_rows=100)
+    faces = read_faces(table)
+    assert [f['id'] for f in faces] == [r['id'] for r in table.rows if r['face_person_id'] is None]
+    assert all(r['face_person_id'] == 'is.null' for r in table.requests)
@@ -0,0 +1,100 @@
+"""
+Validation de EMBEDDING_PRECISION (float32 / float16 / int8)
+
+Pour chaque précision, compare au float32 :
+  - la mémoire des embeddings gardés par un job de clustering (vs listes Python)
+  - la dérive cosinus des embeddings stockés
+  - les clusters DBSCAN (ClusteringService.cluster_faces) : labels identiques et ARI
+  - l'assignation aux clusters existants (SmartClusteringService.match_embeddings)
+
+Usage :
+    python validate_embedding_precision.py [--event-id <uuid>] [--faces 5000]
+"""
+
+import argparse
+import asyncio
+import sys
+
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+load_dotenv()
+
+from app.config import settings
+from app.embedding_precision import compact_embeddings
+from app.services.clustering import ClusteringService
+from app.services.smart_clustering import SmartClusteringService
+from benchmark_clustering_scaling import synthetic_faces
+
+
+def load_embeddings(event_id, n_faces: int) -> np.ndarray:
+    """Embeddings float32 d'un événement réel, ou synthétiques"""
+    if not event_id:
+        return synthetic_faces(n_faces, burst=0.2)
+
+    from app.services.supabase_client import supabase_service
+
+    settings.embedding_precision = 'float32'
+    faces = asyncio.run(supabase_service.get_event_faces(event_id, include_assigned=True))
+    return np.array([f['embedding'] for f in faces], dtype=np.float32).reshape(len(faces), 512)
+
+
+def cluster_labels(embeddings: np.ndarray) -> np.ndarray:
+    """Labels DBSCAN par visage, via le service utilisé en production"""
+    face_ids = [str(i) for i in range(len(embeddings))]
+    clusters = ClusteringService().cluster_faces(embeddings, face_ids, [1.0] * len(face_ids))
+    labels = np.full(len(face_ids), -1)
+    for label, faces in clusters.items():
+        for face_id, _ in faces:
+            labels[int(face_id)] = label
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation de la précision des embeddings")
+    parser.add_argument('--event-id', help="Événement réel (sinon visages synthétiques)")
+    parser.add_argument('--faces', type=int, default=5000, help="Nombre de visages synthétiques")
+    args = parser.parse_args()
+
+    reference = load_embeddings(args.event_id, args.faces)
+    if len(reference) < settings.min_cluster_size:
+        print("❌ Pas assez de visages")
+        return
+
+    list_bytes = len(reference) * (sys.getsizeof([0.0] * 512) + 512 * sys.getsizeof(1.0))
+    print(f"📊 {len(reference)} visages, listes Python : {list_bytes / 1e6:.1f} Mo\n")
+
+    # Référence float32 : clusters, puis centroïdes servant de clusters existants
+    ref_labels = cluster_labels(reference)
+    n_clusters = int(ref_labels.max()) + 1
+    matcher = SmartClusteringService(similarity_threshold=0.6, min_margin=settings.assignment_min_margin)
+    clustered = ref_labels != -1
+    centroids, _ = matcher.compute_centroids(reference[clustered], ref_labels[clustered], n_clusters)
+    ref_best, _, _, ref_accepted = matcher.match_embeddings(reference, centroids)
+    print(f"🎯 Référence float32 : {n_clusters} clusters, {(~clustered).sum()} bruit\n")
+
+    for precision in ('float32', 'float16', 'int8'):
+        rows = compact_embeddings(reference, precision)
+        stored_bytes = sum(row.nbytes for row in rows)
+        matrix = np.array(rows, dtype=np.float32)
+        drift = 1.0 - np.sum(normalize(reference) * normalize(matrix), axis=1)
+
+        labels = cluster_labels(matrix)
+        same_labels = np.mean(labels == ref_labels)
+        ari = adjusted_rand_score(ref_labels, labels)
+
+        best, _, _, accepted = matcher.match_embeddings(matrix, centroids)
+        same_assignment = np.mean((best == ref_best) & (accepted == ref_accepted))
+
+        print(f"⚙️  {precision} :")
+        print(f"  - mémoire          : {stored_bytes / 1e6:7.1f} Mo ({list_bytes / stored_bytes:.0f}x moins que les listes)")
+        print(f"  - dérive cosinus   : moyenne {drift.mean():.2e}, max {drift.max():.2e}")
+        print(f"  - labels DBSCAN    : {same_labels:.2%} identiques, ARI {ari:.4f}")
+        print(f"  - assignations     : {same_assignment:.2%} identiques")
+        print()
+
+
+if __name__ == '__main__':
+    main()